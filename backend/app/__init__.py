@@ -3,6 +3,12 @@ from flask import Flask
 from app.config import Config
 from app.extensions import db
 from app.extensions import cache
+from app.extensions import entity_cache
+from app.metrics.instrumentation import InstrumentedJSONProvider, instrument_app, instrument_queries
+from app.metrics.pool import instrument_engine
+from app.metrics.profiling import init_profiling
+from app.util.replicas import init_replicas
+from app.util.schema import init_schema
 
 def create_app(config_class=Config):
     # Initialize Flask App
@@ -11,18 +17,33 @@ def create_app(config_class=Config):
     # Import config from config class
     app.config.from_object(config_class)
 
+    # Request latency, cache and serialization metrics for the /metrics endpoint
+    app.json = InstrumentedJSONProvider(app)
+    instrument_app(app)
+
     # Initializing SQLAlchemy extension with Flask app
     db.init_app(app)
 
     # Initializing Flask Caching
     cache.init_app(app)
+    # Initializing the LRU of single entities, invalidated through the deletes of the response cache
+    entity_cache.init_app(app, shared=cache)
 
     # Importing all models to include into SQLAlchemy Metadata
     from .authors.author import Author
     from .books.book import Book
 
     with app.app_context():
-        # Create all tables according to schema from model in metadata
-        db.create_all()
+        # Counting pool checkouts, connects and invalidations for the pool metrics endpoint
+        instrument_engine(db.engine)
+        # Counting and timing SQL statements per request
+        instrument_queries(db.engine)
+        # Profiling of single requests, only active when enabled in the config
+        init_profiling(app, db.engine)
+        # Read replica routing and health checks, only active when replicas are configured
+        init_replicas(app, db)
+
+        # Create or migrate tables, or skip schema work entirely, see Config.DB_SCHEMA_MODE
+        init_schema(mode=app.config['DB_SCHEMA_MODE'], db=db)
 
     return app, cache, db
\ No newline at end of file
@@ -7,6 +7,7 @@ app, cache, db = create_app()
 # Defining routes
 from .authors import routes as author_routes
 from .books import routes as book_routes
+from .metrics import routes as metrics_routes
 
 # Starting application
 if __name__ == "__main__":
@@ -0,0 +1,150 @@
+import io
+import sys
+
+from flask import Flask
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.util import await_only
+
+from .config import async_database_uri, engine_options
+from .extensions import db
+from .metrics.instrumentation import instrument_queries
+from .metrics.pool import instrument_engine
+from .util.replicas import ASYNC_REPLICAS, REPLICA_BIND_PREFIX, AsyncRoutingSession, replica_set
+
+# Optional async serving mode (ASGI), backed by sqlalchemy.ext.asyncio with asyncpg / aiosqlite.
+#
+# The Flask app, its routes and controllers are reused unchanged: every request runs inside
+# AsyncSession.run_sync, where db.session is the sync facade of the request's AsyncSession.
+# SQLAlchemy bridges each DB round trip to the event loop through a greenlet, so while one request
+# waits on the database the worker's event loop serves others. Concurrency per process is bounded
+# by the async connection pool instead of the number of threads.
+#
+# Read replicas configured for the WSGI app get async engines too, and @replica_read controllers are
+# routed to them the same way, by the AsyncRoutingSession behind every AsyncSession.
+#
+# Only DB I/O is asynchronous; cache backends and CPU work (validation, serialization) still run on
+# the event loop thread.
+
+# Name of the async engine in the pool metrics, its replicas are reported as async_replica<n>
+ASYNC_POOL = "async"
+
+def _wsgi_environ(scope: dict, body: bytes) -> dict:
+    """ WSGI environ of an ASGI HTTP scope, as expected by Flask """
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin-1"),
+        "PATH_INFO": scope["path"].encode().decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+        # The whole body has been read already, also when it was sent chunked
+        "wsgi.input_terminated": True,
+    }
+    for name, value in scope["headers"]:
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        key = name if name in ("CONTENT_TYPE", "CONTENT_LENGTH") else f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    environ["CONTENT_LENGTH"] = str(len(body))
+    return environ
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+class AsyncApp(object):
+    """ ASGI application serving a Flask app with async database I/O
+
+    Args:
+        app (Flask): app with all routes registered
+        engine (AsyncEngine | None): async engine, by default created from the app's database config
+        replica_engines (dict[str, AsyncEngine] | None): async read replica engines keyed by bind key, by default
+            created from the replica<n> binds of the app's config
+    """
+
+    def __init__(self, app: Flask, engine: AsyncEngine | None = None, replica_engines: dict[str, AsyncEngine] | None = None):
+        self.app = app
+        if engine is None:
+            uri = app.config.get("SQLALCHEMY_ASYNC_DATABASE_URI") or async_database_uri(app.config["SQLALCHEMY_DATABASE_URI"])
+            engine = create_async_engine(uri, **engine_options(uri))
+        self.engine = engine
+        # Same pool and statement metrics as the sync engine, reported by /metrics/pool and /metrics
+        instrument_engine(self.engine.sync_engine, name=ASYNC_POOL)
+        instrument_queries(self.engine.sync_engine)
+
+        if replica_engines is None:
+            replica_engines = {}
+            for key, bind in app.config.get("SQLALCHEMY_BINDS", {}).items():
+                if key.startswith(REPLICA_BIND_PREFIX):
+                    uri = async_database_uri(bind["url"] if isinstance(bind, dict) else bind)
+                    replica_engines[key] = create_async_engine(uri, **engine_options(uri))
+        self.replica_engines = replica_engines
+        for key, replica in replica_engines.items():
+            instrument_engine(replica.sync_engine, name=f"{ASYNC_POOL}_{key}")
+        if replica_engines:
+            app.extensions[ASYNC_REPLICAS] = replica_set(app, {key: replica.sync_engine for key, replica in replica_engines.items()})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            environ = _wsgi_environ(scope, await _read_body(receive))
+            async with AsyncSession(self.engine, sync_session_class=AsyncRoutingSession) as session:
+                await session.run_sync(self._handle, environ, send)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.engine.dispose()
+                for replica in self.replica_engines.values():
+                    await replica.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def _handle(self, session, environ: dict, send) -> None:
+        """ Runs the Flask app for one request in the greenlet of AsyncSession.run_sync
+
+        Args:
+            session: sync Session of the request's AsyncSession
+            environ (dict): WSGI environ of the request
+            send: ASGI send callable, awaited through the greenlet bridge
+        """
+        response_start = {}
+
+        def start_response(status, headers, exc_info=None):
+            response_start.update(
+                type="http.response.start",
+                status=int(status.split(" ", 1)[0]),
+                headers=[(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+            )
+
+        # The app context outlives the request context, so streamed bodies can still use the session
+        with self.app.app_context():
+            db.session.registry.set(session)
+            body = self.app.wsgi_app(environ, start_response)
+            try:
+                await_only(send(response_start))
+                for chunk in body:
+                    if chunk:
+                        await_only(send({"type": "http.response.body", "body": chunk, "more_body": True}))
+                await_only(send({"type": "http.response.body", "body": b"", "more_body": False}))
+            finally:
+                if hasattr(body, "close"):
+                    body.close()
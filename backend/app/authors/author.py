@@ -1,15 +1,16 @@
 from ..extensions import db
-from sqlalchemy import inspect
-from datetime import datetime
+from ..util.serializers import ModelSerializer, utc_now
+from ..util.ids import UUIDString
+from ..util.search import register_search_index
 
 # Author table schema and object model definition
 class Author(db.Model):
     # Author ID Primary Key
-    id = db.Column(db.TEXT, primary_key=True, nullable=False, unique=True)
+    id = db.Column(UUIDString, primary_key=True, nullable=False, unique=True)
     # Creation date of object in DB - automatically filled
-    created_on = db.Column(db.DateTime(timezone=True), default=datetime.now)
+    created_on = db.Column(db.DateTime(timezone=True), default=utc_now)
     # Last updated date of object in DB - automatically filled
-    last_updated_on = db.Column(db.DateTime(timezone=True), default=datetime.now, onupdate=datetime.now)
+    last_updated_on = db.Column(db.DateTime(timezone=True), default=utc_now, onupdate=utc_now)
 
     # Name of Author
     name = db.Column(db.TEXT)
@@ -21,13 +22,20 @@ class Author(db.Model):
     # Relationship that tells db that it is 1-to-many with Book model
     books = db.relationship("Book", backref="author", passive_deletes=True)
 
+    # Composite indexes backing keyset pagination ordered by (created_on, id) or (birth_date, id),
+    # which also serve birth_date range filters
+    __table_args__ = (
+        db.Index("ix_author_created_on_id", "created_on", "id"),
+        db.Index("ix_author_birth_date_id", "birth_date", "id"),
+    )
+
     def toDict(self) -> dict:
         """ Converts Author Object into dictionary. 
 
         Returns:
             dict: dictionary containing attributes as key/value pairs
         """
-        return { c.key: getattr(self, c.key) for c in inspect(self).mapper.column_attrs }
+        return author_serializer.serialize(self)
 
     def __repr__(self) -> str:
         """ Representation of Author in string format
@@ -35,4 +43,10 @@ class Author(db.Model):
         Returns:
             str: String representation of object containing id
         """
-        return f'<Author id={self.id}>'
\ No newline at end of file
+        return f'<Author id={self.id}>'
+
+# Serializer compiled once for the Author model, shared by toDict and column-only queries
+author_serializer = ModelSerializer(Author)
+
+# Full-text search index over the text columns, created along with the table
+register_search_index(Author.__table__, columns=("name", "bio"))
@@ -1,26 +1,120 @@
 from flask import Response, request
-import uuid
-from datetime import datetime
+from datetime import date, datetime
 from ..util.responses import BaseResponse
-from ..util.validators import DATE_FORMAT
+from ..util.pagination import encode_cursor, encode_offset_cursor, keyset_paginate
+from ..util.serializers import ModelSerializer
+from ..util.search import search_select
+from ..util.batch import batch_error, batch_success
+from ..util.returning import write_returning
+from ..util.ids import new_id
+from ..util.caching import AUTHORS, invalidate_authors
+from ..util.replicas import replica_read
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import selectinload
+from collections.abc import Iterator
 
-from ..extensions import db
-from .author import Author
+from ..extensions import db, entity_cache
+from .author import Author, author_serializer
+from ..books.book import Book, book_serializer
 
-def list_all_authors() -> list[dict]:
-    """ Retrieves all authors from database
+def author_with_books(author: Author, serializer: ModelSerializer = author_serializer) -> dict:
+    """ Converts Author object with loaded books relationship into dictionary
+
+    Args:
+        author (Author): author loaded with selectinload(Author.books)
+        serializer (ModelSerializer): author_serializer or a projection of it
 
     Returns:
-        Response: JSONified list of all authors in database
+        dict: author attributes and list of its books under "books"
     """
-    authors_list = []
+    data = serializer.serialize(author)
+    data["books"] = [book_serializer.serialize(book) for book in author.books]
+    return data
 
-    authors = Author.query.all()
-    
-    for author in authors: 
-        authors_list.append(author.toDict())
+@replica_read
+def list_all_authors(limit: int, after: tuple[date | datetime, str] | None = None, include_books: bool = False, sort: str = "created_on",
+                     descending: bool = False, serializer: ModelSerializer = author_serializer,
+                     birth_date_from: date | None = None, birth_date_to: date | None = None) -> tuple[list[dict], str | None]:
+    """ Retrieves one page of authors from database using keyset pagination
+
+    Args:
+        limit (int): maximum number of authors to return
+        after (tuple[date | datetime, str] | None): (sort key, id) of the last author of the previous page
+        include_books (bool): embeds books of every author on the page
+        sort (str): column the authors are sorted by, created_on or birth_date
+        descending (bool): sorts in descending order
+        serializer (ModelSerializer): author_serializer or a projection of it selecting only some columns
+        birth_date_from (date | None): only authors born on or after this date
+        birth_date_to (date | None): only authors born on or before this date
+
+    Returns:
+        tuple[list[dict], str | None]: list of authors on the page and cursor of the next page, None on last page
+    """
+    sort_column = getattr(Author, sort)
+    if include_books:
+        # Books of the whole page are loaded by one extra SELECT ... WHERE author_id IN (...) query
+        query = select(Author).options(selectinload(Author.books))
+    else:
+        # Column-only query of the requested fields, the sort key and id follow for the next page cursor
+        query = select(*serializer.columns, sort_column.label("cursor_sort"), Author.id.label("cursor_id"))
+    # created_on is set on every insert, the date columns may be unset
+    query = keyset_paginate(query, sort_column=sort_column, id_column=Author.id, descending=descending, after=after, nullable=sort != "created_on")
+
+    if birth_date_from is not None:
+        query = query.where(Author.birth_date >= birth_date_from)
+    if birth_date_to is not None:
+        query = query.where(Author.birth_date <= birth_date_to)
+
+    # Fetching one extra row tells whether a next page exists without a count query
+    result = db.session.execute(query.limit(limit + 1))
+    authors = result.scalars().all() if include_books else result.all()
+    has_next = len(authors) > limit
+    authors = authors[:limit]
+
+    if include_books:
+        next_cursor = encode_cursor(getattr(authors[-1], sort), authors[-1].id, sort=sort) if has_next else None
+        return [author_with_books(author, serializer=serializer) for author in authors], next_cursor
 
-    return authors_list
+    next_cursor = encode_cursor(authors[-1].cursor_sort, authors[-1].cursor_id, sort=sort) if has_next else None
+    return serializer.serialize_rows(authors), next_cursor
+
+@replica_read
+def stream_all_authors(batch_size: int = 1000) -> Iterator[dict]:
+    """ Lazily retrieves every author from database for streamed exports
+
+    Args:
+        batch_size (int): number of rows fetched from the DB cursor at a time
+
+    Returns:
+        Iterator[dict]: generator yielding one author dictionary at a time
+    """
+    # yield_per fetches rows in batches, using a server-side cursor on Postgres
+    query = author_serializer.select().order_by(Author.created_on, Author.id).execution_options(yield_per=batch_size)
+
+    for row in db.session.execute(query):
+        yield author_serializer.serialize_row(row)
+
+@replica_read
+def search_authors(q: str, limit: int, offset: int = 0) -> tuple[list[dict], str | None]:
+    """ Full-text search of authors by name and bio, best matches first
+
+    Args:
+        q (str): search text
+        limit (int): maximum number of authors to return
+        offset (int): number of matches on the previous pages
+
+    Returns:
+        tuple[list[dict], str | None]: matching authors on the page and cursor of the next page, None on last page
+    """
+    query = search_select(serializer=author_serializer, q=q, dialect=db.session.get_bind().dialect.name)
+
+    # Fetching one extra row tells whether a next page exists without a count query
+    authors = db.session.execute(query.offset(offset).limit(limit + 1)).all()
+    has_next = len(authors) > limit
+
+    next_cursor = encode_offset_cursor(offset + limit) if has_next else None
+
+    return author_serializer.serialize_rows(authors[:limit]), next_cursor
 
 def create_author(request_json: dict) -> dict:
     """ Creates and returns author from fields found in request JSON
@@ -29,37 +123,68 @@ def create_author(request_json: dict) -> dict:
         Response: Newly created JSONified Author object
     """
 
-    author_id = str(uuid.uuid4())
-    new_author = Author(
-                        id = author_id,
-                        name = request_json['name'],
-                        bio = request_json['bio'],
-                        birth_date  = datetime.strptime(request_json['birth_date'], DATE_FORMAT),
-                        )
-    db.session.add(instance=new_author)
+    author_id = new_id()
+    values = dict(
+                  id = author_id,
+                  name = request_json['name'],
+                  bio = request_json['bio'],
+                  birth_date  = request_json['birth_date'],
+                  )
+
+    # INSERT ... RETURNING gives back the stored row without a second round trip
+    row = write_returning(statement=insert(Author).values(**values), serializer=author_serializer, where=Author.id == author_id)
     db.session.commit()
+    invalidate_authors(author_ids=[author_id])
 
-    newAuthor = db.session.get(entity=Author, ident=author_id)
-    
-    return newAuthor.toDict()
+    return author_serializer.serialize_row(row)
 
-def get_author(author_id: str) -> dict:
+@replica_read
+def get_author(author_id: str, include_books: bool = False) -> dict:
     """ Retrieve specific author based on id
 
     Args:
         id (str): id of requested author
+        include_books (bool): embeds books of the author
 
     Returns:
         Response: JSONified author object
     """
 
-    author = db.session.get(entity=Author, ident=author_id)
+    if not include_books:
+        # Served from the in-process entity cache, loaded from the database on a miss
+        return entity_cache.get_or_load(AUTHORS, author_id, lambda: _load_author(author_id))
+
+    author = db.session.scalar(select(Author).where(Author.id == author_id).options(selectinload(Author.books)))
 
     if not author:
         return {}
 
+    return author_with_books(author)
+
+def _load_author(author_id: str) -> dict:
+    row = db.session.execute(author_serializer.select().where(Author.id == author_id)).first()
+    return author_serializer.serialize_row(row) if row is not None else {}
 
-    return author.toDict()
+@replica_read
+def get_author_last_updated(author_id: str) -> datetime | None:
+    """ Last update date of specific author, used as its conditional GET version
+
+    Args:
+        author_id (str): id of author
+
+    Returns:
+        datetime | None: last_updated_on of author, None when author does not exist
+    """
+    return db.session.scalar(select(Author.last_updated_on).where(Author.id == author_id))
+
+@replica_read
+def get_authors_collection_stats() -> tuple[datetime | None, int]:
+    """ Latest update date and number of authors, used as conditional GET version of author lists
+
+    Returns:
+        tuple[datetime | None, int]: max(last_updated_on) and count of authors
+    """
+    return tuple(db.session.execute(select(func.max(Author.last_updated_on), func.count(Author.id))).one())
 
 def put_author(author_id: str, request_json: dict) -> dict:
     """ Update specific author based on id
@@ -72,17 +197,20 @@ def put_author(author_id: str, request_json: dict) -> dict:
     """
 
 
-    author = db.session.get(entity=Author, ident=author_id)
-
-    author.name = request_json['name'] 
-    author.bio = request_json['bio'] 
-    author.birth_date = datetime.strptime(request_json['birth_date'], DATE_FORMAT) 
+    values = dict(
+                  name = request_json['name'],
+                  bio = request_json['bio'],
+                  birth_date = request_json['birth_date'],
+                  )
 
+    # UPDATE ... RETURNING updates and reads back the row in one statement
+    row = write_returning(statement=update(Author).where(Author.id == author_id).values(**values), serializer=author_serializer, where=Author.id == author_id)
+    if row is None:
+        raise ValueError(f"Author with id={author_id} does not exist")
     db.session.commit()
+    invalidate_authors(author_ids=[author_id])
 
-    updatedAuthor = db.session.get(entity=Author, ident=author_id)
-    
-    return updatedAuthor.toDict()
+    return author_serializer.serialize_row(row)
 
 def delete_author(author_id: str) -> dict:
     """ Delete specific author based on id
@@ -94,12 +222,145 @@ def delete_author(author_id: str) -> dict:
         Response: 
     """
 
+    # Books removed by ON DELETE CASCADE have to be evicted from the cache too
+    book_ids = db.session.scalars(select(Book.id).where(Book.author_id == author_id)).all()
+
     author_delete_count = Author.query.filter(Author.id==author_id).delete()
 
     db.session.commit()
+    invalidate_authors(author_ids=[author_id], book_ids=book_ids)
 
     response = BaseResponse(
         message=f"Succesfully deleted Author with id: {author_id}",
         )
     
-    return response.toDict()
\ No newline at end of file
+    return response.toDict()
+
+def create_many_authors(validated_items: list[tuple[int, dict]]) -> dict[int, dict]:
+    """ Creates authors from validated batch items in a single transaction
+
+    Args:
+        validated_items (list[tuple[int, dict]]): (request index, validated author fields) pairs
+
+    Returns:
+        dict[int, dict]: batch result entry of every item keyed by request index
+    """
+    results = {}
+    if not validated_items:
+        return results
+
+    rows = [
+        {
+            "id": new_id(),
+            "name": item['name'],
+            "bio": item['bio'],
+            "birth_date": item['birth_date'],
+        }
+        for _, item in validated_items
+    ]
+
+    # Single multi-row INSERT ... RETURNING, rows come back in parameter order
+    created = db.session.execute(insert(Author).returning(*author_serializer.columns, sort_by_parameter_order=True), rows)
+    for (index, _), row in zip(validated_items, created):
+        results[index] = batch_success(index=index, data=author_serializer.serialize_row(row))
+
+    db.session.commit()
+    invalidate_authors(author_ids=[row['id'] for row in rows])
+
+    return results
+
+def put_many_authors(validated_items: list[tuple[int, dict]]) -> dict[int, dict]:
+    """ Updates authors from validated batch items in a single transaction
+
+    Args:
+        validated_items (list[tuple[int, dict]]): (request index, validated author fields including id) pairs
+
+    Returns:
+        dict[int, dict]: batch result entry of every item keyed by request index
+    """
+    results = {}
+    if not validated_items:
+        return results
+
+    ids = {item['id'] for _, item in validated_items}
+    existing_ids = set(db.session.scalars(select(Author.id).where(Author.id.in_(ids))))
+
+    rows = []
+    for index, item in validated_items:
+        if item['id'] not in existing_ids:
+            results[index] = batch_error(index=index, message=f"Author with id={item['id']} does not exist")
+            continue
+        rows.append({
+            "id": item['id'],
+            "name": item['name'],
+            "bio": item['bio'],
+            "birth_date": item['birth_date'],
+        })
+
+    if rows:
+        # Bulk UPDATE by primary key, executed as one executemany
+        db.session.execute(update(Author), rows)
+        updated = db.session.execute(author_serializer.select().where(Author.id.in_(existing_ids)))
+        updated_by_id = { author['id']: author for author in author_serializer.serialize_rows(updated) }
+        for index, item in validated_items:
+            if index not in results:
+                results[index] = batch_success(index=index, data=updated_by_id[item['id']])
+
+    db.session.commit()
+    invalidate_authors(author_ids=[row['id'] for row in rows])
+
+    return results
+
+def delete_many_authors(validated_items: list[tuple[int, str]]) -> dict[int, dict]:
+    """ Deletes authors with the given ids in a single transaction
+
+    Args:
+        validated_items (list[tuple[int, str]]): (request index, author id) pairs
+
+    Returns:
+        dict[int, dict]: batch result entry of every item keyed by request index
+    """
+    results = {}
+    if not validated_items:
+        return results
+
+    ids = {author_id for _, author_id in validated_items}
+    existing_ids = set(db.session.scalars(select(Author.id).where(Author.id.in_(ids))))
+    book_ids = db.session.scalars(select(Book.id).where(Book.author_id.in_(existing_ids))).all()
+
+    db.session.execute(delete(Author).where(Author.id.in_(existing_ids)).execution_options(synchronize_session=False))
+    db.session.commit()
+    invalidate_authors(author_ids=existing_ids, book_ids=book_ids)
+
+    for index, author_id in validated_items:
+        if author_id in existing_ids:
+            results[index] = batch_success(index=index, data={"id": author_id})
+        else:
+            results[index] = batch_error(index=index, message=f"Author with id={author_id} does not exist")
+
+    return results
+
+@replica_read
+def get_many_authors(validated_items: list[tuple[int, str]]) -> dict[int, dict]:
+    """ Retrieves authors with the given ids, from the entity cache and one query for the misses
+
+    Args:
+        validated_items (list[tuple[int, str]]): (request index, author id) pairs
+
+    Returns:
+        dict[int, dict]: batch result entry of every item keyed by request index
+    """
+    authors = entity_cache.get_many_or_load(AUTHORS, (author_id for _, author_id in validated_items), _load_authors)
+
+    results = {}
+    for index, author_id in validated_items:
+        if author_id in authors:
+            results[index] = batch_success(index=index, data=authors[author_id])
+        else:
+            results[index] = batch_error(index=index, message=f"Author with id={author_id} does not exist")
+
+    return results
+
+def _load_authors(author_ids: list[str]) -> dict[str, dict]:
+    rows = db.session.execute(author_serializer.select().where(Author.id.in_(author_ids)))
+    return { author['id']: author for author in author_serializer.serialize_rows(rows) }
@@ -1,25 +1,111 @@
 from flask import jsonify, request
+from datetime import date, datetime
 
 from ..app import app
-from .controller import list_all_authors, create_author, get_author, put_author, delete_author
+from .author import author_serializer
+from .controller import list_all_authors, stream_all_authors, search_authors, create_author, get_author, get_author_last_updated, get_authors_collection_stats, put_author, delete_author, create_many_authors, put_many_authors, delete_many_authors, get_many_authors
 from ..util.responses import BaseResponse
-from ..util.validators import create_update_author_schema, id_schema
+from ..util.validators import create_update_author_schema, batch_update_author_schema, id_schema, search_text_schema
+from ..util.batch import DuplicateIdError, validate_batch, batch_response, wants_ids, parse_ids_arg
+from ..util.pagination import parse_page_args, parse_offset_page_args, page_cache_key, next_page_headers
+from ..util.streaming import wants_stream, ndjson_response
+from ..util.listing import parse_sort, parse_fields, parse_date_range
+from ..util.caching import AUTHORS, BOOKS, author_key, author_version_key, list_key, with_books_key, cached_value, is_cacheable
+from ..util.conditional import Version, conditional, resource_version, collection_version
+from ..books.controller import get_books_collection_stats
 from ..extensions import cache
 
 # Defining all author related API endpoints as per document
 
 logger = app.logger
 
+# Whitelisted sort keys of GET /authors, each backed by a (key, id) index, and the python type of their values
+SORTS = {"created_on": datetime, "birth_date": date}
+
+# Related resources that can be embedded with ?include=
+INCLUDES = ("books",)
+
+def parse_include() -> set[str]:
+    """ Reads comma separated `include` query argument of the current request
+
+    Raises:
+        ValueError: include names an unknown relationship
+
+    Returns:
+        set[str]: relationships to embed in the response
+    """
+    include = {name for name in request.args.get("include", "").split(",") if name}
+    if not include.issubset(INCLUDES):
+        raise ValueError(f"Check that include is one of: {', '.join(INCLUDES)}")
+    return include
+
+# Lenient check used by cache keys and versions, invalid values are reported by the view
+def wants_books() -> bool:
+    return "books" in request.args.get("include", "").split(",")
+
 # Cache key function to get key to store cached results for end points involving id path argument
 def id_cache_key(author_id: str) -> str:
-    return author_id
+    key = author_key(author_id)
+    return with_books_key(key) if wants_books() else key
+
+# Cache key function for list endpoint, keyed per page so each page is cached separately
+def list_cache_key() -> str:
+    key = list_key(AUTHORS, page_cache_key("page"))
+    return with_books_key(key) if wants_books() else key
+
+# Conditional GET version functions, versions are cached and evicted by the same writes as responses
+def id_version(author_id: str) -> Version:
+    validated_author_id = id_schema.validate(author_id)
+    last_updated_on = cached_value(author_version_key(validated_author_id), lambda: get_author_last_updated(author_id=validated_author_id))
+    if not wants_books() or last_updated_on is None:
+        return resource_version(validated_author_id, last_updated_on)
+
+    # Embedded books change the representation too, same stats as GET /authors/<id>/books
+    books_last_updated_on, books_count = cached_value(list_key(BOOKS, f"author:{validated_author_id}:version"), lambda: get_books_collection_stats(author_id=validated_author_id))
+    return collection_version(max(filter(None, (last_updated_on, books_last_updated_on))), books_count, validated_author_id, "books")
+
+# Streamed exports and lookups by ?ids= bypass the list response cache, ids are read through the entity cache
+def bypasses_list_cache() -> bool:
+    return wants_stream() or wants_ids()
+
+# Batch get result of authors by id, in request order with an error entry for every unknown or invalid id
+def batch_get(ids: list) -> dict:
+    validated_items, results = validate_batch(items=ids, schema=id_schema)
+    results.update(get_many_authors(validated_items=validated_items))
+    return batch_response(item_count=len(ids), results=results)
+
+def list_version() -> Version:
+    max_last_updated_on, count = cached_value(list_key(AUTHORS, "version"), get_authors_collection_stats)
+    if not wants_books():
+        return collection_version(max_last_updated_on, count, page_cache_key("page"))
+
+    books_last_updated_on, books_count = cached_value(list_key(BOOKS, "version"), get_books_collection_stats)
+    last_updated_on = max(filter(None, (max_last_updated_on, books_last_updated_on)), default=None)
+    return collection_version(last_updated_on, count, page_cache_key("page"), "books", str(books_count))
 
 @app.route("/authors", methods=['GET'])
-@cache.cached(timeout=10, key_prefix="getauthors") # Cache definition
+@conditional(version=list_version, unless=bypasses_list_cache) # ETag / Last-Modified, answers 304 before the cache or DB is read
+@cache.cached(make_cache_key=list_cache_key, unless=bypasses_list_cache, response_filter=is_cacheable) # Cache definition, streamed exports, lookups by ids and errors are not cached
 def list_authors():
     try:
+        # Streamed NDJSON export of all authors when requested via Accept header or ?stream=1
+        if wants_stream():
+            return ndjson_response(rows=stream_all_authors())
+        # Specific authors with ?ids=a,b,c, same response as POST /authors:batchGet
+        if wants_ids():
+            return batch_get(ids=parse_ids_arg())
+        # Sort, page size and cursor from query arguments
+        sort, sort_type, descending = parse_sort(sorts=SORTS)
+        limit, after = parse_page_args(sort=sort, sort_type=sort_type)
+        # Books are embedded with ?include=books
+        include = parse_include()
+        birth_date_from, birth_date_to = parse_date_range("birth_date")
         # controller method interacting with db
-        return list_all_authors()
+        authors, next_cursor = list_all_authors(
+            limit=limit, after=after, include_books="books" in include, sort=sort, descending=descending,
+            serializer=parse_fields(author_serializer), birth_date_from=birth_date_from, birth_date_to=birth_date_to,
+        )
+        return authors, 200, next_page_headers(next_cursor=next_cursor, limit=limit)
     except Exception as e:
         # logging output for any errors
         logger.error(msg=f"GET /author failed with message: {str(e)}", exc_info=True)
@@ -28,6 +114,29 @@ def list_authors():
         # 500 error catch-all
         return jsonify(response.toDict()), 500
 
+# Search results are cached and versioned per search text and page, and change with any author write
+def search_cache_key() -> str:
+    return list_key(AUTHORS, page_cache_key("search"))
+
+def search_version() -> Version:
+    max_last_updated_on, count = cached_value(list_key(AUTHORS, "version"), get_authors_collection_stats)
+    return collection_version(max_last_updated_on, count, page_cache_key("search"))
+
+@app.route("/authors/search", methods=['GET'])
+@conditional(version=search_version)
+@cache.cached(make_cache_key=search_cache_key, response_filter=is_cacheable)
+def search_authors_by_text():
+    try:
+        # Search text from the q query argument, results are ranked by relevance and paginated
+        q = search_text_schema.validate(request.args.get("q"))
+        limit, offset = parse_offset_page_args()
+        authors, next_cursor = search_authors(q=q, limit=limit, offset=offset)
+        return authors, 200, next_page_headers(next_cursor=next_cursor, limit=limit)
+    except Exception as e:
+        logger.error(msg=f"GET /authors/search failed with message: {str(e)}", exc_info=True)
+        response = BaseResponse(message=f"There was a problem searching the author objects: {str(e)}")
+        return jsonify(response.toDict()), 500
+
 @app.route("/authors", methods=['POST'])
 def create_authors():
         try:
@@ -41,19 +150,20 @@ def create_authors():
             return jsonify(response.toDict()), 500
 
 @app.route("/authors/<author_id>", methods=['GET'])
-@cache.cached(timeout=10, key_prefix="getauthor", make_cache_key=id_cache_key)
+@conditional(version=id_version)
+@cache.cached(make_cache_key=id_cache_key, response_filter=is_cacheable)
 def get_author_by_id(author_id):
     try:
         # Validations as defined for id path arguments in request URL
         validated_author_id = id_schema.validate(author_id)
-        return get_author(author_id=validated_author_id)
+        include = parse_include()
+        return get_author(author_id=validated_author_id, include_books="books" in include)
     except Exception as e:
         logger.error(msg=f"GET /author/{author_id} failed with message: {str(e)}", exc_info=True)
         response = BaseResponse(message=f"There was a problem getting the author object with id={author_id}: {str(e)}")
         return jsonify(response.toDict()), 500
 
 @app.route("/authors/<author_id>", methods=['PUT'])
-@cache.cached(timeout=10, key_prefix="putauthor", make_cache_key=id_cache_key)
 def put_author_by_id(author_id):
     try:
         validated_author_id = id_schema.validate(author_id)
@@ -65,7 +175,6 @@ def put_author_by_id(author_id):
         return jsonify(response.toDict()), 500
     
 @app.route("/authors/<author_id>", methods=['DELETE'])
-@cache.cached(timeout=10, key_prefix="deleteauthor", make_cache_key=id_cache_key)
 def delete_author_by_id(author_id):
     try:
         validated_author_id = id_schema.validate(author_id)
@@ -74,3 +183,54 @@ def delete_author_by_id(author_id):
         logger.error(msg=f"DELETE /author/{author_id} failed with message: {str(e)}", exc_info=True)
         response = BaseResponse(message=f"There was a problem deleting the author object with id={author_id}: {str(e)}")
         return jsonify(response.toDict()), 500
+
+@app.route("/authors:batch", methods=['POST'])
+def create_authors_batch():
+    try:
+        # Every item is validated individually, invalid items are reported without failing the batch
+        request_json = request.get_json()
+        validated_items, results = validate_batch(items=request_json, schema=create_update_author_schema)
+        results.update(create_many_authors(validated_items=validated_items))
+        return batch_response(item_count=len(request_json), results=results)
+    except Exception as e:
+        logger.error(msg=f"POST /authors:batch failed with message: {str(e)}", exc_info=True)
+        response = BaseResponse(message=f"There was a problem creating the author objects: {str(e)}")
+        return jsonify(response.toDict()), 500
+
+@app.route("/authors:batch", methods=['PUT'])
+def put_authors_batch():
+    try:
+        request_json = request.get_json()
+        validated_items, results = validate_batch(items=request_json, schema=batch_update_author_schema, unique_key="id")
+        results.update(put_many_authors(validated_items=validated_items))
+        return batch_response(item_count=len(request_json), results=results)
+    except DuplicateIdError as e:
+        # Ambiguous request rather than a failure of the server
+        response = BaseResponse(message=f"There was a problem updating the author objects: {str(e)}")
+        return jsonify(response.toDict()), 400
+    except Exception as e:
+        logger.error(msg=f"PUT /authors:batch failed with message: {str(e)}", exc_info=True)
+        response = BaseResponse(message=f"There was a problem updating the author objects: {str(e)}")
+        return jsonify(response.toDict()), 500
+
+@app.route("/authors:batch", methods=['DELETE'])
+def delete_authors_batch():
+    try:
+        request_json = request.get_json()
+        validated_items, results = validate_batch(items=request_json, schema=id_schema)
+        results.update(delete_many_authors(validated_items=validated_items))
+        return batch_response(item_count=len(request_json), results=results)
+    except Exception as e:
+        logger.error(msg=f"DELETE /authors:batch failed with message: {str(e)}", exc_info=True)
+        response = BaseResponse(message=f"There was a problem deleting the author objects: {str(e)}")
+        return jsonify(response.toDict()), 500
+
+@app.route("/authors:batchGet", methods=['POST'])
+def get_authors_batch():
+    try:
+        # JSON array of author ids, looked up with one cache multi-get and one query for the misses
+        return batch_get(ids=request.get_json())
+    except Exception as e:
+        logger.error(msg=f"POST /authors:batchGet failed with message: {str(e)}", exc_info=True)
+        response = BaseResponse(message=f"There was a problem getting the author objects: {str(e)}")
+        return jsonify(response.toDict()), 500
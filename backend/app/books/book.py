@@ -1,16 +1,17 @@
 from ..extensions import db
-from sqlalchemy import inspect
-from datetime import datetime
+from ..util.serializers import ModelSerializer, utc_now
+from ..util.ids import UUIDString
+from ..util.search import register_search_index
 
 # Book table schema and object model definition
 class Book(db.Model):
     
     # Book ID primary key
-    id = db.Column(db.TEXT, primary_key=True, nullable=False, unique=True)
+    id = db.Column(UUIDString, primary_key=True, nullable=False, unique=True)
     # Creation date of object in DB - automatically filled
-    created_on = db.Column(db.DateTime(timezone=True), default=datetime.now)
+    created_on = db.Column(db.DateTime(timezone=True), default=utc_now)
     # Last updated date of object in DB - automatically filled
-    last_updated_on = db.Column(db.DateTime(timezone=True), default=datetime.now, onupdate=datetime.now)
+    last_updated_on = db.Column(db.DateTime(timezone=True), default=utc_now, onupdate=utc_now)
 
     # Book title
     title = db.Column(db.TEXT)
@@ -20,7 +21,15 @@ class Book(db.Model):
     publish_date = db.Column(db.DATE)
 
     # Foreign key relationship to Author id to ensure constraint
-    author_id = db.Column(db.TEXT, db.ForeignKey("author.id", ondelete="CASCADE"), nullable=False)
+    author_id = db.Column(UUIDString, db.ForeignKey("author.id", ondelete="CASCADE"), nullable=False)
+
+    # Composite indexes backing keyset pagination ordered by (created_on, id) or (publish_date, id)
+    # and index on the foreign key backing lookups of books by author and ON DELETE CASCADE
+    __table_args__ = (
+        db.Index("ix_book_created_on_id", "created_on", "id"),
+        db.Index("ix_book_publish_date_id", "publish_date", "id"),
+        db.Index("ix_book_author_id", "author_id"),
+    )
 
     def toDict(self) -> dict:
         """ Converts Book Object into dictionary. 
@@ -28,7 +37,7 @@ class Book(db.Model):
         Returns:
             dict: dictionary containing attributes as key/value pairs
         """
-        return { c.key: getattr(self, c.key) for c in inspect(self).mapper.column_attrs }
+        return book_serializer.serialize(self)
 
     def __repr__(self) -> str:
         """ Representation of Book in string format
@@ -36,4 +45,10 @@ class Book(db.Model):
         Returns:
             str: String representation of object containing id
         """
-        return f'<Author id={self.id}>'
\ No newline at end of file
+        return f'<Author id={self.id}>'
+
+# Serializer compiled once for the Book model, shared by toDict and column-only queries
+book_serializer = ModelSerializer(Book)
+
+# Full-text search index over the text columns, created along with the table
+register_search_index(Book.__table__, columns=("title", "description"))
@@ -1,27 +1,78 @@
 from flask import request
-import uuid
-from datetime import datetime
+from datetime import date, datetime
 from ..util.responses import BaseResponse
-from ..util.validators import DATE_FORMAT
+from ..util.pagination import encode_cursor, encode_offset_cursor, keyset_paginate
+from ..util.serializers import ModelSerializer
+from ..util.search import search_select
+from ..util.batch import batch_error, batch_success
+from ..util.returning import write_returning
+from ..util.ids import new_id
+from ..util.caching import BOOKS, invalidate_books
+from ..util.replicas import replica_read
+from sqlalchemy import delete, func, insert, select, update
+from collections.abc import Iterator
+
+from ..extensions import db, entity_cache
+from .book import Book, book_serializer
+from ..authors.author import Author
+
+
+@replica_read
+def list_all_books(limit: int, after: tuple[date | datetime, str] | None = None, sort: str = "created_on", descending: bool = False,
+                   serializer: ModelSerializer = book_serializer, author_id: str | None = None,
+                   publish_date_from: date | None = None, publish_date_to: date | None = None) -> tuple[list[dict], str | None]:
+    """ Retrieves one page of books from database using keyset pagination
 
-from ..extensions import db
-from .book import Book
+    Args:
+        limit (int): maximum number of books to return
+        after (tuple[date | datetime, str] | None): (sort key, id) of the last book of the previous page
+        sort (str): column the books are sorted by, created_on or publish_date
+        descending (bool): sorts in descending order
+        serializer (ModelSerializer): book_serializer or a projection of it selecting only some columns
+        author_id (str | None): only books of this author
+        publish_date_from (date | None): only books published on or after this date
+        publish_date_to (date | None): only books published on or before this date
+
+    Returns:
+        tuple[list[dict], str | None]: list of books on the page and cursor of the next page, None on last page
+    """
+    sort_column = getattr(Book, sort)
+    # Column-only query of the requested fields, the sort key and id follow for the next page cursor
+    query = select(*serializer.columns, sort_column.label("cursor_sort"), Book.id.label("cursor_id"))
+    # created_on is set on every insert, the date columns may be unset
+    query = keyset_paginate(query, sort_column=sort_column, id_column=Book.id, descending=descending, after=after, nullable=sort != "created_on")
+
+    if author_id is not None:
+        query = query.where(Book.author_id == author_id)
+    if publish_date_from is not None:
+        query = query.where(Book.publish_date >= publish_date_from)
+    if publish_date_to is not None:
+        query = query.where(Book.publish_date <= publish_date_to)
 
+    # Fetching one extra row tells whether a next page exists without a count query
+    books = db.session.execute(query.limit(limit + 1)).all()
+    has_next = len(books) > limit
+    books = books[:limit]
 
-def list_all_books() -> list[dict]:
-    """ Retrieves all books from database
+    next_cursor = encode_cursor(books[-1].cursor_sort, books[-1].cursor_id, sort=sort) if has_next else None
+
+    return serializer.serialize_rows(books), next_cursor
+
+@replica_read
+def stream_all_books(batch_size: int = 1000) -> Iterator[dict]:
+    """ Lazily retrieves every book from database for streamed exports
+
+    Args:
+        batch_size (int): number of rows fetched from the DB cursor at a time
 
     Returns:
-        Response: JSONified list of all books in database
+        Iterator[dict]: generator yielding one book dictionary at a time
     """
-    books_list = []
-
-    books = Book.query.all()
-    
-    for book in books: 
-        books_list.append(book.toDict())
+    # yield_per fetches rows in batches, using a server-side cursor on Postgres
+    query = book_serializer.select().order_by(Book.created_on, Book.id).execution_options(yield_per=batch_size)
 
-    return books_list
+    for row in db.session.execute(query):
+        yield book_serializer.serialize_row(row)
 
 def create_book(request_json: dict) -> dict:
     """ Creates and returns book from fields found in request JSON
@@ -29,25 +80,24 @@ def create_book(request_json: dict) -> dict:
     Returns:
         Response: Newly created JSONified Book object
     """
-    book_id = str(uuid.uuid4())
+    book_id = new_id()
 
-    new_book = Book(
+    values = dict(
         id = book_id,
         title = request_json['title'],
         description = request_json['description'],
-        publish_date = datetime.strptime(request_json['publish_date'], DATE_FORMAT),
+        publish_date = request_json['publish_date'],
         author_id = request_json['author_id']
     )
 
-    db.session.add(instance=new_book)
+    row = write_returning(statement=insert(Book).values(**values), serializer=book_serializer, where=Book.id == book_id)
     db.session.commit()
+    invalidate_books(book_ids=[book_id])
 
-    
-    newBook = db.session.get(entity=Book, ident=book_id)
-    
-    return newBook.toDict()
+    return book_serializer.serialize_row(row)
 
 
+@replica_read
 def get_book(book_id: str) -> dict:
     """ Retrieve specific book based on id
 
@@ -57,13 +107,39 @@ def get_book(book_id: str) -> dict:
     Returns:
         Response: JSONified book object
     """
+    # Served from the in-process entity cache, loaded from the database on a miss
+    return entity_cache.get_or_load(BOOKS, book_id, lambda: _load_book(book_id))
+
+def _load_book(book_id: str) -> dict:
+    row = db.session.execute(book_serializer.select().where(Book.id == book_id)).first()
+    return book_serializer.serialize_row(row) if row is not None else {}
+
+@replica_read
+def get_book_last_updated(book_id: str) -> datetime | None:
+    """ Last update date of specific book, used as its conditional GET version
 
-    book = db.session.get(entity=Book, ident=book_id)
+    Args:
+        book_id (str): id of book
 
-    if not book:
-        return {}
+    Returns:
+        datetime | None: last_updated_on of book, None when book does not exist
+    """
+    return db.session.scalar(select(Book.last_updated_on).where(Book.id == book_id))
 
-    return book.toDict()
+@replica_read
+def get_books_collection_stats(author_id: str | None = None) -> tuple[datetime | None, int]:
+    """ Latest update date and number of books, used as conditional GET version of book lists
+
+    Args:
+        author_id (str | None): restricts stats to books of this author
+
+    Returns:
+        tuple[datetime | None, int]: max(last_updated_on) and count of books
+    """
+    query = select(func.max(Book.last_updated_on), func.count(Book.id))
+    if author_id is not None:
+        query = query.where(Book.author_id == author_id)
+    return tuple(db.session.execute(query).one())
 
 def put_book(book_id: str, request_json: dict) -> dict:
     """ Update specific book based on id
@@ -75,18 +151,20 @@ def put_book(book_id: str, request_json: dict) -> dict:
         Response: JSONified updated book object
     """
 
-    book = db.session.get(entity=Book, ident=book_id)
-
-    book.title = request_json['title']
-    book.description = request_json['description']
-    book.publish_date = datetime.strptime(request_json['publish_date'], DATE_FORMAT)
-    book.author_id = request_json['author_id']
+    values = dict(
+        title = request_json['title'],
+        description = request_json['description'],
+        publish_date = request_json['publish_date'],
+        author_id = request_json['author_id']
+    )
 
+    row = write_returning(statement=update(Book).where(Book.id == book_id).values(**values), serializer=book_serializer, where=Book.id == book_id)
+    if row is None:
+        raise ValueError(f"Book with id={book_id} does not exist")
     db.session.commit()
+    invalidate_books(book_ids=[book_id])
 
-    updatedBook = db.session.get(entity=Book, ident=book_id)
-    
-    return updatedBook.toDict()
+    return book_serializer.serialize_row(row)
 
 def delete_book(book_id: str) -> dict:
     """ Delete specific book based on id
@@ -101,6 +179,7 @@ def delete_book(book_id: str) -> dict:
     book_delete_count = Book.query.filter(Book.id==book_id).delete()
 
     db.session.commit()
+    invalidate_books(book_ids=[book_id])
 
     response = BaseResponse(
         message=f"Succesfully deleted Book with id: {book_id}",
@@ -108,6 +187,29 @@ def delete_book(book_id: str) -> dict:
     
     return response.toDict()
 
+@replica_read
+def search_books(q: str, limit: int, offset: int = 0) -> tuple[list[dict], str | None]:
+    """ Full-text search of books by title and description, best matches first
+
+    Args:
+        q (str): search text
+        limit (int): maximum number of books to return
+        offset (int): number of matches on the previous pages
+
+    Returns:
+        tuple[list[dict], str | None]: matching books on the page and cursor of the next page, None on last page
+    """
+    query = search_select(serializer=book_serializer, q=q, dialect=db.session.get_bind().dialect.name)
+
+    # Fetching one extra row tells whether a next page exists without a count query
+    books = db.session.execute(query.offset(offset).limit(limit + 1)).all()
+    has_next = len(books) > limit
+
+    next_cursor = encode_offset_cursor(offset + limit) if has_next else None
+
+    return book_serializer.serialize_rows(books[:limit]), next_cursor
+
+@replica_read
 def get_books_by_author(author_id: str) -> list[dict]:
     """ Get all the books by a specific author
 
@@ -117,9 +219,152 @@ def get_books_by_author(author_id: str) -> list[dict]:
     Returns:
         list[dict]: list of book objects by the author
     """
-    books = Book.query.filter(Book.author_id == author_id).all()
-    books_list = []
-    for book in books:
-        books_list.append(book.toDict())
+    books = db.session.execute(book_serializer.select().where(Book.author_id == author_id))
+
+    return book_serializer.serialize_rows(books)
+
+def _existing_author_ids(author_ids: set[str]) -> set[str]:
+    """ Subset of author ids present in database, checked with one query so batch items can fail individually """
+    return set(db.session.scalars(select(Author.id).where(Author.id.in_(author_ids))))
+
+def create_many_books(validated_items: list[tuple[int, dict]]) -> dict[int, dict]:
+    """ Creates books from validated batch items in a single transaction
+
+    Args:
+        validated_items (list[tuple[int, dict]]): (request index, validated book fields) pairs
+
+    Returns:
+        dict[int, dict]: batch result entry of every item keyed by request index
+    """
+    results = {}
+    if not validated_items:
+        return results
+
+    existing_author_ids = _existing_author_ids({item['author_id'] for _, item in validated_items})
+
+    indexes = []
+    rows = []
+    for index, item in validated_items:
+        if item['author_id'] not in existing_author_ids:
+            results[index] = batch_error(index=index, message=f"Author with id={item['author_id']} does not exist")
+            continue
+        indexes.append(index)
+        rows.append({
+            "id": new_id(),
+            "title": item['title'],
+            "description": item['description'],
+            "publish_date": item['publish_date'],
+            "author_id": item['author_id'],
+        })
+
+    if rows:
+        # Single multi-row INSERT ... RETURNING, rows come back in parameter order
+        created = db.session.execute(insert(Book).returning(*book_serializer.columns, sort_by_parameter_order=True), rows)
+        for index, row in zip(indexes, created):
+            results[index] = batch_success(index=index, data=book_serializer.serialize_row(row))
+
+    db.session.commit()
+    invalidate_books(book_ids=[row['id'] for row in rows])
+
+    return results
+
+def put_many_books(validated_items: list[tuple[int, dict]]) -> dict[int, dict]:
+    """ Updates books from validated batch items in a single transaction
+
+    Args:
+        validated_items (list[tuple[int, dict]]): (request index, validated book fields including id) pairs
+
+    Returns:
+        dict[int, dict]: batch result entry of every item keyed by request index
+    """
+    results = {}
+    if not validated_items:
+        return results
+
+    ids = {item['id'] for _, item in validated_items}
+    existing_ids = set(db.session.scalars(select(Book.id).where(Book.id.in_(ids))))
+    existing_author_ids = _existing_author_ids({item['author_id'] for _, item in validated_items})
+
+    rows = []
+    for index, item in validated_items:
+        if item['id'] not in existing_ids:
+            results[index] = batch_error(index=index, message=f"Book with id={item['id']} does not exist")
+            continue
+        if item['author_id'] not in existing_author_ids:
+            results[index] = batch_error(index=index, message=f"Author with id={item['author_id']} does not exist")
+            continue
+        rows.append({
+            "id": item['id'],
+            "title": item['title'],
+            "description": item['description'],
+            "publish_date": item['publish_date'],
+            "author_id": item['author_id'],
+        })
+
+    if rows:
+        # Bulk UPDATE by primary key, executed as one executemany
+        db.session.execute(update(Book), rows)
+        updated_ids = {row['id'] for row in rows}
+        updated = db.session.execute(book_serializer.select().where(Book.id.in_(updated_ids)))
+        updated_by_id = { book['id']: book for book in book_serializer.serialize_rows(updated) }
+        for index, item in validated_items:
+            if index not in results:
+                results[index] = batch_success(index=index, data=updated_by_id[item['id']])
+
+    db.session.commit()
+    invalidate_books(book_ids=[row['id'] for row in rows])
+
+    return results
+
+def delete_many_books(validated_items: list[tuple[int, str]]) -> dict[int, dict]:
+    """ Deletes books with the given ids in a single transaction
+
+    Args:
+        validated_items (list[tuple[int, str]]): (request index, book id) pairs
+
+    Returns:
+        dict[int, dict]: batch result entry of every item keyed by request index
+    """
+    results = {}
+    if not validated_items:
+        return results
+
+    ids = {book_id for _, book_id in validated_items}
+    existing_ids = set(db.session.scalars(select(Book.id).where(Book.id.in_(ids))))
+
+    db.session.execute(delete(Book).where(Book.id.in_(existing_ids)).execution_options(synchronize_session=False))
+    db.session.commit()
+    invalidate_books(book_ids=existing_ids)
+
+    for index, book_id in validated_items:
+        if book_id in existing_ids:
+            results[index] = batch_success(index=index, data={"id": book_id})
+        else:
+            results[index] = batch_error(index=index, message=f"Book with id={book_id} does not exist")
+
+    return results
+
+@replica_read
+def get_many_books(validated_items: list[tuple[int, str]]) -> dict[int, dict]:
+    """ Retrieves books with the given ids, from the entity cache and one query for the misses
+
+    Args:
+        validated_items (list[tuple[int, str]]): (request index, book id) pairs
+
+    Returns:
+        dict[int, dict]: batch result entry of every item keyed by request index
+    """
+    books = entity_cache.get_many_or_load(BOOKS, (book_id for _, book_id in validated_items), _load_books)
+
+    results = {}
+    for index, book_id in validated_items:
+        if book_id in books:
+            results[index] = batch_success(index=index, data=books[book_id])
+        else:
+            results[index] = batch_error(index=index, message=f"Book with id={book_id} does not exist")
+
+    return results
 
-    return books_list
\ No newline at end of file
+def _load_books(book_ids: list[str]) -> dict[str, dict]:
+    rows = db.session.execute(book_serializer.select().where(Book.id.in_(book_ids)))
+    return { book['id']: book for book in book_serializer.serialize_rows(rows) }
@@ -1,9 +1,17 @@
 from flask import jsonify, request
+from datetime import date, datetime
 
 from ..app import app
-from .controller import list_all_books, create_book, get_book, put_book, delete_book, get_books_by_author
+from .book import book_serializer
+from .controller import list_all_books, stream_all_books, create_book, get_book, get_book_last_updated, get_books_collection_stats, put_book, delete_book, get_books_by_author, search_books, create_many_books, put_many_books, delete_many_books, get_many_books
 from ..util.responses import BaseResponse
-from ..util.validators import id_schema, create_update_book_schema
+from ..util.validators import id_schema, create_update_book_schema, batch_update_book_schema, search_text_schema
+from ..util.batch import DuplicateIdError, validate_batch, batch_response, wants_ids, parse_ids_arg
+from ..util.pagination import parse_page_args, parse_offset_page_args, page_cache_key, next_page_headers
+from ..util.streaming import wants_stream, ndjson_response
+from ..util.listing import parse_sort, parse_fields, parse_date_range
+from ..util.caching import BOOKS, book_key, book_version_key, author_books_key, list_key, cached_value, is_cacheable
+from ..util.conditional import Version, conditional, resource_version, collection_version
 from ..extensions import cache
 
 
@@ -11,23 +19,92 @@ from ..extensions import cache
 
 logger = app.logger
 
+# Whitelisted sort keys of GET /books, each backed by a (key, id) index, and the python type of their values
+SORTS = {"created_on": datetime, "publish_date": date}
+
 def id_cache_key(book_id: str) -> str:
-    return book_id
+    return book_key(book_id)
 
 def aid_cache_key(author_id: str) -> str:
-    return 'books' + author_id
+    return author_books_key(author_id)
+
+def list_cache_key() -> str:
+    return list_key(BOOKS, page_cache_key("page"))
+
+def id_version(book_id: str) -> Version:
+    validated_id = id_schema.validate(book_id)
+    last_updated_on = cached_value(book_version_key(validated_id), lambda: get_book_last_updated(book_id=validated_id))
+    return resource_version(validated_id, last_updated_on)
+
+def aid_version(author_id: str) -> Version:
+    validated_id = id_schema.validate(author_id)
+    max_last_updated_on, count = cached_value(list_key(BOOKS, f"author:{validated_id}:version"), lambda: get_books_collection_stats(author_id=validated_id))
+    return collection_version(max_last_updated_on, count, validated_id)
+
+# Streamed exports and lookups by ?ids= bypass the list response cache, ids are read through the entity cache
+def bypasses_list_cache() -> bool:
+    return wants_stream() or wants_ids()
+
+# Batch get result of books by id, in request order with an error entry for every unknown or invalid id
+def batch_get(ids: list) -> dict:
+    validated_items, results = validate_batch(items=ids, schema=id_schema)
+    results.update(get_many_books(validated_items=validated_items))
+    return batch_response(item_count=len(ids), results=results)
+
+def list_version() -> Version:
+    max_last_updated_on, count = cached_value(list_key(BOOKS, "version"), get_books_collection_stats)
+    return collection_version(max_last_updated_on, count, page_cache_key("page"))
+
+# Search results are cached and versioned per search text and page, and change with any book write
+def search_cache_key() -> str:
+    return list_key(BOOKS, page_cache_key("search"))
+
+def search_version() -> Version:
+    max_last_updated_on, count = cached_value(list_key(BOOKS, "version"), get_books_collection_stats)
+    return collection_version(max_last_updated_on, count, page_cache_key("search"))
 
 
 @app.route("/books", methods=['GET'])
-@cache.cached(timeout=10, key_prefix="getbooks")
+@conditional(version=list_version, unless=bypasses_list_cache)
+@cache.cached(make_cache_key=list_cache_key, unless=bypasses_list_cache, response_filter=is_cacheable)
 def list_books():
     try:
-        return jsonify(list_all_books())
+        if wants_stream():
+            return ndjson_response(rows=stream_all_books())
+        # Specific books with ?ids=a,b,c, same response as POST /books:batchGet
+        if wants_ids():
+            return jsonify(batch_get(ids=parse_ids_arg()))
+        # Filters, sort and projected fields from query arguments
+        sort, sort_type, descending = parse_sort(sorts=SORTS)
+        limit, after = parse_page_args(sort=sort, sort_type=sort_type)
+        author_id = request.args.get("author_id")
+        publish_date_from, publish_date_to = parse_date_range("publish_date")
+        books, next_cursor = list_all_books(
+            limit=limit, after=after, sort=sort, descending=descending, serializer=parse_fields(book_serializer),
+            author_id=id_schema.validate(author_id) if author_id is not None else None,
+            publish_date_from=publish_date_from, publish_date_to=publish_date_to,
+        )
+        return jsonify(books), 200, next_page_headers(next_cursor=next_cursor, limit=limit)
     except Exception as e:
         logger.error(msg=f"GET /book failed with message: {str(e)}", exc_info=True)
         response = BaseResponse(message=f"There was a problem getting all the book objects: {str(e)}")
     return jsonify(response.toDict()), 500
 
+@app.route("/books/search", methods=['GET'])
+@conditional(version=search_version)
+@cache.cached(make_cache_key=search_cache_key, response_filter=is_cacheable)
+def search_books_by_text():
+    try:
+        # Search text from the q query argument, results are ranked by relevance and paginated
+        q = search_text_schema.validate(request.args.get("q"))
+        limit, offset = parse_offset_page_args()
+        books, next_cursor = search_books(q=q, limit=limit, offset=offset)
+        return jsonify(books), 200, next_page_headers(next_cursor=next_cursor, limit=limit)
+    except Exception as e:
+        logger.error(msg=f"GET /books/search failed with message: {str(e)}", exc_info=True)
+        response = BaseResponse(message=f"There was a problem searching the book objects: {str(e)}")
+        return jsonify(response.toDict()), 500
+
 @app.route("/books", methods=['POST'])
 def create_books():
     try:
@@ -39,7 +116,8 @@ def create_books():
         return jsonify(response.toDict()), 500
     
 @app.route("/books/<book_id>", methods=['GET'])
-@cache.cached(timeout=10, make_cache_key=id_cache_key)
+@conditional(version=id_version)
+@cache.cached(make_cache_key=id_cache_key, response_filter=is_cacheable)
 def get_book_by_id(book_id):
     try:
         validated_id = id_schema.validate(book_id)
@@ -51,7 +129,6 @@ def get_book_by_id(book_id):
 
 
 @app.route("/books/<book_id>", methods=['PUT'])
-@cache.cached(timeout=10, make_cache_key=id_cache_key)
 def put_book_by_id(book_id):
     try:
         validated_id = id_schema.validate(book_id)
@@ -63,7 +140,6 @@ def put_book_by_id(book_id):
         return jsonify(response.toDict()), 500
 
 @app.route("/books/<book_id>", methods=['DELETE'])
-@cache.cached(timeout=10, make_cache_key=id_cache_key)
 def delete_book_by_id(book_id):
     try:
         validated_id = id_schema.validate(book_id)
@@ -74,7 +150,8 @@ def delete_book_by_id(book_id):
         return jsonify(response.toDict()), 500
     
 @app.route("/authors/<author_id>/books", methods=["GET"])
-@cache.cached(timeout=10, make_cache_key=aid_cache_key)
+@conditional(version=aid_version)
+@cache.cached(make_cache_key=aid_cache_key, response_filter=is_cacheable)
 def get_books_of_author(author_id):
     try:
         validated_id = id_schema.validate(author_id)
@@ -82,4 +159,54 @@ def get_books_of_author(author_id):
     except Exception as e:
         logger.error(msg=f"GET /author/{author_id}/books failed with message: {str(e)}", exc_info=True)
         response = BaseResponse(message=f"There was a problem getting the book objects of Authors with id={author_id}: {str(e)}")
-        return jsonify(response.toDict()), 500
\ No newline at end of file
+        return jsonify(response.toDict()), 500
+
+@app.route("/books:batch", methods=['POST'])
+def create_books_batch():
+    try:
+        request_json = request.get_json()
+        validated_items, results = validate_batch(items=request_json, schema=create_update_book_schema)
+        results.update(create_many_books(validated_items=validated_items))
+        return jsonify(batch_response(item_count=len(request_json), results=results))
+    except Exception as e:
+        logger.error(msg=f"POST /books:batch failed with message: {str(e)}", exc_info=True)
+        response = BaseResponse(message=f"There was a problem creating the book objects: {str(e)}")
+        return jsonify(response.toDict()), 500
+
+@app.route("/books:batch", methods=['PUT'])
+def put_books_batch():
+    try:
+        request_json = request.get_json()
+        validated_items, results = validate_batch(items=request_json, schema=batch_update_book_schema, unique_key="id")
+        results.update(put_many_books(validated_items=validated_items))
+        return jsonify(batch_response(item_count=len(request_json), results=results))
+    except DuplicateIdError as e:
+        # Ambiguous request rather than a failure of the server
+        response = BaseResponse(message=f"There was a problem updating the book objects: {str(e)}")
+        return jsonify(response.toDict()), 400
+    except Exception as e:
+        logger.error(msg=f"PUT /books:batch failed with message: {str(e)}", exc_info=True)
+        response = BaseResponse(message=f"There was a problem updating the book objects: {str(e)}")
+        return jsonify(response.toDict()), 500
+
+@app.route("/books:batch", methods=['DELETE'])
+def delete_books_batch():
+    try:
+        request_json = request.get_json()
+        validated_items, results = validate_batch(items=request_json, schema=id_schema)
+        results.update(delete_many_books(validated_items=validated_items))
+        return jsonify(batch_response(item_count=len(request_json), results=results))
+    except Exception as e:
+        logger.error(msg=f"DELETE /books:batch failed with message: {str(e)}", exc_info=True)
+        response = BaseResponse(message=f"There was a problem deleting the book objects: {str(e)}")
+        return jsonify(response.toDict()), 500
+
+@app.route("/books:batchGet", methods=['POST'])
+def get_books_batch():
+    try:
+        # JSON array of book ids, looked up with one cache multi-get and one query for the misses
+        return jsonify(batch_get(ids=request.get_json()))
+    except Exception as e:
+        logger.error(msg=f"POST /books:batchGet failed with message: {str(e)}", exc_info=True)
+        response = BaseResponse(message=f"There was a problem getting the book objects: {str(e)}")
+        return jsonify(response.toDict()), 500
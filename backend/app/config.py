@@ -1,7 +1,152 @@
 import os
+import tempfile
+
+from sqlalchemy.engine import make_url
+
+from app.metrics.pool import InstrumentedQueuePool, InstrumentedAsyncQueuePool
+
+def env_flag(name: str, default: bool) -> bool:
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes')
+
+def engine_options(uri: str) -> dict:
+    """ SQLAlchemy engine options for the given connection string, tuned through environment variables
+
+    Args:
+        uri (str): database connection string
+
+    Returns:
+        dict: keyword arguments for create_engine
+    """
+    url = make_url(uri)
+
+    # SQLite uses driver specific pools set up by Flask-SQLAlchemy, only server databases are pooled here
+    if url.get_backend_name() == 'sqlite':
+        return {}
+
+    options = {
+        # Async drivers (asyncpg) need the asyncio adapted queue
+        'poolclass': InstrumentedAsyncQueuePool if url.get_dialect().is_async else InstrumentedQueuePool,
+        # Persistent connections per worker process, plus temporary ones allowed under load spikes
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        # Seconds a request waits for a free connection before failing
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        # Connections older than this are replaced, avoids using connections closed by the server or proxies
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        # Checks connections with a lightweight ping on checkout, avoids errors after DB restarts
+        'pool_pre_ping': env_flag('DB_POOL_PRE_PING', True),
+    }
+
+    if url.get_backend_name() == 'postgresql':
+        # Server side limit on statement run time in milliseconds, 0 disables it
+        statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+        if url.get_driver_name() == 'asyncpg':
+            options['connect_args'] = {'server_settings': {'statement_timeout': str(statement_timeout)}}
+        else:
+            options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+
+        if url.get_driver_name() == 'psycopg2':
+            # values_plus_batch also batches executemany UPDATE/DELETE, used by batch endpoints
+            options['executemany_mode'] = os.environ.get('DB_EXECUTEMANY_MODE', 'values_plus_batch')
+
+    return options
+
+def replica_binds(uris: list[str]) -> dict:
+    """ Flask-SQLAlchemy binds of the read replicas, named replica0, replica1, ...
+
+    Args:
+        uris (list[str]): connection strings of the read replicas
+
+    Returns:
+        dict: SQLALCHEMY_BINDS entries with the same engine options as the primary
+    """
+    return {f'replica{index}': {'url': uri, **engine_options(uri)} for index, uri in enumerate(uris)}
+
+# Async drivers used by the ASGI mode for each database backend
+ASYNC_DRIVERS = {'postgresql': 'asyncpg', 'sqlite': 'aiosqlite'}
+
+def async_database_uri(uri: str) -> str:
+    """ Connection string of the same database for the async engine of the ASGI mode
+
+    Args:
+        uri (str): database connection string of the sync engine
+
+    Raises:
+        ValueError: database backend has no supported async driver
+
+    Returns:
+        str: connection string using asyncpg on Postgres and aiosqlite on SQLite
+    """
+    url = make_url(uri)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver configured for {url.get_backend_name()}")
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}").render_as_string(hide_password=False)
 
 # Configuration class for flask app config
 class Config:
     # Setting config variable for SQLAlchemy DB Connection String
     # When it is undefined as in testing mode, defaults to in memory SQLite DB allowing for test w/o docker
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DB_CONNECTION_STRING', 'sqlite://')
\ No newline at end of file
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DB_CONNECTION_STRING', 'sqlite://')
+    # Connection pool and driver settings, see engine_options
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    # Read replicas as comma separated connection strings, read-only controllers are routed to them (app/util/replicas.py)
+    DB_REPLICA_URIS = [uri.strip() for uri in os.environ.get('DB_REPLICA_CONNECTION_STRINGS', '').split(',') if uri.strip()]
+    SQLALCHEMY_BINDS = replica_binds(DB_REPLICA_URIS)
+    # Seconds between health checks of a replica, a failed replica is skipped until its next check
+    DB_REPLICA_HEALTH_INTERVAL = float(os.environ.get('DB_REPLICA_HEALTH_INTERVAL', 5))
+    # Seconds the writing client's reads, and responses computed for the cache, stay on the primary after a committed write,
+    # should exceed the replication lag
+    DB_REPLICA_READ_AFTER_WRITE = float(os.environ.get('DB_REPLICA_READ_AFTER_WRITE', 5))
+    # Database of the async engine in ASGI mode (asgi.py), defaults to the same database through asyncpg / aiosqlite
+    SQLALCHEMY_ASYNC_DATABASE_URI = os.environ.get('DB_ASYNC_CONNECTION_STRING')
+    # Schema setup at startup: create (db.create_all), migrate (Alembic upgrade) or none
+    DB_SCHEMA_MODE = os.environ.get('DB_SCHEMA_MODE', 'create')
+    # UUID version of generated ids, 4 (random) or 7 (time-ordered, better primary key index locality)
+    ID_UUID_VERSION = int(os.environ.get('ID_UUID_VERSION', 4))
+    # Default and maximum page size for keyset paginated list endpoints
+    PAGE_SIZE_DEFAULT = int(os.environ.get('PAGE_SIZE_DEFAULT', 100))
+    PAGE_SIZE_MAX = int(os.environ.get('PAGE_SIZE_MAX', 1000))
+    # Maximum number of items accepted by a single batch request
+    BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 1000))
+
+    # JSON responses are encoded with orjson when it is installed, set to false to use stdlib json
+    JSON_USE_ORJSON = env_flag('JSON_USE_ORJSON', True)
+
+    # Opt-in request profiling (app/metrics/profiling.py), off unless PROFILING_ENABLED is set
+    PROFILING_ENABLED = env_flag('PROFILING_ENABLED', False)
+    # Requests carrying this header are profiled, its value has to match PROFILING_TOKEN when set
+    PROFILING_HEADER = os.environ.get('PROFILING_HEADER', 'X-Profile')
+    PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN')
+    # Fraction of all requests profiled without the header, 0 disables sampling
+    PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+    # cprofile writes pstats files, sampling writes collapsed stacks for flame graphs
+    PROFILING_MODE = os.environ.get('PROFILING_MODE', 'cprofile')
+    PROFILING_INTERVAL_MS = float(os.environ.get('PROFILING_INTERVAL_MS', 1))
+    PROFILING_DIR = os.environ.get('PROFILING_DIR', os.path.join(tempfile.gettempdir(), 'flaskapi-profiles'))
+
+    # Cache backend, SimpleCache keeps a separate cache per worker process
+    # Set to app.util.cache_backends.SharedRedisCache to share one Redis-protocol server between all workers
+    CACHE_TYPE = os.environ.get('CACHE_TYPE') or 'SimpleCache'
+    CACHE_DEFAULT_TIMEOUT = int(os.environ.get('CACHE_DEFAULT_TIMEOUT', 300))
+    # Seconds an expired cached response is still served while one background refresh recomputes it, 0 disables it
+    CACHE_STALE_TTL = int(os.environ.get('CACHE_STALE_TTL', 60))
+    # Probabilistic early refresh of cached responses before they expire, higher refreshes earlier and 0 disables it
+    CACHE_EARLY_EXPIRY_BETA = float(os.environ.get('CACHE_EARLY_EXPIRY_BETA', 1.0))
+    # Seconds callers wait for another caller computing the same missing response before computing it themselves,
+    # each waiting caller holds a worker thread meanwhile (gthread), so about the time of a slow uncached request
+    CACHE_LOCK_TIMEOUT = float(os.environ.get('CACHE_LOCK_TIMEOUT', 2))
+    CACHE_KEY_PREFIX = os.environ.get('CACHE_KEY_PREFIX', 'flaskapi:')
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    # Lifetime of local fallback entries and delay before retrying Redis after it became unreachable
+    CACHE_FALLBACK_TIMEOUT = int(os.environ.get('CACHE_FALLBACK_TIMEOUT', 5))
+    CACHE_REDIS_RETRY_INTERVAL = int(os.environ.get('CACHE_REDIS_RETRY_INTERVAL', 5))
+
+    # In-process LRU of single authors and books (app/util/entity_cache.py), bounded by entries and estimated bytes
+    # On by default only with SharedRedisCache, whose invalidation channel reaches the LRU of every worker process
+    ENTITY_CACHE_ENABLED = env_flag('ENTITY_CACHE_ENABLED', CACHE_TYPE.endswith('SharedRedisCache'))
+    ENTITY_CACHE_MAX_ENTRIES = int(os.environ.get('ENTITY_CACHE_MAX_ENTRIES', 100000))
+    ENTITY_CACHE_MAX_BYTES = int(os.environ.get('ENTITY_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    ENTITY_CACHE_TTL = int(os.environ.get('ENTITY_CACHE_TTL', 300))
+    # Near cache mode: local misses are looked up in the shared cache backend before the database
+    ENTITY_CACHE_SHARED = env_flag('ENTITY_CACHE_SHARED', False)
@@ -1,10 +1,17 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask_caching import Cache
+from app.metrics.instrumentation import InstrumentedCache
+from app.util.replicas import RoutingSession
+from app.util.entity_cache import EntityCache
 
 # Instantiating Flask extension objects
 
 # Database object storing all models and for interacting with DB
-db = SQLAlchemy()
+# Sessions route read-only controllers to read replicas when they are configured
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
-# Cache object storing all cached preferences and results
-cache = Cache(config={'CACHE_TYPE': 'SimpleCache'})
\ No newline at end of file
+# Cache object storing all cached preferences and results, backend configured through Config.CACHE_TYPE
+# Cached views report their hits and misses to the request metrics
+cache = InstrumentedCache()
+
+# Bounded in-process LRU of single authors and books, below the response cache
+entity_cache = EntityCache()
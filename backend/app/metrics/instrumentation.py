@@ -0,0 +1,180 @@
+import functools
+import time
+from flask import Flask, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .prometheus import Counter, Histogram, registry
+from ..util.json_provider import FastJSONProvider
+from ..util.revalidation import RevalidatingCache
+
+# Hot path instrumentation of requests, exposed by GET /metrics:
+# * latency per route, method and status
+# * SQL statements per request and time per statement, per route; a route whose statement count
+#   grows with the page size is an N+1 pattern
+# * hits, misses and stale responses of the @cache.cached response caches, per route
+# * time spent encoding response bodies as JSON, per route
+#
+# Per request totals are collected on flask.g and observed once when the request is torn down,
+# after streamed responses have been sent completely.
+
+# Route label of statements and JSON encoding outside of requests, e.g. schema setup
+NO_ROUTE = "none"
+# Route label of requests not matching any route
+UNMATCHED_ROUTE = "unmatched"
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100, 250)
+QUERY_SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SERIALIZATION_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Time from request start until the response has been sent", ("route", "method", "status")))
+request_queries = registry.register(Histogram(
+    "db_queries_per_request", "SQL statements executed by one request", ("route", "method"), buckets=QUERY_COUNT_BUCKETS))
+request_query_seconds = registry.register(Histogram(
+    "db_query_seconds_per_request", "Total SQL statement time of one request", ("route", "method"), buckets=QUERY_SECONDS_BUCKETS))
+query_duration = registry.register(Histogram(
+    "db_query_duration_seconds", "Time of a single SQL statement", ("route",), buckets=QUERY_SECONDS_BUCKETS))
+cache_requests = registry.register(Counter(
+    "cache_requests_total", "Lookups of cached responses by result (hit, miss or stale)", ("route", "result")))
+serialization_duration = registry.register(Histogram(
+    "serialization_duration_seconds", "JSON encoding time of the response body of one request", ("route", "method"), buckets=SERIALIZATION_BUCKETS))
+
+class RequestMetrics(object):
+    """ Totals of the current request, only touched by the thread serving it """
+    __slots__ = ("start", "status", "queries", "query_seconds", "serialization_seconds", "cache_result")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.status = 500
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.serialization_seconds = 0.0
+        self.cache_result = None
+
+def current_metrics() -> RequestMetrics | None:
+    return getattr(g, "request_metrics", None) if has_app_context() else None
+
+def current_route() -> str:
+    if not has_request_context():
+        return NO_ROUTE
+    return request.url_rule.rule if request.url_rule is not None else UNMATCHED_ROUTE
+
+def _before_request() -> None:
+    g.request_metrics = RequestMetrics()
+
+def _after_request(response):
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.status = response.status_code
+    return response
+
+def _teardown_request(exception) -> None:
+    metrics = current_metrics()
+    if metrics is None:
+        return
+    route, method = current_route(), request.method
+    request_duration.observe(time.perf_counter() - metrics.start, route=route, method=method, status=str(metrics.status))
+    request_queries.observe(metrics.queries, route=route, method=method)
+    request_query_seconds.observe(metrics.query_seconds, route=route, method=method)
+    if metrics.serialization_seconds:
+        serialization_duration.observe(metrics.serialization_seconds, route=route, method=method)
+    if metrics.cache_result is not None:
+        cache_requests.inc(route=route, result=metrics.cache_result)
+    g.pop("request_metrics", None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_start"].pop()
+    query_duration.observe(seconds, route=current_route())
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.queries += 1
+        metrics.query_seconds += seconds
+
+def _handle_error(exception_context):
+    # Failed statements never reach after_cursor_execute
+    start_times = exception_context.connection.info.get("query_start") if exception_context.connection is not None else None
+    if start_times:
+        start_times.pop()
+
+def instrument_queries(engine: Engine) -> None:
+    """ Registers cursor event listeners counting and timing every SQL statement
+
+    Args:
+        engine (Engine): engine to instrument, the sync_engine of async engines
+    """
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+def instrument_app(app: Flask) -> None:
+    """ Registers request hooks collecting the request metrics of app """
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+def _add_serialization_time(start: float) -> None:
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.serialization_seconds += time.perf_counter() - start
+
+class InstrumentedJSONProvider(FastJSONProvider):
+    """ Flask JSON provider adding the time spent encoding JSON to the current request """
+
+    def dumps(self, obj, **kwargs) -> str:
+        start = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            _add_serialization_time(start)
+
+    def dumps_bytes(self, obj, indent: bool = False) -> bytes:
+        start = time.perf_counter()
+        try:
+            return super().dumps_bytes(obj, indent=indent)
+        finally:
+            _add_serialization_time(start)
+
+class InstrumentedCache(RevalidatingCache):
+    """ Cache whose cached() views report response cache hits, misses and stale responses of the current request """
+
+    def cached(self, *args, **kwargs):
+        def decorator(view):
+            @functools.wraps(view)
+            def compute(*view_args, **view_kwargs):
+                # Only runs when the response was not found in the cache
+                metrics = current_metrics()
+                if metrics is not None and metrics.cache_result == "hit":
+                    metrics.cache_result = "miss"
+                return view(*view_args, **view_kwargs)
+
+            cached_view = super(InstrumentedCache, self).cached(*args, **kwargs)(compute)
+
+            # Also copies the helpers RevalidatingCache.cached sets on the view: make_cache_key, uncached and cache_timeout
+            @functools.wraps(cached_view)
+            def decorated(*view_args, **view_kwargs):
+                metrics = current_metrics()
+                if metrics is not None:
+                    # Lookup counts as hit unless the view is computed or the cache is bypassed
+                    metrics.cache_result = "hit"
+                return cached_view(*view_args, **view_kwargs)
+            return decorated
+        return decorator
+
+    def _on_stale(self) -> None:
+        metrics = current_metrics()
+        if metrics is not None:
+            metrics.cache_result = "stale"
+
+    def _bypass_cache(self, unless, f, *args, **kwargs) -> bool:
+        bypass = super()._bypass_cache(unless, f, *args, **kwargs)
+        metrics = current_metrics()
+        if bypass and metrics is not None:
+            # e.g. streamed exports, neither hit nor miss
+            metrics.cache_result = None
+        return bypass
@@ -0,0 +1,153 @@
+import functools
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Connection pool metrics: checkouts, time spent waiting for a connection, overflow connections and
+# pool timeouts. Counters are per worker process and per engine, keyed by the engine's bind name.
+
+# Name of the primary (default bind) engine's metrics
+PRIMARY_POOL = "primary"
+
+class PoolMetrics(object):
+    """ Counters of one engine's connection pool
+
+    Args:
+        engine (Engine): engine whose pool is counted and reported
+    """
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.checkins = 0
+            self.connects = 0
+            self.invalidations = 0
+            self.overflow_events = 0
+            self.timeouts = 0
+            self.wait_seconds_total = 0.0
+            self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def increment(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self) -> dict:
+        """ Current counters together with the live state of the engine's pool
+
+        Returns:
+            dict: counters and pool gauges
+        """
+        # The engine replaces its pool on dispose(), so the current one is looked up on every snapshot
+        pool = self.engine.pool
+        with self._lock:
+            snapshot = {
+                "pool_class": type(pool).__name__,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "overflow_events": self.overflow_events,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+            }
+        # Gauges only exist on queue pools (Postgres, SQLite files), not on the static in-memory SQLite pool
+        if isinstance(pool, QueuePool):
+            snapshot.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+            })
+        return snapshot
+
+# Metrics of this worker process, keyed by the bind name of their engine
+pool_metrics: dict[str, PoolMetrics] = {}
+
+class InstrumentedQueuePool(QueuePool):
+    """ QueuePool measuring how long each checkout waits in the queue and counting overflow connections and timeouts
+
+    The counters go to the PoolMetrics attached by instrument_engine, nothing is counted before.
+    """
+
+    metrics: PoolMetrics | None = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Only the wait for a connection returned to the queue is timed, not opening a new one
+        self._queue_get = self._pool.get
+        self._pool.get = self._timed_queue_get
+
+    def _timed_queue_get(self, block: bool = True, timeout: float | None = None):
+        start = time.perf_counter()
+        try:
+            return self._queue_get(block, timeout)
+        finally:
+            if self.metrics is not None:
+                self.metrics.record_wait(time.perf_counter() - start)
+
+    def _inc_overflow(self) -> bool:
+        # QueuePool._inc_overflow, which also runs for the connections within pool_size (overflow starts at
+        # -pool_size). Whether the new connection goes beyond pool_size is decided under the same lock.
+        with self._overflow_lock:
+            if self._max_overflow > -1 and self._overflow >= self._max_overflow:
+                return False
+            self._overflow += 1
+            overflowed = self._overflow > 0
+        if overflowed and self.metrics is not None:
+            self.metrics.increment("overflow_events")
+        return True
+
+    def connect(self):
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.increment("timeouts")
+            raise
+
+    def recreate(self) -> QueuePool:
+        # Pool of Engine.dispose() keeps counting into the same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """ InstrumentedQueuePool for async engines, waits on an asyncio compatible queue """
+
+def instrument_engine(engine: Engine, name: str = PRIMARY_POOL) -> PoolMetrics:
+    """ Attaches PoolMetrics to engine, counting checkouts, checkins, new and invalidated connections
+
+    Args:
+        engine (Engine): engine to instrument, works with any pool class
+        name (str): bind name the metrics are reported under, replaces the metrics of another engine of that name
+
+    Returns:
+        PoolMetrics: metrics of the engine
+    """
+    metrics = pool_metrics.get(name)
+    if metrics is not None and metrics.engine is engine:
+        return metrics
+    metrics = pool_metrics[name] = PoolMetrics(engine)
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.metrics = metrics
+    event.listen(engine, "checkout", functools.partial(_count, metrics, "checkouts"))
+    event.listen(engine, "checkin", functools.partial(_count, metrics, "checkins"))
+    event.listen(engine, "connect", functools.partial(_count, metrics, "connects"))
+    event.listen(engine, "invalidate", functools.partial(_count, metrics, "invalidations"))
+    return metrics
+
+def _count(metrics: PoolMetrics, counter: str, *event_args) -> None:
+    metrics.increment(counter)
@@ -0,0 +1,260 @@
+import cProfile
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from flask import Flask, current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .instrumentation import current_route
+
+# Opt-in profiling of single requests, for finding where a slow request spends its time.
+#
+# A request is profiled when Config.PROFILING_ENABLED is set and either it carries the
+# PROFILING_HEADER (whose value has to match PROFILING_TOKEN when one is configured) or it is picked
+# by PROFILING_SAMPLE_RATE. Each profile is written to PROFILING_DIR as
+# * <id>.pstats (PROFILING_MODE=cprofile): deterministic cProfile stats, e.g. for snakeviz or pstats
+# * <id>.collapsed (PROFILING_MODE=sampling): wall clock stack samples in collapsed format, the input
+#   of flamegraph.pl / speedscope; samples taken while a statement runs end in a "SQL <statement>" frame
+# plus <id>.json with route, status, duration and the SQL statements the request issued.
+# The id is returned to the client in the X-Profile-Id response header.
+#
+# Profiles follow the thread serving the request, so they are only meaningful with the threaded
+# (WSGI) workers, not with the ASGI mode where many requests share the event loop thread. Since
+# Python 3.12 cProfile is built on sys.monitoring, which records every thread of the process, so
+# concurrent requests would end up in the profile; cprofile mode then uses the sampler instead.
+
+PROFILING_MODES = ("cprofile", "sampling")
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+# Whether cProfile only records the thread that enabled it (sys.setprofile before Python 3.12)
+CPROFILE_PER_THREAD = sys.version_info < (3, 12)
+
+# Number of requests being profiled in this process, lets the statement listeners return immediately otherwise
+_active_profiles = 0
+_active_lock = threading.Lock()
+
+# Collapsed stack frame names, "<dir>/<file>:<function>", per code object
+_frame_labels = {}
+
+def _frame_label(code) -> str:
+    label = _frame_labels.get(code)
+    if label is None:
+        path = code.co_filename.replace("\\", "/").split("/")
+        label = _frame_labels[code] = f"{'/'.join(path[-2:])}:{code.co_name}".replace(";", ":").replace(" ", "_")
+    return label
+
+def _sql_label(statement: str) -> str:
+    return "SQL " + " ".join(statement.split())[:120].replace(";", ",")
+
+class StackSampler(object):
+    """ Samples the stack of one thread at a fixed interval from a background thread
+
+    Args:
+        thread_id (int): ident of the sampled thread
+        interval (float): seconds between samples
+        profile (RequestProfile): profile whose current statement tags the samples
+    """
+
+    def __init__(self, thread_id: int, interval: float, profile: "RequestProfile"):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.profile = profile
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            frames = []
+            while frame is not None:
+                frames.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            frames.reverse()
+            statement = self.profile.current_statement
+            if statement is not None:
+                frames.append(_sql_label(statement))
+            if frames:
+                self.stacks[";".join(frames)] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+class RequestProfile(object):
+    """ Profiler and SQL statements of the current request """
+
+    def __init__(self, mode: str, interval: float):
+        self.id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.mode = mode
+        self.start = time.perf_counter()
+        self.status = None
+        self.statements = []
+        self.current_statement = None
+        self._statement_start = None
+        if mode == "cprofile":
+            self.profiler = cProfile.Profile()
+        else:
+            self.profiler = StackSampler(thread_id=threading.get_ident(), interval=interval, profile=self)
+
+    def enable(self) -> None:
+        if self.mode == "cprofile":
+            self.profiler.enable()
+        else:
+            self.profiler.start()
+
+    def disable(self) -> None:
+        if self.mode == "cprofile":
+            self.profiler.disable()
+        else:
+            self.profiler.stop()
+
+    def statement_started(self, statement: str) -> None:
+        self.current_statement = statement
+        self._statement_start = time.perf_counter()
+
+    def statement_finished(self) -> None:
+        if self.current_statement is not None:
+            self.statements.append({"sql": self.current_statement, "ms": (time.perf_counter() - self._statement_start) * 1000})
+        self.current_statement = None
+
+    def write(self, directory: str, route: str) -> None:
+        """ Writes the profile and its metadata into directory """
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"{self.id}-{request.method}-{re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'}")
+        if self.mode == "cprofile":
+            self.profiler.dump_stats(f"{base}.pstats")
+        else:
+            with open(f"{base}.collapsed", "w") as file:
+                file.write(self.profiler.collapsed())
+
+        metadata = {
+            "id": self.id,
+            "route": route,
+            "method": request.method,
+            "path": request.full_path.rstrip("?"),
+            "status": self.status,
+            "duration_ms": (time.perf_counter() - self.start) * 1000,
+            "mode": self.mode,
+            "statements": self.statements,
+        }
+        with open(f"{base}.json", "w") as file:
+            json.dump(metadata, file, indent=2)
+
+def profiling_mode(config) -> str:
+    """ PROFILING_MODE of config, sampling instead of cprofile where cProfile records all threads """
+    mode = config['PROFILING_MODE']
+    return "sampling" if mode == "cprofile" and not CPROFILE_PER_THREAD else mode
+
+def current_profile() -> RequestProfile | None:
+    if not _active_profiles or not has_app_context():
+        return None
+    return g.get("request_profile")
+
+def wants_profile(config) -> bool:
+    """ Whether the current request should be profiled
+
+    Args:
+        config: app config with the PROFILING_* settings
+
+    Returns:
+        bool: True when requested by header or picked by the sample rate
+    """
+    value = request.headers.get(config['PROFILING_HEADER'])
+    if value is not None:
+        token = config['PROFILING_TOKEN']
+        return not token or value == token
+    sample_rate = config['PROFILING_SAMPLE_RATE']
+    return sample_rate > 0 and random.random() < sample_rate
+
+def _start_profile() -> None:
+    global _active_profiles
+    config = current_app.config
+    if not config['PROFILING_ENABLED'] or not wants_profile(config):
+        return
+
+    profile = RequestProfile(mode=profiling_mode(config), interval=config['PROFILING_INTERVAL_MS'] / 1000)
+    try:
+        profile.enable()
+    except ValueError as e:
+        # Another profiler is already active in this thread
+        current_app.logger.warning(f"Could not profile {request.path}: {str(e)}")
+        return
+    with _active_lock:
+        _active_profiles += 1
+    g.request_profile = profile
+
+def _tag_response(response):
+    profile = current_profile()
+    if profile is not None:
+        profile.status = response.status_code
+        response.headers[PROFILE_ID_HEADER] = profile.id
+    return response
+
+def _finish_profile(exception) -> None:
+    global _active_profiles
+    profile = current_profile()
+    if profile is None:
+        return
+    profile.disable()
+    g.pop("request_profile", None)
+    with _active_lock:
+        _active_profiles -= 1
+    try:
+        profile.write(directory=current_app.config['PROFILING_DIR'], route=current_route())
+    except OSError as e:
+        current_app.logger.error(f"Could not write profile {profile.id}: {str(e)}")
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile()
+    if profile is not None:
+        profile.statement_started(statement)
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile()
+    if profile is not None:
+        profile.statement_finished()
+
+def instrument_profiling(engine: Engine) -> None:
+    """ Registers cursor event listeners recording the statements of engine in request profiles
+
+    Args:
+        engine (Engine): engine to instrument, e.g. the primary or a read replica
+    """
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+def init_profiling(app: Flask, engine: Engine) -> None:
+    """ Registers the profiling hooks, requests are only profiled while PROFILING_ENABLED is set
+
+    Args:
+        app (Flask): app whose requests can be profiled
+        engine (Engine): primary engine whose statements are recorded in profiles, replicas are added by init_replicas
+
+    Raises:
+        ValueError: PROFILING_MODE is not one of PROFILING_MODES
+    """
+    if app.config['PROFILING_MODE'] not in PROFILING_MODES:
+        raise ValueError(f"PROFILING_MODE must be one of {', '.join(PROFILING_MODES)}, got {app.config['PROFILING_MODE']}")
+    if app.config['PROFILING_ENABLED'] and profiling_mode(app.config) != app.config['PROFILING_MODE']:
+        app.logger.warning("PROFILING_MODE=cprofile records all threads on this Python version, profiling in sampling mode instead")
+    app.before_request(_start_profile)
+    app.after_request(_tag_response)
+    app.teardown_request(_finish_profile)
+    instrument_profiling(engine)
@@ -0,0 +1,367 @@
+import bisect
+import glob
+import json
+import logging
+import math
+import os
+import threading
+import uuid
+from collections.abc import Callable, Iterable, Sequence
+
+# Minimal Prometheus client: counters, gauges and histograms with labels, rendered in the
+# Prometheus text exposition format (version 0.0.4).
+#
+# Values are kept per process. Gunicorn serves all workers behind one port and a scrape reaches a
+# single random worker, so with several workers PROMETHEUS_MULTIPROC_DIR (same variable as the
+# official client) enables multiprocess mode: every worker writes its values to files in that
+# directory, and a scrape of any worker renders the values of all of them. Counters and histograms
+# are summed over all workers, including exited ones so they never go backwards, and gauges get a
+# `pid` label and are dropped once their worker exited (mark_process_dead, from gunicorn's child_exit).
+# The counters and histograms of an exited worker are folded into one aggregate file and its own file
+# is removed, so recycled workers (max_requests) do not grow the directory or the work of a scrape.
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Directory shared by the worker processes of one server, enables multiprocess mode
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+# Default latency buckets in seconds, same as the official Prometheus clients
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def multiprocess_dir() -> str | None:
+    return os.environ.get(MULTIPROC_DIR_ENV) or None
+
+def _gauges_path(directory: str, pid: int) -> str:
+    return os.path.join(directory, f"gauges_{pid}.json")
+
+def _aggregate_path(directory: str) -> str:
+    return os.path.join(directory, "aggregate.json")
+
+def _write_json(path: str, data: dict) -> None:
+    # Readers never see a partially written file
+    temporary_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(temporary_path, "w") as file:
+        json.dump(data, file)
+    os.replace(temporary_path, path)
+
+def _read_files(pattern: str, skip: Iterable[str] = ()) -> list[tuple[str, dict]]:
+    """ (pid, values by metric name) of every file matching pattern, except the file names in skip """
+    skip = set(skip)
+    files = []
+    for path in glob.glob(pattern):
+        if os.path.basename(path) in skip:
+            continue
+        try:
+            with open(path) as file:
+                files.append((os.path.basename(path).split("_")[1].removesuffix(".json"), json.load(file)))
+        except FileNotFoundError:
+            # Removed by mark_process_dead meanwhile
+            continue
+    return files
+
+def _read_aggregate(directory: str) -> dict:
+    """ Counters and histograms of exited workers, with the generation bumped on every merge """
+    try:
+        with open(_aggregate_path(directory)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {"generation": 0, "merged": [], "values": {}}
+
+def _add_values(total, value):
+    """ Sum of two counter values, or of two histogram series [bucket counts, sum, count] """
+    if total is None:
+        return value
+    if isinstance(value, list):
+        return [_add_values(a, b) for a, b in zip(total, value)]
+    return total + value
+
+def _read_counters(directory: str) -> list[tuple[str, dict]]:
+    """ Counter and histogram values of all live workers and the aggregate of the exited ones """
+    while True:
+        aggregate = _read_aggregate(directory)
+        # Files merged into this aggregate may still exist for a moment, they are counted by it
+        counters = _read_files(os.path.join(directory, "counters_*.json"), skip=aggregate["merged"])
+        # A merge meanwhile may have removed files this read missed, read the new state again
+        if _read_aggregate(directory)["generation"] == aggregate["generation"]:
+            return [("aggregate", aggregate["values"])] + counters
+
+def mark_process_dead(pid: int, directory: str | None = None) -> None:
+    """ Drops the gauges of an exited worker process and folds its counters and histograms into the aggregate file
+
+    Runs in a single process (gunicorn's master), so merges never race each other.
+
+    Args:
+        pid (int): pid of the exited worker
+        directory (str | None): multiprocess directory, PROMETHEUS_MULTIPROC_DIR by default
+    """
+    directory = directory or multiprocess_dir()
+    if directory is None:
+        return
+    try:
+        os.remove(_gauges_path(directory, pid))
+    except FileNotFoundError:
+        pass
+
+    paths = glob.glob(os.path.join(directory, f"counters_{pid}_*.json"))
+    if not paths:
+        return
+    aggregate = _read_aggregate(directory)
+    values = {name: {tuple(key): value for key, value in series} for name, series in aggregate["values"].items()}
+    for path in paths:
+        with open(path) as file:
+            snapshot = json.load(file)
+        for name, series in snapshot.items():
+            merged = values.setdefault(name, {})
+            for key, value in series:
+                merged[tuple(key)] = _add_values(merged.get(tuple(key)), value)
+
+    # Readers skip the merged files from the moment the aggregate includes them until they are removed
+    _write_json(_aggregate_path(directory), {
+        "generation": aggregate["generation"] + 1,
+        "merged": [os.path.basename(path) for path in paths],
+        "values": {name: [[list(key), value] for key, value in merged.items()] for name, merged in values.items()},
+    })
+    for path in paths:
+        os.remove(path)
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+class Metric(object):
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels[name] for name in self.labelnames)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    # Label names of merged multiprocess values
+    @property
+    def merged_labelnames(self) -> tuple[str, ...]:
+        return self.labelnames
+
+    def _items(self) -> list[tuple[tuple, object]]:
+        """ Copy of the labelled series of this process """
+        with self._lock:
+            return list(self._values.items())
+
+    def snapshot(self) -> list:
+        """ JSON serializable series of this process, written to the multiprocess directory """
+        return [[list(key), value] for key, value in self._items()]
+
+    def _add(self, total, value):
+        return value if total is None else total + value
+
+    def merge(self, snapshots: Iterable[tuple[str, list]]) -> dict:
+        """ Series of every process summed per labels
+
+        Args:
+            snapshots (Iterable[tuple[str, list]]): (pid, snapshot()) of every process
+
+        Returns:
+            dict: merged value of every labelled series
+        """
+        values = {}
+        for _, snapshot in snapshots:
+            for key, value in snapshot:
+                key = tuple(key)
+                values[key] = self._add(values.get(key), value)
+        return values
+
+    def samples(self, values: dict | None = None) -> Iterable[tuple[str, str, float]]:
+        """ (sample name, formatted labels, value) of every labelled series, of this process unless values are given """
+        items = self._items() if values is None else list(values.items())
+        labelnames = self.labelnames if values is None else self.merged_labelnames
+        for key, value in sorted(items):
+            yield self.name, _format_labels(labelnames, key), value
+
+    def render(self, values: dict | None = None) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in self.samples(values))
+        return lines
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    # Gauges of different processes are not added up, every process keeps its own series
+    @property
+    def merged_labelnames(self) -> tuple[str, ...]:
+        return self.labelnames + ("pid",)
+
+    def merge(self, snapshots: Iterable[tuple[str, list]]) -> dict:
+        return {tuple(key) + (pid,): value for pid, snapshot in snapshots for key, value in snapshot}
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        # Index of the first bucket whose upper bound is >= value, len(buckets) is the +Inf bucket
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per bucket counts (not cumulative), sum and count
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        series = self._values.get(self._key(labels))
+        return series[2] if series else 0
+
+    def _items(self) -> list[tuple[tuple, object]]:
+        with self._lock:
+            return [(key, [list(series[0]), series[1], series[2]]) for key, series in self._values.items()]
+
+    def _add(self, total, value):
+        if total is None:
+            return value
+        return [[a + b for a, b in zip(total[0], value[0])], total[1] + value[1], total[2] + value[2]]
+
+    def samples(self, values: dict | None = None) -> Iterable[tuple[str, str, float]]:
+        items = self._items() if values is None else list(values.items())
+        labelnames = self.labelnames + ("le",)
+        for key, (counts, total, count) in sorted(items):
+            key = tuple(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", _format_labels(labelnames, key + (_format_value(bound),)), cumulative
+            yield f"{self.name}_sum", _format_labels(self.labelnames, key), total
+            yield f"{self.name}_count", _format_labels(self.labelnames, key), count
+
+class Registry(object):
+    def __init__(self):
+        self._metrics = []
+        self._collect_hooks = []
+        # Pid and random token naming the counter file of this process, a later process reusing the pid gets its own file
+        self._process = None
+        self._writer = None
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collect_hook(self, hook: Callable[[], None]) -> None:
+        """ Registers a callable updating metrics, e.g. gauges of live state, before they are rendered or written """
+        self._collect_hooks.append(hook)
+
+    def collect(self) -> None:
+        for hook in self._collect_hooks:
+            try:
+                hook()
+            except Exception:
+                logger.exception("Metrics collect hook failed")
+
+    def reset(self) -> None:
+        for metric in self._metrics:
+            metric.reset()
+
+    def _counters_path(self, directory: str, pid: int) -> str:
+        if self._process is None or self._process[0] != pid:
+            self._process = (pid, uuid.uuid4().hex[:8])
+        return os.path.join(directory, f"counters_{pid}_{self._process[1]}.json")
+
+    def write(self, directory: str | None = None, pid: int | None = None) -> None:
+        """ Writes the values of this process to the multiprocess directory
+
+        Args:
+            directory (str | None): multiprocess directory, PROMETHEUS_MULTIPROC_DIR by default
+            pid (int | None): pid the values are written for, the current process by default
+        """
+        directory = directory or multiprocess_dir()
+        pid = pid or os.getpid()
+        gauges = {metric.name: metric.snapshot() for metric in self._metrics if isinstance(metric, Gauge)}
+        counters = {metric.name: metric.snapshot() for metric in self._metrics if not isinstance(metric, Gauge)}
+        _write_json(self._counters_path(directory, pid), counters)
+        _write_json(_gauges_path(directory, pid), gauges)
+
+    def start_writing(self, interval: float, directory: str | None = None) -> None:
+        """ Writes the values of this process every interval seconds from a daemon thread, once per process
+
+        Args:
+            interval (float): seconds between writes, scrapes see the values of other workers this late at most
+            directory (str | None): multiprocess directory, PROMETHEUS_MULTIPROC_DIR by default
+        """
+        pid = os.getpid()
+        if self._writer == pid:
+            return
+        self._writer = pid
+        stop = threading.Event()
+
+        def write_periodically():
+            while not stop.wait(interval):
+                try:
+                    self.collect()
+                    self.write(directory)
+                except Exception:
+                    logger.exception("Writing metrics to the multiprocess directory failed")
+
+        threading.Thread(target=write_periodically, name="metrics-writer", daemon=True).start()
+
+    def render(self) -> str:
+        """ All registered metrics in the Prometheus text format, of every worker process in multiprocess mode """
+        self.collect()
+        directory = multiprocess_dir()
+        if directory is None:
+            return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+        # Values of this process are always current, other processes as of their last write
+        self.write(directory)
+        counters = _read_counters(directory)
+        gauges = _read_files(os.path.join(directory, "gauges_*.json"))
+        lines = []
+        for metric in self._metrics:
+            files = gauges if isinstance(metric, Gauge) else counters
+            lines.extend(metric.render(metric.merge((pid, values.get(metric.name, [])) for pid, values in files)))
+        return "\n".join(lines) + "\n"
+
+# Metrics of this worker process, exposed by GET /metrics
+registry = Registry()
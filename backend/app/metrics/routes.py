@@ -0,0 +1,42 @@
+from flask import Response, jsonify
+
+from ..app import app
+from .pool import pool_metrics
+from .prometheus import CONTENT_TYPE, Gauge, registry
+from ..util.responses import BaseResponse
+
+# Defining operational metrics endpoints
+
+logger = app.logger
+
+@app.route("/metrics/pool", methods=['GET'])
+def get_pool_metrics():
+    try:
+        # Counters of this worker process and live state of its connection pools, per engine
+        return jsonify({name: metrics.snapshot() for name, metrics in pool_metrics.items()})
+    except Exception as e:
+        logger.error(msg=f"GET /metrics/pool failed with message: {str(e)}", exc_info=True)
+        response = BaseResponse(message=f"There was a problem getting the pool metrics: {str(e)}")
+        return jsonify(response.toDict()), 500
+
+
+# Pool state in the Prometheus exposition, set from the pool snapshot on every scrape and, in multiprocess mode, every write
+pool_gauge = registry.register(Gauge("db_pool", "Connection pool counters and gauges of GET /metrics/pool", ("pool", "metric")))
+
+def collect_pool_metrics() -> None:
+    for pool, metrics in list(pool_metrics.items()):
+        for name, value in metrics.snapshot().items():
+            if isinstance(value, (int, float)):
+                pool_gauge.set(value, pool=pool, metric=name)
+
+registry.add_collect_hook(collect_pool_metrics)
+
+@app.route("/metrics", methods=['GET'])
+def get_metrics():
+    try:
+        # Request, SQL statement, cache and serialization metrics in Prometheus text format, of all workers with PROMETHEUS_MULTIPROC_DIR
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+    except Exception as e:
+        logger.error(msg=f"GET /metrics failed with message: {str(e)}", exc_info=True)
+        response = BaseResponse(message=f"There was a problem getting the metrics: {str(e)}")
+        return jsonify(response.toDict()), 500
@@ -0,0 +1,87 @@
+from collections import Counter
+
+from flask import current_app, request
+
+from .validators import Validator
+
+# Helpers for batch endpoints, where every item of a JSON array is validated and reported on individually
+
+class DuplicateIdError(ValueError):
+    """ Batch names the same resource more than once, the whole request is rejected with 400 """
+
+def validate_batch(items: list, schema: Validator, unique_key: str | None = None) -> tuple[list[tuple[int, object]], dict[int, dict]]:
+    """ Validates each item of a batch request against schema
+
+    Args:
+        items (list): JSON array from the request body
+        schema (Validator): validator every item must satisfy
+        unique_key (str | None): field that must not repeat across valid items, e.g. id of updated resources
+
+    Raises:
+        ValueError: body is not a non-empty array or exceeds BATCH_MAX_ITEMS
+        DuplicateIdError: unique_key value appears in more than one item
+
+    Returns:
+        tuple[list[tuple[int, object]], dict[int, dict]]: (index, validated item) pairs and per-item errors keyed by index
+    """
+    max_items = current_app.config["BATCH_MAX_ITEMS"]
+    if not isinstance(items, list) or len(items) == 0:
+        raise ValueError("Check that request body is a non-empty JSON array")
+    if len(items) > max_items:
+        raise ValueError(f"Check that batch contains at most {max_items} items")
+
+    validated_items, messages = schema.validate_many(items)
+    if unique_key is not None:
+        # Two writes to the same row in one statement fail or race, e.g. two inserts of one primary key
+        counts = Counter(item[unique_key] for _, item in validated_items)
+        duplicates = sorted(value for value, count in counts.items() if count > 1)
+        if duplicates:
+            raise DuplicateIdError(f"Check that every item has a unique {unique_key}, duplicated: {', '.join(duplicates)}")
+    errors = {index: batch_error(index=index, message=message) for index, message in messages.items()}
+
+    return validated_items, errors
+
+def wants_ids() -> bool:
+    """ Whether a list endpoint is asked for specific resources with ?ids=a,b,c """
+    return "ids" in request.args
+
+def parse_ids_arg() -> list[str]:
+    """ Reads the comma separated `ids` query argument of the current request
+
+    Raises:
+        ValueError: ids is empty
+
+    Returns:
+        list[str]: ids in request order, validated like batch items
+    """
+    ids = [item for item in request.args.get("ids", "").split(",") if item]
+    if not ids:
+        raise ValueError("Check that ids contains at least one comma separated id")
+    return ids
+
+def batch_error(index: int, message: str) -> dict:
+    """ Result entry for a failed batch item """
+    return {"index": index, "error": message}
+
+def batch_success(index: int, data: dict) -> dict:
+    """ Result entry for a successful batch item """
+    return {"index": index, "data": data}
+
+def batch_response(item_count: int, results: dict[int, dict]) -> dict:
+    """ Builds batch response body with results in request order
+
+    Args:
+        item_count (int): number of items in the request
+        results (dict[int, dict]): result entry of every item keyed by index
+
+    Returns:
+        dict: counts of succeeded and failed items and ordered results
+    """
+    ordered_results = [results[index] for index in range(item_count)]
+    failed = sum(1 for result in ordered_results if "error" in result)
+
+    return {
+        "succeeded": item_count - failed,
+        "failed": failed,
+        "results": ordered_results,
+    }
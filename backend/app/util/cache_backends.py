@@ -0,0 +1,195 @@
+import logging
+import os
+import threading
+import time
+
+from flask_caching.backends.rediscache import RedisCache
+from flask_caching.backends.simplecache import SimpleCache
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+# Cache backends selectable through Config.CACHE_TYPE
+
+logger = logging.getLogger(__name__)
+
+# Errors meaning the Redis server cannot be reached, anything else is a real bug and is raised
+REDIS_UNAVAILABLE_ERRORS = (RedisConnectionError, RedisTimeoutError, OSError)
+
+# Published instead of key names when the whole cache is cleared
+CLEAR_ALL_MESSAGE = "*"
+
+class SharedRedisCache(RedisCache):
+    """ Redis backed cache shared by every worker process, with a per-process fallback.
+
+    All workers read and write the same Redis (or any Redis-protocol server), so an entry computed
+    by one worker is a hit for all others and deletes are visible everywhere at once.
+
+    Deleted keys are also published on an invalidation channel. Every process subscribes to it and
+    drops those keys from its local fallback cache, which is only used while Redis is unreachable.
+    Fallback entries live at most `fallback_timeout` seconds and are discarded once Redis is back,
+    as invalidations may have been missed in the meantime.
+    """
+
+    def __init__(self, host="localhost", port=6379, password=None, db=0, default_timeout=300, key_prefix=None,
+                 invalidation_channel=None, fallback_threshold=500, fallback_timeout=5, retry_interval=5, **kwargs):
+        super().__init__(host=host, port=port, password=password, db=db, default_timeout=default_timeout, key_prefix=key_prefix, **kwargs)
+
+        self.invalidation_channel = invalidation_channel or f"{self.key_prefix}invalidations"
+        self.fallback = SimpleCache(threshold=fallback_threshold, default_timeout=fallback_timeout)
+        self.fallback_timeout = fallback_timeout
+        self.retry_interval = retry_interval
+
+        # Monotonic time before which Redis is not retried after a connection failure
+        self._retry_at = 0.0
+        self._degraded = False
+        # Callables receiving the keys of every invalidation, e.g. to drop them from other local caches
+        self.invalidation_listeners = []
+        # Pid owning the subscriber thread, threads do not survive a fork so workers start their own
+        self._listener_pid = None
+        self._listener_lock = threading.Lock()
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        kwargs.update(
+            dict(
+                invalidation_channel=config.get("CACHE_INVALIDATION_CHANNEL"),
+                fallback_threshold=config["CACHE_THRESHOLD"],
+                fallback_timeout=config.get("CACHE_FALLBACK_TIMEOUT", 5),
+                retry_interval=config.get("CACHE_REDIS_RETRY_INTERVAL", 5),
+            )
+        )
+        return super().factory(app, config, args, kwargs)
+
+    def _call(self, name: str, *args, **kwargs):
+        """ Runs cache operation on Redis, falling back to the local cache while Redis is unreachable """
+        self._ensure_listener()
+
+        if time.monotonic() >= self._retry_at:
+            try:
+                result = getattr(RedisCache, name)(self, *args, **kwargs)
+                if self._degraded:
+                    # Redis is back, local entries may have missed invalidations while it was down
+                    logger.warning("Redis cache reachable again, dropping local fallback entries")
+                    self._degraded = False
+                    self.fallback.clear()
+                return result
+            except REDIS_UNAVAILABLE_ERRORS as e:
+                logger.warning(f"Redis cache unreachable, using local fallback for {self.retry_interval}s: {str(e)}")
+                self._degraded = True
+                self._retry_at = time.monotonic() + self.retry_interval
+
+        return getattr(self.fallback, name)(*args, **kwargs)
+
+    def _fallback_timeout(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return self.fallback_timeout if timeout == 0 else min(timeout, self.fallback_timeout)
+
+    def get(self, key):
+        return self._call("get", key)
+
+    def get_many(self, *keys):
+        return self._call("get_many", *keys)
+
+    def has(self, key):
+        return self._call("has", key)
+
+    def set(self, key, value, timeout=None):
+        if time.monotonic() < self._retry_at:
+            timeout = self._fallback_timeout(timeout)
+        return self._call("set", key, value, timeout)
+
+    def add(self, key, value, timeout=None):
+        if time.monotonic() < self._retry_at:
+            timeout = self._fallback_timeout(timeout)
+        return self._call("add", key, value, timeout)
+
+    def set_many(self, mapping, timeout=None):
+        if time.monotonic() < self._retry_at:
+            timeout = self._fallback_timeout(timeout)
+        return self._call("set_many", mapping, timeout)
+
+    def inc(self, key, delta=1):
+        return self._call("inc", key, delta)
+
+    def dec(self, key, delta=1):
+        return self._call("dec", key, delta)
+
+    def delete(self, key):
+        self.fallback.delete(key)
+        result = self._call("delete", key)
+        self.publish_invalidation(key)
+        return result
+
+    def delete_many(self, *keys):
+        if not keys:
+            return []
+        self.fallback.delete_many(*keys)
+        result = self._call("delete_many", *keys)
+        self.publish_invalidation(*keys)
+        return result
+
+    def clear(self):
+        self.fallback.clear()
+        result = self._call("clear")
+        self.publish_invalidation(CLEAR_ALL_MESSAGE)
+        return result
+
+    def publish_invalidation(self, *keys: str) -> None:
+        """ Tells every worker process to drop the given keys from its local caches
+
+        Args:
+            keys (str): invalidated cache keys, or CLEAR_ALL_MESSAGE to drop everything
+        """
+        if time.monotonic() < self._retry_at:
+            return
+        try:
+            self._write_client.publish(self.invalidation_channel, "\n".join(keys))
+        except REDIS_UNAVAILABLE_ERRORS as e:
+            logger.warning(f"Could not publish cache invalidation: {str(e)}")
+
+    def on_invalidation(self, keys: list[str]) -> None:
+        """ Applies invalidation received from any worker, including this one
+
+        Args:
+            keys (list[str]): invalidated cache keys
+        """
+        if CLEAR_ALL_MESSAGE in keys:
+            self.fallback.clear()
+        else:
+            self.fallback.delete_many(*keys)
+        for listener in self.invalidation_listeners:
+            listener(keys)
+
+    def _ensure_listener(self) -> None:
+        """ Starts invalidation subscriber thread once per process """
+        pid = os.getpid()
+        if self._listener_pid == pid:
+            return
+        with self._listener_lock:
+            if self._listener_pid == pid:
+                return
+            self._listener_pid = pid
+            threading.Thread(target=self._listen, name="cache-invalidation-listener", daemon=True).start()
+
+    def _listen(self) -> None:
+        """ Subscriber loop, reconnecting with a delay whenever Redis is unreachable
+
+        Local caches are cleared on every (re)subscription, so they never keep serving entries whose
+        invalidation was published while this process was not listening.
+        """
+        while True:
+            try:
+                pubsub = self._write_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.invalidation_channel)
+                # Invalidations published before the subscription, e.g. while it was down, were missed
+                self.on_invalidation([CLEAR_ALL_MESSAGE])
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message["type"] == "message":
+                        data = message["data"]
+                        data = data.decode() if isinstance(data, bytes) else data
+                        self.on_invalidation(data.split("\n"))
+            except REDIS_UNAVAILABLE_ERRORS:
+                time.sleep(self.retry_interval)
+            except Exception:
+                logger.exception("Cache invalidation listener failed, restarting")
+                time.sleep(self.retry_interval)
@@ -0,0 +1,141 @@
+import uuid
+from collections.abc import Callable, Iterable
+from flask import Response
+
+from ..extensions import cache, entity_cache
+from .entity_cache import entity_key
+
+# Namespaced cache keys and write-through invalidation for the cached GET endpoints.
+#
+# Single resources are cached under "author:<id>" / "book:<id>" and evicted by the write controllers.
+# List responses (paginated lists and books of an author) embed a generation token of their resource
+# in the key; any write replaces the token, which makes every previously cached list unreachable
+# at once without having to know which pages or authors were cached.
+
+AUTHORS = "authors"
+BOOKS = "books"
+
+def author_key(author_id: str) -> str:
+    return f"author:{author_id}"
+
+def book_key(book_id: str) -> str:
+    return f"book:{book_id}"
+
+# Keys of conditional GET versions, evicted together with the resources they describe
+def author_version_key(author_id: str) -> str:
+    return f"{author_key(author_id)}:version"
+
+def book_version_key(book_id: str) -> str:
+    return f"{book_key(book_id)}:version"
+
+def list_generation(resource: str) -> str:
+    """ Current generation token of the lists of a resource
+
+    Args:
+        resource (str): AUTHORS or BOOKS
+
+    Returns:
+        str: token embedded in list cache keys, created when missing
+    """
+    key = f"{resource}:generation"
+    generation = cache.get(key)
+    if generation is None:
+        # add only succeeds for the first caller, everyone then reads the same token
+        cache.add(key, uuid.uuid4().hex, timeout=0)
+        generation = cache.get(key)
+    return generation
+
+def list_key(resource: str, suffix: str) -> str:
+    """ Key of a cached list, only valid until the next write to resource
+
+    Args:
+        resource (str): AUTHORS or BOOKS
+        suffix (str): part identifying the list, e.g. page arguments
+
+    Returns:
+        str: namespaced key including the current list generation
+    """
+    return f"{resource}:list:{list_generation(resource)}:{suffix}"
+
+def author_books_key(author_id: str) -> str:
+    return list_key(BOOKS, f"author:{author_id}")
+
+def with_books_key(key: str) -> str:
+    """ Key of a response embedding books of authors, e.g. ?include=books
+
+    Args:
+        key (str): key of the same response without books
+
+    Returns:
+        str: key only valid until the next author or book write
+    """
+    return f"{key}:books:{list_generation(AUTHORS)}:{list_generation(BOOKS)}"
+
+def cached_value(key: str, compute: Callable[[], object]) -> object:
+    """ Reads value from cache, computing and storing it on a miss
+
+    Args:
+        key (str): namespaced cache key
+        compute (Callable[[], object]): produces the value on a miss, None results are not cached
+
+    Returns:
+        object: cached or freshly computed value
+    """
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        if value is not None:
+            cache.set(key, value)
+    return value
+
+def invalidate_lists(resource: str) -> None:
+    """ Makes every cached list of resource unreachable by replacing its generation token """
+    cache.set(f"{resource}:generation", uuid.uuid4().hex, timeout=0)
+
+def invalidate_authors(author_ids: Iterable[str], book_ids: Iterable[str] = ()) -> None:
+    """ Evicts cached authors and author lists after a write
+
+    Args:
+        author_ids (Iterable[str]): ids of created, updated or deleted authors
+        book_ids (Iterable[str]): ids of books removed along with deleted authors
+    """
+    author_ids = list(author_ids)
+    keys = [key for author_id in author_ids for key in (author_key(author_id), author_version_key(author_id), entity_key(AUTHORS, author_id))]
+    if keys:
+        cache.delete_many(*keys)
+        entity_cache.invalidate(entity_key(AUTHORS, author_id) for author_id in author_ids)
+    invalidate_lists(AUTHORS)
+
+    # Deleting authors cascades to their books, which are gone from every book list as well
+    book_ids = list(book_ids)
+    if book_ids:
+        invalidate_books(book_ids=book_ids)
+
+def invalidate_books(book_ids: Iterable[str]) -> None:
+    """ Evicts cached books and book lists, including books of authors lists, after a write
+
+    Args:
+        book_ids (Iterable[str]): ids of created, updated or deleted books
+    """
+    book_ids = list(book_ids)
+    keys = [key for book_id in book_ids for key in (book_key(book_id), book_version_key(book_id), entity_key(BOOKS, book_id))]
+    if keys:
+        cache.delete_many(*keys)
+        entity_cache.invalidate(entity_key(BOOKS, book_id) for book_id in book_ids)
+    invalidate_lists(BOOKS)
+
+def is_cacheable(rv) -> bool:
+    """ Response filter for cached views, only successful responses are cached
+
+    Args:
+        rv: return value of the view function
+
+    Returns:
+        bool: False for error responses
+    """
+    if isinstance(rv, tuple):
+        status = rv[1] if len(rv) > 1 and isinstance(rv[1], int) else 200
+        return status == 200
+    if isinstance(rv, Response):
+        return rv.status_code == 200
+    return True
@@ -0,0 +1,98 @@
+import functools
+import hashlib
+from collections.abc import Callable
+from datetime import datetime, timezone
+from flask import Response, current_app, make_response, request
+
+# Conditional GET support (ETag / Last-Modified) for cached read endpoints.
+# The version of a resource is computed from cheap metadata (id + last_updated_on, or max(last_updated_on)
+# and row count of a collection), so a matching If-None-Match is answered with 304 before the
+# response body is loaded or serialized.
+
+Version = tuple[str | None, datetime | None]
+
+def resource_version(row_id: str, last_updated_on: datetime | None) -> Version:
+    """ Strong ETag and Last-Modified of a single row
+
+    Args:
+        row_id (str): id of the row
+        last_updated_on (datetime | None): last update date of the row, None when row does not exist
+
+    Returns:
+        Version: (etag, last modified), (None, None) for missing rows
+    """
+    if last_updated_on is None:
+        return None, None
+
+    etag = hashlib.sha1(f"{row_id}:{last_updated_on.isoformat()}".encode()).hexdigest()
+    return etag, last_updated_on
+
+def collection_version(max_last_updated_on: datetime | None, count: int, *parts: str) -> Version:
+    """ Strong ETag and Last-Modified of a collection
+
+    Args:
+        max_last_updated_on (datetime | None): latest update date of any row in the collection
+        count (int): number of rows in the collection, changes on deletes
+        parts (str): representation specific parts, e.g. page arguments
+
+    Returns:
+        Version: (etag, last modified)
+    """
+    last_updated = max_last_updated_on.isoformat() if max_last_updated_on else ""
+    etag = hashlib.sha1(":".join([last_updated, str(count), *parts]).encode()).hexdigest()
+    return etag, max_last_updated_on
+
+def _as_utc(value: datetime) -> datetime:
+    # Naive dates are UTC: the models store utc_now() and SQLite returns it without the offset
+    value = value.replace(microsecond=0)
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+def is_not_modified(etag: str, last_modified: datetime | None) -> bool:
+    """ Whether the client copy of the current request is still fresh
+
+    If-None-Match takes precedence over If-Modified-Since as required by RFC 9110.
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        return _as_utc(last_modified) <= request.if_modified_since
+    return False
+
+def conditional(version: Callable[..., Version], unless: Callable[[], bool] | None = None):
+    """ Decorator adding ETag / Last-Modified headers and 304 responses to a GET view
+
+    Must be placed between @app.route and @cache.cached so cache hits are answered with 304 as well.
+
+    Args:
+        version (Callable[..., Version]): called with the view arguments, returns current version
+        unless (Callable[[], bool] | None): skips conditional handling when it returns True
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def decorated(*args, **kwargs):
+            if unless is not None and unless():
+                return view(*args, **kwargs)
+
+            try:
+                etag, last_modified = version(*args, **kwargs)
+            except Exception as e:
+                # Errors are reported by the view itself, e.g. validation of path arguments
+                current_app.logger.warning(f"Could not compute version of {request.path}: {str(e)}")
+                return view(*args, **kwargs)
+
+            if etag is None:
+                return view(*args, **kwargs)
+
+            if is_not_modified(etag=etag, last_modified=last_modified):
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = _as_utc(last_modified)
+            return response
+        return decorated
+    return decorator
@@ -0,0 +1,349 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from flask import Flask, current_app
+from flask_caching import Cache
+
+from ..metrics.prometheus import Counter, Gauge, registry
+from .cache_backends import CLEAR_ALL_MESSAGE
+
+# In-process cache of single entity dicts (GET /authors/<id>, GET /books/<id>), below the response cache.
+#
+# Entities are kept in a bounded LRU per worker process, limited both by number of entries
+# (ENTITY_CACHE_MAX_ENTRIES) and by their estimated size (ENTITY_CACHE_MAX_BYTES), so a long tail
+# of hot ids stays cached instead of being pruned with the rest of the response cache. Entries
+# expire after ENTITY_CACHE_TTL seconds.
+#
+# Write controllers invalidate entities through the keys deleted by caching.invalidate_authors /
+# invalidate_books. SharedRedisCache publishes these deletes to every worker, whose invalidation
+# listener drops them from the local LRU as well, and clears it whenever it (re)subscribes. Other
+# backends reach no other process, so the LRU is off by default unless CACHE_TYPE is SharedRedisCache.
+# With ENTITY_CACHE_SHARED the LRU is a near cache in front of the shared cache: local misses are
+# looked up in the cache backend before the database. Shared entries are stored with the generation
+# token of their entity read before the database load, and invalidations replace the token, so a
+# load that raced a write cannot put the old entity back for other workers. Lookups by ids use the
+# shared cache also while the LRU is off, so they always start with one multi-get.
+
+logger = logging.getLogger(__name__)
+
+# Estimated bytes of a cached entity besides its keys and string values
+ENTRY_OVERHEAD = 400
+NON_STR_VALUE_SIZE = 32
+
+entity_requests = registry.register(Counter(
+    "entity_cache_requests_total", "Lookups of single entities by result (hit, shared_hit or miss)", ("type", "result")))
+entity_evictions = registry.register(Counter(
+    "entity_cache_evictions_total", "Entities removed from the in-process entity cache by reason (size, expired or invalidated)", ("reason",)))
+entity_entries = registry.register(Gauge("entity_cache_entries", "Entities in the in-process entity cache"))
+entity_bytes = registry.register(Gauge("entity_cache_bytes", "Estimated size of the entities in the in-process entity cache"))
+
+def entity_key(kind: str, entity_id: str) -> str:
+    return f"entity:{kind}:{entity_id}"
+
+def generation_key(key: str) -> str:
+    """ Key of the token replaced by every invalidation of the entity cached under key """
+    return f"{key}:generation"
+
+def shared_entity(cached, generation: str | None) -> dict | None:
+    """ Entity of a shared cache entry, None when missing or stored before the last invalidation of the entity
+
+    Args:
+        cached: (generation, entity) entry of the shared cache, None when missing
+        generation (str | None): current generation token of the entity, None before its first invalidation
+    """
+    if isinstance(cached, tuple) and len(cached) == 2 and cached[0] == generation:
+        return cached[1]
+    return None
+
+def entity_size(entity: dict) -> int:
+    """ Rough memory footprint of an entity dict in bytes, dominated by its strings """
+    return ENTRY_OVERHEAD + sum(len(key) + (len(value) if isinstance(value, str) else NON_STR_VALUE_SIZE) for key, value in entity.items())
+
+def uses_shared_cache(config) -> bool:
+    """ Whether entities are stored in the shared cache, as near cache or for lookups by ids while the LRU is off """
+    return config['ENTITY_CACHE_SHARED'] or not config['ENTITY_CACHE_ENABLED']
+
+class LRUCache(object):
+    """ Thread safe least recently used cache bounded by entry count and estimated size
+
+    Args:
+        max_entries (int): maximum number of entries
+        max_bytes (int): maximum total size of entries
+        ttl (float): seconds an entry stays valid, 0 for no expiry
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Incremented by every invalidation, loads that started before one are not stored
+        self.generation = 0
+        # key -> (value, size, expires_at)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def get(self, key: str):
+        """ Value of key, None when missing or expired """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and entry[2] <= time.monotonic():
+                self._remove(key)
+                self.evictions += 1
+                entity_evictions.inc(reason="expired")
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: str, value, size: int, generation: int | None = None) -> None:
+        """ Stores value, evicting least recently used entries beyond the bounds
+
+        Args:
+            key (str): cache key
+            value: cached value
+            size (int): estimated size of value in bytes
+            generation (int | None): generation read before value was loaded, skipped when invalidated since
+        """
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl)
+            self.bytes += size
+            evicted = 0
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                evicted += 1
+            self.evictions += evicted
+        if evicted:
+            entity_evictions.inc(evicted, reason="size")
+        self._report()
+
+    def on_invalidation(self, keys: list[str]) -> None:
+        """ Applies invalidation published by any worker through SharedRedisCache """
+        if CLEAR_ALL_MESSAGE in keys:
+            self.clear()
+        else:
+            self.discard(keys)
+
+    def discard(self, keys: Iterable[str]) -> None:
+        """ Drops keys, ignoring keys not in the cache """
+        removed = 0
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                if key in self._entries:
+                    self._remove(key)
+                    removed += 1
+        if removed:
+            entity_evictions.inc(removed, reason="invalidated")
+            self._report()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self.bytes = 0
+        self._report()
+
+    def _report(self) -> None:
+        entity_entries.set(len(self._entries))
+        entity_bytes.set(self.bytes)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+class EntityCache(object):
+    """ Flask extension keeping an LRUCache of entity dicts per app, configured through the ENTITY_CACHE_* settings """
+
+    def __init__(self):
+        self._shared = None
+
+    def init_app(self, app: Flask, shared: Cache) -> None:
+        """ Creates the LRU of app and subscribes it to invalidations of the shared cache
+
+        Args:
+            app (Flask): app whose config has the ENTITY_CACHE_* settings
+            shared (Cache): response cache, whose deletes of entity keys invalidate the LRU
+        """
+        self._shared = shared
+        lru = LRUCache(max_entries=app.config['ENTITY_CACHE_MAX_ENTRIES'], max_bytes=app.config['ENTITY_CACHE_MAX_BYTES'],
+                       ttl=app.config['ENTITY_CACHE_TTL'])
+        app.extensions["entity_cache"] = lru
+
+        # Deletes made by other workers reach this worker through the invalidation channel of SharedRedisCache
+        backend = app.extensions["cache"][shared]
+        listeners = getattr(backend, "invalidation_listeners", None)
+        if listeners is not None:
+            listeners.append(lru.on_invalidation)
+        elif app.config['ENTITY_CACHE_ENABLED']:
+            logger.warning(f"ENTITY_CACHE_ENABLED with {type(backend).__name__}, writes of other worker processes do not invalidate their entity caches")
+
+    @property
+    def lru(self) -> LRUCache:
+        return current_app.extensions["entity_cache"]
+
+    def get_or_load(self, kind: str, entity_id: str, load: Callable[[], dict]) -> dict:
+        """ Entity dict from the LRU, the shared cache in near cache mode, or the database
+
+        Args:
+            kind (str): entity type, e.g. AUTHORS or BOOKS
+            entity_id (str): id of the entity
+            load (Callable[[], dict]): loads the entity from the database, returns an empty dict when it does not exist
+
+        Returns:
+            dict: copy of the entity, empty when it does not exist
+        """
+        config = current_app.config
+        if not config['ENTITY_CACHE_ENABLED']:
+            return load()
+
+        lru = self.lru
+        key = entity_key(kind, entity_id)
+        entity = lru.get(key)
+        if entity is not None:
+            entity_requests.inc(type=kind, result="hit")
+            return dict(entity)
+
+        generation = lru.generation
+        shared = config['ENTITY_CACHE_SHARED']
+        if shared:
+            try:
+                cached, shared_generation = self._shared.get_many(key, generation_key(key))
+                entity = shared_entity(cached, shared_generation)
+            except Exception:
+                logger.exception("Exception possibly due to cache backend.")
+                # Without the generation a loaded entity could not be told apart from a stale one later
+                shared = False
+        if entity is not None:
+            entity_requests.inc(type=kind, result="shared_hit")
+        else:
+            entity_requests.inc(type=kind, result="miss")
+            entity = load()
+            # Missing entities are not cached, they are created without invalidating anything
+            if not entity:
+                return entity
+            if shared:
+                try:
+                    # Unreachable once an invalidation since the generation was read replaced it
+                    self._shared.set(key, (shared_generation, entity), timeout=config['ENTITY_CACHE_TTL'])
+                except Exception:
+                    logger.exception("Exception possibly due to cache backend.")
+
+        lru.set(key, entity, size=entity_size(entity), generation=generation)
+        return dict(entity)
+
+    def get_many_or_load(self, kind: str, entity_ids: Iterable[str], load_many: Callable[[list[str]], dict[str, dict]]) -> dict[str, dict]:
+        """ Entity dicts of several ids: from the LRU, then one multi-get of the shared cache, then one database query
+
+        The shared cache is used in near cache mode, and also when the LRU is off, so lookups by ids always
+        check a cache with one multi-get before the database.
+
+        Args:
+            kind (str): entity type, e.g. AUTHORS or BOOKS
+            entity_ids (Iterable[str]): ids of the entities, duplicates are looked up once
+            load_many (Callable[[list[str]], dict[str, dict]]): loads the entities of the given ids from the database keyed by id
+
+        Returns:
+            dict[str, dict]: copies of the found entities keyed by id, ids that do not exist are left out
+        """
+        ids = list(dict.fromkeys(entity_ids))
+        config = current_app.config
+        lru = self.lru if config['ENTITY_CACHE_ENABLED'] else None
+        found = {}
+        missing = ids
+        if lru is not None:
+            generation = lru.generation
+            missing = []
+            for entity_id in ids:
+                entity = lru.get(entity_key(kind, entity_id))
+                if entity is not None:
+                    found[entity_id] = dict(entity)
+                else:
+                    missing.append(entity_id)
+            if found:
+                entity_requests.inc(len(found), type=kind, result="hit")
+
+        shared = uses_shared_cache(config)
+        shared_generations = {}
+        if missing and shared:
+            keys = [entity_key(kind, entity_id) for entity_id in missing]
+            try:
+                # Entries and their generation tokens in one round trip
+                values = self._shared.get_many(*keys, *(generation_key(key) for key in keys))
+            except Exception:
+                logger.exception("Exception possibly due to cache backend.")
+                values = [None] * (2 * len(keys))
+                shared = False
+            shared_generations = dict(zip(missing, values[len(keys):]))
+            still_missing = []
+            for entity_id, cached in zip(missing, values[:len(keys)]):
+                entity = shared_entity(cached, shared_generations[entity_id])
+                if entity is None:
+                    still_missing.append(entity_id)
+                    continue
+                if lru is not None:
+                    lru.set(entity_key(kind, entity_id), entity, size=entity_size(entity), generation=generation)
+                found[entity_id] = dict(entity)
+            if len(still_missing) < len(missing):
+                entity_requests.inc(len(missing) - len(still_missing), type=kind, result="shared_hit")
+            missing = still_missing
+
+        if missing:
+            entity_requests.inc(len(missing), type=kind, result="miss")
+            loaded = load_many(missing)
+            for entity_id, entity in loaded.items():
+                if lru is not None:
+                    lru.set(entity_key(kind, entity_id), entity, size=entity_size(entity), generation=generation)
+                found[entity_id] = dict(entity)
+            if shared and loaded:
+                try:
+                    self._shared.set_many({entity_key(kind, entity_id): (shared_generations[entity_id], entity) for entity_id, entity in loaded.items()},
+                                          timeout=config['ENTITY_CACHE_TTL'])
+                except Exception:
+                    logger.exception("Exception possibly due to cache backend.")
+        return found
+
+    def invalidate(self, keys: Iterable[str]) -> None:
+        """ Drops entity keys from the LRU of the current app and outdates their entries in the shared cache
+
+        Args:
+            keys (Iterable[str]): entity keys of written entities, also deleted from the shared cache by the caller
+        """
+        keys = list(keys)
+        self.lru.discard(keys)
+        config = current_app.config
+        if keys and uses_shared_cache(config):
+            # Entries stored before this expire no later than the tokens, so an old token never comes back
+            token = uuid.uuid4().hex
+            try:
+                self._shared.set_many({generation_key(key): token for key in keys}, timeout=config['ENTITY_CACHE_TTL'])
+            except Exception:
+                logger.exception("Exception possibly due to cache backend.")
@@ -0,0 +1,90 @@
+import os
+import time
+import uuid
+
+from flask import current_app
+from sqlalchemy import LargeBinary
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.types import TypeDecorator
+
+# Primary key type and id generation for all models.
+# Ids are exposed as canonical UUID strings ("4f859bd4-7c85-4c71-bd93-d15670bec314") everywhere in the app
+# and the API, but stored compactly: native 16-byte UUID on Postgres, 16-byte BLOB on other databases.
+
+def format_uuid(value: bytes) -> str:
+    """ Canonical string of 16 raw UUID bytes, cheaper than str(uuid.UUID(bytes=value))
+
+    Args:
+        value (bytes): UUID bytes in big-endian order
+
+    Returns:
+        str: lowercase hyphenated UUID string
+    """
+    h = value.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+def is_uuid(value: str) -> bool:
+    """ Whether value is a UUID string accepted as an id
+
+    Only the canonical lowercase form is accepted, so every id has a single spelling in cache keys.
+    """
+    try:
+        return str(uuid.UUID(value)) == value
+    except (TypeError, ValueError, AttributeError):
+        return False
+
+class UUIDString(TypeDecorator):
+    """ UUID column type with string values on the Python side
+
+    Byte order of the stored value matches the string order, so keyset pagination by
+    (created_on, id) sorts the same on every database.
+    """
+    impl = LargeBinary(16)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            # as_uuid=False: the driver sends and returns strings, no conversion needed in Python
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=False))
+        return dialect.type_descriptor(LargeBinary(16))
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if dialect.name == "postgresql":
+            return str(value)
+        return uuid.UUID(str(value)).bytes
+
+    def process_result_value(self, value, dialect):
+        if value is None or dialect.name == "postgresql":
+            return value
+        return format_uuid(value)
+
+    @property
+    def python_type(self):
+        return str
+
+def uuid7() -> uuid.UUID:
+    """ Time-ordered UUID version 7 (RFC 9562): 48-bit unix milliseconds followed by random bits
+
+    Consecutive ids are close together in primary key indexes, so inserts append to the right
+    edge of the B-tree instead of splitting random pages.
+
+    Returns:
+        uuid.UUID: new UUIDv7
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    # Version (7) and RFC 4122 variant bits
+    value = value & ~(0xF << 76) | (0x7 << 76)
+    value = value & ~(0x3 << 62) | (0x2 << 62)
+    return uuid.UUID(int=value)
+
+def new_id() -> str:
+    """ New primary key value, UUIDv7 or UUIDv4 depending on Config.ID_UUID_VERSION
+
+    Returns:
+        str: canonical UUID string
+    """
+    if current_app.config["ID_UUID_VERSION"] == 7:
+        return str(uuid7())
+    return str(uuid.uuid4())
@@ -0,0 +1,74 @@
+from datetime import date, datetime
+from flask import Flask, Response
+from flask.json.provider import DefaultJSONProvider
+
+from .serializers import encode_date, encode_datetime
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - stdlib json is used instead
+    orjson = None
+
+# JSON provider encoding response bodies with orjson when it is installed, stdlib json otherwise.
+# Output is the same JSON as Flask's default provider: keys sorted, dates and datetimes as HTTP date
+# strings (e.g. "Mon, 01 Jan 1990 00:00:00 GMT"), UUIDs as strings. orjson writes non-ASCII
+# characters as UTF-8 instead of \u escapes, which is equivalent JSON.
+# Responses are built from bytes directly, skipping the str round trip of the default provider.
+
+def default(value):
+    """ Encodes values JSON has no type for, dates the same way as the serializers """
+    if isinstance(value, datetime):
+        return encode_datetime(value)
+    if isinstance(value, date):
+        return encode_date(value)
+    return DefaultJSONProvider.default(value)
+
+class FastJSONProvider(DefaultJSONProvider):
+    """ Flask JSON provider using orjson when available, set Config.JSON_USE_ORJSON to False to use stdlib json """
+
+    default = staticmethod(default)
+
+    def __init__(self, app: Flask):
+        super().__init__(app)
+        self.use_orjson = orjson is not None and app.config.get("JSON_USE_ORJSON", True)
+
+    def _orjson_option(self, indent: bool = False) -> int:
+        # datetime/date go through default() so they keep the HTTP date format instead of orjson's ISO 8601
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps_bytes(self, obj, indent: bool = False) -> bytes:
+        """ Serializes obj as UTF-8 encoded JSON
+
+        Args:
+            obj: data to serialize
+            indent (bool): pretty print with an indent of 2 instead of compact output
+
+        Returns:
+            bytes: JSON document
+        """
+        if self.use_orjson:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_option(indent))
+        if indent:
+            return super().dumps(obj, indent=2).encode()
+        return super().dumps(obj, separators=(",", ":")).encode()
+
+    def dumps(self, obj, **kwargs) -> str:
+        # Keyword arguments are json.dumps options, only stdlib json supports them
+        if self.use_orjson and not kwargs:
+            return orjson.dumps(obj, default=self.default, option=self._orjson_option()).decode()
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s: str | bytes, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumps_bytes(obj, indent=indent) + b"\n", mimetype=self.mimetype)
@@ -0,0 +1,75 @@
+from collections.abc import Mapping
+from datetime import date
+from flask import request
+
+from .serializers import ModelSerializer
+from .validators import parse_date
+
+# Query arguments of list endpoints for filtering, sorting and sparse fieldsets:
+#
+#   sort=publish_date or sort=-publish_date   one of the whitelisted sort keys, - for descending
+#   fields=id,title                            only these columns are selected and returned
+#   <column>_from=YYYY-MM-DD&<column>_to=...   inclusive date range filter
+
+def parse_sort(sorts: Mapping[str, type], default: str = "created_on") -> tuple[str, type, bool]:
+    """ Reads `sort` query argument of the current request
+
+    Args:
+        sorts (Mapping[str, type]): whitelisted sort keys and the python type of their values
+        default (str): sort key used when the argument is missing
+
+    Raises:
+        ValueError: sort key is not whitelisted
+
+    Returns:
+        tuple[str, type, bool]: sort key, its python type and whether it is descending
+    """
+    value = request.args.get("sort", default)
+    descending = value.startswith("-")
+    sort = value[1:] if descending else value
+    if sort not in sorts:
+        raise ValueError(f"Check that sort is one of: {', '.join(sorts)}, optionally prefixed with - for descending order")
+    return sort, sorts[sort], descending
+
+def parse_fields(serializer: ModelSerializer) -> ModelSerializer:
+    """ Reads comma separated `fields` query argument of the current request
+
+    Args:
+        serializer (ModelSerializer): serializer of all columns of the listed model
+
+    Raises:
+        ValueError: fields is empty or names an unknown column
+
+    Returns:
+        ModelSerializer: serializer selecting only the requested columns, serializer itself without fields
+    """
+    fields = request.args.get("fields")
+    if fields is None:
+        return serializer
+
+    keys = set(fields.split(","))
+    if not keys.issubset(serializer.keys):
+        raise ValueError(f"Check that fields is a comma separated list of: {', '.join(serializer.keys)}")
+    # Model column order, so every combination of the same fields shares one compiled serializer
+    return serializer.only([key for key in serializer.keys if key in keys])
+
+def parse_date_range(name: str) -> tuple[date | None, date | None]:
+    """ Reads inclusive `<name>_from` and `<name>_to` date query arguments of the current request
+
+    Args:
+        name (str): name of the filtered date column
+
+    Raises:
+        ValueError: a bound is not a date in DATE_FORMAT
+
+    Returns:
+        tuple[date | None, date | None]: lower and upper bound, None when not given
+    """
+    bounds = []
+    for arg in (f"{name}_from", f"{name}_to"):
+        value = request.args.get(arg)
+        try:
+            bounds.append(parse_date(value) if value is not None else None)
+        except ValueError:
+            raise ValueError(f"Check that {arg} uses the following date format: YYYY-MM-DD")
+    return bounds[0], bounds[1]
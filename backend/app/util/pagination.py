@@ -0,0 +1,195 @@
+import base64
+import json
+import urllib.parse
+from datetime import date, datetime
+from flask import current_app, request
+from sqlalchemy import Select, or_, tuple_
+
+# Keyset (cursor) pagination helpers shared by the list endpoints.
+# Pages are ordered by (sort key, id), (created_on, id) by default, and the cursor is an opaque,
+# url-safe token holding the sort key of the last row of the previous page.
+# Nullable sort keys (birth_date, publish_date) order NULLs last in both directions,
+# a cursor of a row without sort key holds null and continues among the NULL rows by id.
+
+DEFAULT_SORT = "created_on"
+
+def encode_cursor(sort_value: datetime | date | None, row_id: str, sort: str = DEFAULT_SORT) -> str:
+    """ Builds opaque cursor pointing after the given row
+
+    Args:
+        sort_value (datetime | date | None): sort key of last row on the page, e.g. its creation date, None when unset
+        row_id (str): id of last row on the page
+        sort (str): sort the page was ordered by, recorded so the cursor is only valid for it
+
+    Returns:
+        str: url-safe cursor string
+    """
+    values = [sort_value.isoformat() if sort_value is not None else None, row_id] + ([sort] if sort != DEFAULT_SORT else [])
+    payload = json.dumps(values, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: str = DEFAULT_SORT, sort_type: type = datetime) -> tuple[datetime | date | None, str]:
+    """ Decodes cursor created by encode_cursor
+
+    Args:
+        cursor (str): cursor from the `after` query argument
+        sort (str): sort of the requested page
+        sort_type (type): python type of the sort key, datetime or date
+
+    Raises:
+        ValueError: cursor is malformed or belongs to another sort
+
+    Returns:
+        tuple[datetime | date | None, str]: (sort key, id) of the row to continue after, sort key None when unset
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id, *cursor_sort = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if (cursor_sort[0] if cursor_sort else DEFAULT_SORT) != sort:
+            raise ValueError(sort)
+        return sort_type.fromisoformat(sort_value) if sort_value is not None else None, str(row_id)
+    except Exception:
+        raise ValueError("Check that after is a cursor returned by a previous page with the same sort")
+
+def keyset_paginate(query: Select, sort_column, id_column, descending: bool = False, after: tuple | None = None, nullable: bool = False) -> Select:
+    """ Orders query by (sort key, id) and continues after the cursor position
+
+    Args:
+        query (Select): statement selecting the page rows
+        sort_column: column the page is sorted by
+        id_column: primary key column, breaks ties between equal sort keys
+        descending (bool): sorts newest / largest first
+        after (tuple | None): decoded cursor, (sort key, id) of last row of the previous page
+        nullable (bool): sort column may hold NULL, e.g. birth_date, those rows are ordered last
+
+    Returns:
+        Select: ordered and filtered statement, without limit
+    """
+    if after:
+        sort_value, row_id = after
+        if sort_value is None:
+            # Cursor row has no sort key, only the remaining NULL rows follow it
+            query = query.where(sort_column.is_(None), id_column < row_id if descending else id_column > row_id)
+        else:
+            key = tuple_(sort_column, id_column)
+            after_key = key < after if descending else key > after
+            # `col > value` never matches NULL, the NULL rows ordered last still follow
+            query = query.where(or_(after_key, sort_column.is_(None)) if nullable else after_key)
+    if descending:
+        return query.order_by(sort_column.desc().nulls_last() if nullable else sort_column.desc(), id_column.desc())
+    return query.order_by(sort_column.asc().nulls_last() if nullable else sort_column, id_column)
+
+# Ranked results (e.g. search) have no stable sort key to continue after, their cursor holds a row offset
+def encode_offset_cursor(offset: int) -> str:
+    """ Builds opaque cursor pointing at the given row offset
+
+    Args:
+        offset (int): number of rows on the previous pages
+
+    Returns:
+        str: url-safe cursor string
+    """
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode()).decode().rstrip("=")
+
+def decode_offset_cursor(cursor: str) -> int:
+    """ Decodes cursor created by encode_offset_cursor
+
+    Args:
+        cursor (str): cursor from the `after` query argument
+
+    Raises:
+        ValueError: cursor is malformed
+
+    Returns:
+        int: row offset of the next page
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset = json.loads(base64.urlsafe_b64decode(padded.encode()))["offset"]
+    except Exception:
+        offset = None
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError("Check that after is a cursor returned by a previous page")
+    return offset
+
+def parse_limit() -> int:
+    """ Reads `limit` query argument of the current request
+
+    Raises:
+        ValueError: limit is not a positive integer
+
+    Returns:
+        int: page size capped at PAGE_SIZE_MAX
+    """
+    limit = request.args.get("limit", current_app.config["PAGE_SIZE_DEFAULT"])
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        limit = 0
+    if limit < 1:
+        raise ValueError("Check that limit is a positive integer")
+    return min(limit, current_app.config["PAGE_SIZE_MAX"])
+
+def parse_page_args(sort: str = DEFAULT_SORT, sort_type: type = datetime) -> tuple[int, tuple[datetime | date, str] | None]:
+    """ Reads `limit` and `after` query arguments of the current request
+
+    Args:
+        sort (str): sort of the requested page
+        sort_type (type): python type of the sort key
+
+    Raises:
+        ValueError: limit is not a positive integer or cursor is malformed
+
+    Returns:
+        tuple[int, tuple | None]: page size capped at PAGE_SIZE_MAX and decoded cursor
+    """
+    limit = parse_limit()
+    after = request.args.get("after")
+    return limit, decode_cursor(after, sort=sort, sort_type=sort_type) if after else None
+
+def parse_offset_page_args() -> tuple[int, int]:
+    """ Reads `limit` and `after` query arguments of the current request for offset paginated results
+
+    Raises:
+        ValueError: limit is not a positive integer or cursor is malformed
+
+    Returns:
+        tuple[int, int]: page size capped at PAGE_SIZE_MAX and row offset
+    """
+    limit = parse_limit()
+    after = request.args.get("after")
+    return limit, decode_offset_cursor(after) if after else 0
+
+def page_cache_key(prefix: str) -> str:
+    """ Cache key for one page of a list endpoint
+
+    Args:
+        prefix (str): key prefix of the endpoint
+
+    Returns:
+        str: key unique to the page requested, including filters, sort and fields
+    """
+    # Arguments are sorted so the same page requested with another argument order shares the key
+    return f"{prefix}?{urllib.parse.urlencode(sorted(request.args.items(multi=True)))}"
+
+def next_page_headers(next_cursor: str | None, limit: int) -> dict:
+    """ Response headers pointing clients to the following page
+
+    Args:
+        next_cursor (str | None): cursor of the next page, None on last page
+        limit (int): page size used for the current page
+
+    Returns:
+        dict: X-Next-Cursor and Link headers, empty on last page
+    """
+    if next_cursor is None:
+        return {}
+
+    # Other query arguments (e.g. include) are kept so the next page has the same representation
+    args = [(key, value) for key, value in request.args.items(multi=True) if key not in ("limit", "after")]
+    query = urllib.parse.urlencode([("limit", limit), ("after", next_cursor), *args])
+
+    return {
+        "X-Next-Cursor": next_cursor,
+        "Link": f'<{request.path}?{query}>; rel="next"',
+    }
@@ -0,0 +1,274 @@
+import functools
+import inspect
+import itertools
+import logging
+import math
+import threading
+import time
+from contextvars import ContextVar
+from flask import Flask, Response, current_app, g, has_request_context, request
+from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session as OrmSession
+
+from ..metrics.instrumentation import instrument_queries
+from ..metrics.pool import instrument_engine
+from ..metrics.profiling import instrument_profiling
+from ..metrics.prometheus import Counter, Gauge, registry
+from .revalidation import computing_cached_response
+
+# Routing of read-only controllers to read replicas.
+#
+# Replicas are Flask-SQLAlchemy binds named "replica<n>" (Config.SQLALCHEMY_BINDS, built from
+# DB_REPLICA_CONNECTION_STRINGS). Controllers decorated with @replica_read run their queries on
+# one healthy replica, every other statement uses the primary. Reads stay on the primary
+# * for the rest of the request once it wrote anything,
+# * for requests of a client that committed a write less than DB_REPLICA_READ_AFTER_WRITE seconds
+#   ago, so it reads its own writes. The response of the write sets a cookie with the deadline, and
+#   the other clients keep reading from the replicas under steady write traffic, and
+# * while a response is computed for the response cache within DB_REPLICA_READ_AFTER_WRITE seconds
+#   after any write, as cached responses are shared by all clients including the writer. That
+#   deadline is kept in the cache, with SharedRedisCache it covers all workers.
+#
+# Replicas are pinged at most every DB_REPLICA_HEALTH_INTERVAL seconds when they are picked, a
+# replica failing the ping or a statement with a connection error is skipped until its next check.
+# Without healthy replicas reads fall back to the primary.
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND_PREFIX = "replica"
+# Cache key of the time until which responses computed for the cache read from the primary after a write
+PRIMARY_UNTIL_KEY = "replicas:primary_until"
+# Cookie with the time until which the client that wrote reads from the primary
+PRIMARY_UNTIL_COOKIE = "primary_until"
+
+# App extension holding the replicas of the ASGI mode
+ASYNC_REPLICAS = "async_replicas"
+
+# Session info keys: the session wrote in its current lifetime, engines chosen for its pinned and unpinned replica reads
+WROTE = "replicas:wrote"
+READ_ENGINE = "replicas:read_engine"
+
+read_routing = registry.register(Counter("db_read_routing_total", "Sessions of read-only controllers by the database they read from", ("target",)))
+replica_health = registry.register(Gauge("db_replica_healthy", "Result of the last health check of each read replica, 1 healthy and 0 failed", ("replica",)))
+
+# Set while a @replica_read controller runs
+_replica_reads = ContextVar("replica_reads", default=False)
+
+def replica_bind_key(index: int) -> str:
+    return f"{REPLICA_BIND_PREFIX}{index}"
+
+class ReplicaSet(object):
+    """ Read replica engines of an app and their health
+
+    Args:
+        engines (dict[str, Engine]): replica engines keyed by bind key
+        health_interval (float): seconds between health checks of a replica
+    """
+
+    def __init__(self, engines: dict[str, Engine], health_interval: float):
+        self.engines = engines
+        self.health_interval = health_interval
+        self._cycle = itertools.cycle(list(engines))
+        self._healthy = dict.fromkeys(engines, True)
+        self._checked_at = dict.fromkeys(engines, float("-inf"))
+        self._locks = {key: threading.Lock() for key in engines}
+
+    def check(self, key: str) -> bool:
+        """ Pings replica key, returns whether it answered """
+        try:
+            with self.engines[key].connect() as connection:
+                connection.execute(text("SELECT 1"))
+            return True
+        except Exception as e:
+            logger.warning(f"Read replica {key} failed its health check, reading from the primary instead: {str(e)}")
+            return False
+
+    def is_healthy(self, key: str) -> bool:
+        if time.monotonic() - self._checked_at[key] >= self.health_interval:
+            lock = self._locks[key]
+            # A single thread checks at a time, the others go on with the last result
+            if lock.acquire(blocking=False):
+                try:
+                    self.set_health(key, self.check(key))
+                finally:
+                    lock.release()
+        return self._healthy[key]
+
+    def set_health(self, key: str, healthy: bool) -> None:
+        self._healthy[key] = healthy
+        self._checked_at[key] = time.monotonic()
+        replica_health.set(1 if healthy else 0, replica=key)
+
+    def choose(self) -> Engine | None:
+        """ Next healthy replica in round robin order, None when all are unhealthy """
+        for _ in range(len(self.engines)):
+            key = next(self._cycle)
+            if self.is_healthy(key):
+                return self.engines[key]
+        return None
+
+def client_pinned() -> bool:
+    """ Whether the client of the current request committed a write less than DB_REPLICA_READ_AFTER_WRITE seconds ago """
+    if not has_request_context():
+        return False
+    try:
+        return float(request.cookies.get(PRIMARY_UNTIL_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+def primary_pinned() -> bool:
+    """ Whether the replica reads of the current request stay on the primary after a recent write """
+    if client_pinned():
+        return True
+    # Other clients only read from the primary for responses they cache for everyone, including the writer
+    if not computing_cached_response():
+        return False
+    from ..extensions import cache
+    primary_until = cache.get(PRIMARY_UNTIL_KEY)
+    return primary_until is not None and primary_until > time.time()
+
+def pin_primary() -> None:
+    """ Keeps reads of the writing client and of cache recomputations on the primary for DB_REPLICA_READ_AFTER_WRITE seconds """
+    from ..extensions import cache
+    window = current_app.config['DB_REPLICA_READ_AFTER_WRITE']
+    if window > 0:
+        primary_until = time.time() + window
+        cache.set(PRIMARY_UNTIL_KEY, primary_until, timeout=int(window) + 1)
+        if has_request_context():
+            # Sent to the client with the response by _set_primary_until_cookie
+            g.primary_until = primary_until
+
+def _set_primary_until_cookie(response: Response) -> Response:
+    primary_until = g.pop("primary_until", None)
+    if primary_until is not None:
+        response.set_cookie(PRIMARY_UNTIL_COOKIE, repr(primary_until), max_age=math.ceil(primary_until - time.time()),
+                            httponly=True, samesite="Lax")
+    return response
+
+class ReplicaRouting(object):
+    """ Session mixin running the statements of @replica_read controllers on a read replica """
+
+    def replica_set(self) -> ReplicaSet | None:
+        """ Replicas this session reads from, None without replicas """
+        return current_app.extensions.get("replicas")
+
+    def read_engine(self) -> Engine | None:
+        """ Replica used for the replica reads of this session, None for the primary """
+        # Chosen once per session for pinned and for unpinned reads, a request may compute a cached response after other reads
+        pinned = primary_pinned()
+        engines = self.info.setdefault(READ_ENGINE, {})
+        if pinned not in engines:
+            replicas = self.replica_set()
+            engine = None
+            if replicas is not None and replicas.engines and not pinned:
+                engine = replicas.choose()
+            engines[pinned] = engine
+            read_routing.inc(target="primary" if engine is None else "replica")
+        return engines[pinned]
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _replica_reads.get() and not self._flushing and not self.info.get(WROTE):
+            engine = self.read_engine()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+class RoutingSession(ReplicaRouting, Session):
+    """ Flask-SQLAlchemy session of the WSGI app, reading from the replica binds registered by init_replicas """
+
+class AsyncRoutingSession(ReplicaRouting, OrmSession):
+    """ Sync session of the ASGI mode's AsyncSessions, reading from the async replicas registered by AsyncApp
+
+    Flask-SQLAlchemy's Session would bind the primary statements to the sync engines of the app.
+    """
+
+    def replica_set(self) -> ReplicaSet | None:
+        return current_app.extensions.get(ASYNC_REPLICAS)
+
+def _on_execute(orm_execute_state) -> None:
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info[WROTE] = True
+
+def _on_flush(session, flush_context) -> None:
+    session.info[WROTE] = True
+
+def _on_commit(session) -> None:
+    if session.info.get(WROTE) and session.replica_set() is not None:
+        pin_primary()
+
+for session_class in (RoutingSession, AsyncRoutingSession):
+    event.listen(session_class, "do_orm_execute", _on_execute)
+    event.listen(session_class, "after_flush", _on_flush)
+    event.listen(session_class, "after_commit", _on_commit)
+
+def replica_read(controller):
+    """ Decorator running a read-only controller on a read replica when one is configured
+
+    Generator controllers (streamed exports) read from the replica while they are advanced.
+    """
+    if inspect.isgeneratorfunction(controller):
+        @functools.wraps(controller)
+        def generator(*args, **kwargs):
+            iterator = controller(*args, **kwargs)
+            while True:
+                token = _replica_reads.set(True)
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    _replica_reads.reset(token)
+                yield item
+        return generator
+
+    @functools.wraps(controller)
+    def decorated(*args, **kwargs):
+        token = _replica_reads.set(True)
+        try:
+            return controller(*args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+    return decorated
+
+def init_replicas(app: Flask, db: SQLAlchemy) -> None:
+    """ Registers the replica binds of app for read routing, called inside its app context
+
+    Args:
+        app (Flask): app whose SQLALCHEMY_BINDS may contain replica<n> binds
+        db (SQLAlchemy): extension holding the engines of app
+    """
+    # Also sends the cookie for the async replicas of the ASGI mode, which are registered later
+    app.after_request(_set_primary_until_cookie)
+    engines = {key: engine for key, engine in db.engines.items() if key is not None and key.startswith(REPLICA_BIND_PREFIX)}
+    for key, engine in engines.items():
+        # Reported apart from the primary's pool by /metrics/pool, under the bind key
+        instrument_engine(engine, name=key)
+    if engines:
+        app.extensions["replicas"] = replica_set(app, engines)
+
+def replica_set(app: Flask, engines: dict[str, Engine]) -> ReplicaSet:
+    """ ReplicaSet of engines, whose statements are instrumented and whose lost connections mark them unhealthy
+
+    Args:
+        app (Flask): app with the DB_REPLICA_* settings
+        engines (dict[str, Engine]): replica engines keyed by bind key, the sync_engine of async engines
+
+    Returns:
+        ReplicaSet: replicas to register in the app extensions
+    """
+    replicas = ReplicaSet(engines=engines, health_interval=app.config['DB_REPLICA_HEALTH_INTERVAL'])
+    for key, engine in engines.items():
+        # Counted and timed with the primary's statements in the request metrics, and recorded in request profiles
+        instrument_queries(engine)
+        instrument_profiling(engine)
+        event.listen(engine, "handle_error", functools.partial(_on_replica_error, replicas, key))
+    return replicas
+
+def _on_replica_error(replicas: ReplicaSet, key: str, exception_context) -> None:
+    # Lost connections take the replica out of rotation until its next health check
+    if exception_context.is_disconnect or exception_context.connection is None:
+        logger.warning(f"Read replica {key} disconnected: {str(exception_context.original_exception)}")
+        replicas.set_health(key, False)
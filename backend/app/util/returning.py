@@ -0,0 +1,30 @@
+from sqlalchemy import ColumnElement, Insert, Row, Update
+
+from ..extensions import db
+from .serializers import ModelSerializer
+
+# Single-row writes that hand back the stored row, used by create/update controllers
+# instead of committing and reading the object again with db.session.get
+
+def write_returning(statement: Insert | Update, serializer: ModelSerializer, where: ColumnElement[bool]) -> Row | None:
+    """ Executes INSERT/UPDATE and returns the written row in serializer column order
+
+    Uses INSERT/UPDATE ... RETURNING when the dialect supports it (Postgres, SQLite >= 3.35),
+    otherwise falls back to selecting the row inside the same transaction.
+
+    Args:
+        statement (Insert | Update): write statement affecting at most one row
+        serializer (ModelSerializer): serializer of the written model
+        where (ColumnElement[bool]): criteria selecting the written row, used by the fallback
+
+    Returns:
+        Row | None: written row, None when an update matched no row
+    """
+    dialect = db.session.get_bind().dialect
+    supports_returning = dialect.insert_returning if isinstance(statement, Insert) else dialect.update_returning
+
+    if supports_returning:
+        return db.session.execute(statement.returning(*serializer.columns)).one_or_none()
+
+    db.session.execute(statement)
+    return db.session.execute(serializer.select().where(where)).one_or_none()
@@ -0,0 +1,238 @@
+import asyncio
+import functools
+import inspect
+import logging
+import math
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import NamedTuple
+from flask import copy_current_request_context, current_app, request
+from flask_caching import Cache
+from sqlalchemy.util import await_only
+from sqlalchemy.util.concurrency import in_greenlet
+
+# Response caching without thundering herds.
+#
+# Cached views are stored as CacheEntry with the time they stop being fresh and how long they took
+# to compute. A lookup then
+# * returns fresh entries, except that an entry may be refreshed early with a probability rising
+#   towards its expiry (XFetch: delta * beta * -log(random) >= time left), which spreads the
+#   recomputations of hot keys instead of having them all expire at the same moment
+# * returns expired entries for up to CACHE_STALE_TTL seconds while a single background thread
+#   recomputes them (stale-while-revalidate)
+# * on a miss lets a single caller compute the response while the others wait for its result
+#   (single flight), e.g. right after a write invalidated a hot list. In the ASGI app the waiting
+#   callers sleep on the event loop, so the caller holding the claim keeps running its queries
+#
+# Refreshes and computations are claimed with an add() of "<key>:lock" in the cache backend. With
+# SharedRedisCache that is one Redis SETNX shared by every worker, with SimpleCache a claim per
+# process. Entries removed by invalidation are gone and never served stale.
+
+logger = logging.getLogger(__name__)
+
+# Seconds between lookups of a caller waiting for another caller's computation
+LOCK_POLL_INTERVAL = 0.01
+
+# Set while a response is computed to be cached, in the request or in a background refresh
+_computing = ContextVar("computing_cached_response", default=False)
+
+def computing_cached_response() -> bool:
+    """ Whether the running code computes a response that will be cached and served to every client """
+    return _computing.get()
+
+class CacheEntry(NamedTuple):
+    """ Cached view response with its freshness """
+    value: object
+    fresh_until: float
+    compute_seconds: float
+
+    def should_refresh(self, now: float, beta: float) -> bool:
+        """ Whether the entry is expired, or picked for early expiry
+
+        Args:
+            now (float): current time.time()
+            beta (float): early expiry factor, 0 disables early expiry and larger values refresh earlier
+
+        Returns:
+            bool: True when the entry should be recomputed
+        """
+        if now >= self.fresh_until:
+            return True
+        return beta > 0 and self.compute_seconds * beta * -math.log(1.0 - random.random()) >= self.fresh_until - now
+
+def _sleep(seconds: float) -> None:
+    """ Sleeps without blocking the event loop of the ASGI app
+
+    Requests of AsyncApp run in the greenlet of AsyncSession.run_sync on the event loop thread,
+    where time.sleep would also stop every other request of the worker.
+    """
+    if in_greenlet():
+        await_only(asyncio.sleep(seconds))
+    else:
+        time.sleep(seconds)
+
+class RevalidatingCache(Cache):
+    """ Cache whose cached() views are protected against stampedes and serve stale responses while they are refreshed
+
+    Configured through CACHE_STALE_TTL, CACHE_EARLY_EXPIRY_BETA and CACHE_LOCK_TIMEOUT.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._refreshes = set()
+        self._refreshes_lock = threading.Lock()
+
+    def cached(self, timeout: int | None = None, key_prefix: str = "view/%s", unless=None, response_filter=None, make_cache_key=None, **kwargs):
+        """ Decorator caching the response of a view, same arguments as flask_caching's Cache.cached
+
+        Args:
+            timeout (int | None): seconds a response is fresh, CACHE_DEFAULT_TIMEOUT by default and 0 for never expiring
+            key_prefix (str): cache key, "%s" is replaced with the request path, unused with make_cache_key
+            unless (Callable | None): bypasses the cache when it returns True
+            response_filter (Callable | None): only responses it returns True for are cached
+            make_cache_key (Callable | None): returns the cache key from the view arguments
+        """
+        if kwargs:
+            raise TypeError(f"Unsupported cached() arguments: {', '.join(kwargs)}")
+
+        def decorator(view):
+            def cache_key(*args, **kwargs) -> str:
+                if make_cache_key is not None:
+                    return make_cache_key(*args, **kwargs)
+                return key_prefix % request.path if "%s" in key_prefix else key_prefix
+
+            @functools.wraps(view)
+            def decorated(*args, **kwargs):
+                if self._bypass_cache(unless, view, *args, **kwargs):
+                    return self._call_fn(view, *args, **kwargs)
+
+                try:
+                    key = cache_key(*args, **kwargs)
+                    entry = self.cache.get(key)
+                except Exception:
+                    logger.exception("Exception possibly due to cache backend.")
+                    return self._call_fn(view, *args, **kwargs)
+
+                store = functools.partial(self._store, key, timeout, response_filter)
+                config = current_app.config
+                if isinstance(entry, CacheEntry):
+                    now = time.time()
+                    if not entry.should_refresh(now, beta=config['CACHE_EARLY_EXPIRY_BETA']):
+                        return entry.value
+                    if now >= entry.fresh_until:
+                        self._on_stale()
+                    # Expired entries are only still present within CACHE_STALE_TTL, early expired ones are fresh
+                    self._refresh_in_background(key, lambda: self._call_fn(view, *args, **kwargs), store)
+                    return entry.value
+
+                return self._compute_once(key, lambda: self._call_fn(view, *args, **kwargs), store)
+
+            # Same helpers as Cache.cached, e.g. cache.delete(view.make_cache_key(...)) drops the cached response
+            decorated.uncached = view
+            decorated.cache_timeout = timeout
+            decorated.make_cache_key = cache_key
+            return decorated
+        return decorator
+
+    def _on_stale(self) -> None:
+        """ Called when an expired response is served while it is refreshed """
+
+    def _lock_key(self, key: str) -> str:
+        return f"{key}:lock"
+
+    def _claim(self, key: str) -> bool:
+        """ Claims the computation of key, False when another caller holds it """
+        try:
+            return self.cache.add(self._lock_key(key), True, timeout=max(1, math.ceil(current_app.config['CACHE_LOCK_TIMEOUT'])))
+        except Exception:
+            logger.exception("Exception possibly due to cache backend.")
+            return True
+
+    def _release(self, key: str) -> None:
+        try:
+            self.cache.delete(self._lock_key(key))
+        except Exception:
+            logger.exception("Exception possibly due to cache backend.")
+
+    def _store(self, key: str, timeout: int | None, response_filter, compute):
+        """ Computes the response and caches it when response_filter accepts it """
+        start = time.perf_counter()
+        token = _computing.set(True)
+        try:
+            rv = compute()
+            if inspect.isgenerator(rv):
+                rv = list(rv)
+        finally:
+            _computing.reset(token)
+        compute_seconds = time.perf_counter() - start
+        if response_filter is not None and not response_filter(rv):
+            return rv
+
+        config = current_app.config
+        fresh_seconds = config['CACHE_DEFAULT_TIMEOUT'] if timeout is None else timeout
+        if fresh_seconds:
+            fresh_until = time.time() + fresh_seconds
+            # Expired entries are kept a little longer to be served while they are refreshed
+            backend_timeout = fresh_seconds + config['CACHE_STALE_TTL']
+        else:
+            fresh_until, backend_timeout = math.inf, 0
+        try:
+            self.cache.set(key, CacheEntry(rv, fresh_until, compute_seconds), timeout=backend_timeout)
+        except Exception:
+            logger.exception("Exception possibly due to cache backend.")
+        return rv
+
+    def _compute_once(self, key: str, compute, store):
+        """ Computes the response of a missing key, or waits for the caller already computing it """
+        claimed = self._claim(key)
+        if not claimed:
+            deadline = time.monotonic() + current_app.config['CACHE_LOCK_TIMEOUT']
+            lock_key = self._lock_key(key)
+            while time.monotonic() < deadline:
+                _sleep(LOCK_POLL_INTERVAL)
+                try:
+                    entry = self.cache.get(key)
+                    if isinstance(entry, CacheEntry):
+                        return entry.value
+                    # The other caller finished without caching a response, e.g. an error
+                    if not self.cache.has(lock_key):
+                        break
+                except Exception:
+                    logger.exception("Exception possibly due to cache backend.")
+                    break
+            # Computed here when the other caller did not cache a response in time
+        try:
+            return store(compute)
+        finally:
+            if claimed:
+                self._release(key)
+
+    def _refresh_in_background(self, key: str, compute, store) -> None:
+        """ Recomputes key in a thread with a copy of the request context, unless it is refreshed already """
+        if not self._claim(key):
+            return
+
+        @copy_current_request_context
+        def refresh():
+            try:
+                store(compute)
+            except Exception:
+                logger.exception(f"Background refresh of cache key {key} failed")
+            finally:
+                self._release(key)
+                with self._refreshes_lock:
+                    self._refreshes.discard(threading.current_thread())
+
+        thread = threading.Thread(target=refresh, name="cache-refresh", daemon=True)
+        with self._refreshes_lock:
+            self._refreshes.add(thread)
+        thread.start()
+
+    def wait_for_refreshes(self, timeout: float | None = None) -> None:
+        """ Waits until the running background refreshes have finished, e.g. before shutdown or in tests """
+        with self._refreshes_lock:
+            threads = list(self._refreshes)
+        for thread in threads:
+            thread.join(timeout)
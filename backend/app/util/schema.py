@@ -0,0 +1,96 @@
+import logging
+import os
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config as AlembicConfig
+from alembic.migration import MigrationContext
+from sqlalchemy import inspect
+from sqlalchemy.engine import Engine
+
+from ..extensions import db
+from .search import is_search_object
+
+# Database schema setup at startup, selected through Config.DB_SCHEMA_MODE:
+#
+#   create   db.create_all(), reflects every table on each start (default, used by tests)
+#   migrate  applies pending Alembic migrations from backend/migrations
+#   none     no schema work, fastest start when migrations are applied once before the workers start
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_MODES = ("create", "migrate", "none")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Revision matching the schema previously created by db.create_all()
+BASELINE_REVISION = "0001"
+
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    """ Filter for comparing models with the database, used by autogenerate and upgrade_database
+
+    Search columns, indexes and FTS tables are created alongside the tables, not declared by the models.
+    """
+    return not (reflected and compare_to is None and is_search_object(name, type_))
+
+def alembic_config() -> AlembicConfig:
+    """ Alembic config of the backend, usable from any working directory """
+    config = AlembicConfig(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    # Logging is configured by the app or gunicorn, not by alembic.ini
+    config.attributes["configure_logger"] = False
+    return config
+
+def upgrade_database(engine: Engine, revision: str = "head") -> None:
+    """ Applies pending migrations to the database of engine
+
+    Databases created by db.create_all() have no migration history. They are stamped with the
+    latest revision when they match the current models, and with the baseline revision otherwise,
+    so only migrations they are missing are applied.
+
+    Args:
+        engine (Engine): engine of the database to migrate
+        revision (str): target revision
+    """
+    config = alembic_config()
+    # Alembic owns the transactions of the migration connections. A connection already in a
+    # transaction counts as external, and autocommit_block() (CREATE INDEX CONCURRENTLY) fails in it.
+    with engine.connect() as connection:
+        table_names = inspect(connection).get_table_names()
+        if "alembic_version" not in table_names and "author" in table_names:
+            # Importing all models to include into SQLAlchemy Metadata
+            from ..authors.author import Author
+            from ..books.book import Book
+
+            changes = compare_metadata(MigrationContext.configure(connection, opts={"include_object": include_object}), db.metadata)
+            stamp_revision = BASELINE_REVISION if changes else "head"
+            # Ends the transaction begun by the inspection before alembic begins its own
+            connection.rollback()
+            logger.warning(f"Database has no migration history, stamping it with revision {stamp_revision}")
+            config.attributes["connection"] = connection
+            command.stamp(config, stamp_revision)
+            connection.commit()
+
+    with engine.connect() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, revision)
+        connection.commit()
+
+def init_schema(mode: str, db) -> None:
+    """ Prepares the schema of the app database according to mode, inside an app context
+
+    Args:
+        mode (str): one of SCHEMA_MODES
+        db: Flask-SQLAlchemy extension object
+
+    Raises:
+        ValueError: mode is unknown
+    """
+    if mode not in SCHEMA_MODES:
+        raise ValueError(f"Check that DB_SCHEMA_MODE is one of: {', '.join(SCHEMA_MODES)}")
+
+    if mode == "create":
+        # Create all tables according to schema from model in metadata, on the primary only as read replicas get it through replication
+        db.create_all(bind_key=None)
+    elif mode == "migrate":
+        upgrade_database(db.engine)
@@ -0,0 +1,164 @@
+import re
+from collections.abc import Sequence
+
+from sqlalchemy import DDL, Select, Table, column, event, func, literal_column, table
+
+from .serializers import ModelSerializer
+
+# Full-text search over text columns of a model table.
+#
+# Postgres: a GIN index on the weighted tsvector expression of the text columns, queried with
+# websearch_to_tsquery and ranked by ts_rank_cd. Indexing the expression instead of a stored
+# column adds no column, so the index is built CONCURRENTLY without rewriting the table.
+# SQLite: an external-content FTS5 table `<table>_fts` kept in sync by triggers, ranked by bm25.
+# FTS5 rows are keyed by an integer, and the implicit rowids of tables without an INTEGER PRIMARY
+# KEY may change (VACUUM, table rebuilds), so ids are mapped to stable integers in `<table>_fts_rowid`.
+#
+# The search objects are not part of the models, they are created along with the tables by
+# db.create_all() (see register_search_index) and by the migrations. Note that Alembic batch
+# operations recreate SQLite tables, which drops the triggers, so migrations using them have to
+# recreate the triggers and rebuild the FTS table.
+
+SEARCH_LANGUAGE = "english"
+
+# Text columns are weighted by position, e.g. a match in a title ranks above one in a description
+WEIGHTS = ("A", "B", "C", "D")
+BM25_WEIGHTS = ("10.0", "4.0", "2.0", "1.0")
+
+# Searched text columns of every table with a search index, filled by register_search_index
+SEARCH_COLUMNS = {}
+
+def fts_table_name(table_name: str) -> str:
+    return f"{table_name}_fts"
+
+def fts_rowid_table_name(table_name: str) -> str:
+    return f"{table_name}_fts_rowid"
+
+def fts_content_view_name(table_name: str) -> str:
+    return f"{table_name}_fts_content"
+
+def search_index_name(table_name: str) -> str:
+    return f"ix_{table_name}_search"
+
+def search_vector_sql(columns: Sequence[str]) -> str:
+    """ Weighted tsvector expression of columns, queries have to use the same expression as the index """
+    return " || ".join(
+        f"setweight(to_tsvector('{SEARCH_LANGUAGE}', coalesce({name}, '')), '{weight}')" for name, weight in zip(columns, WEIGHTS)
+    )
+
+def postgresql_search_ddl(table_name: str, columns: Sequence[str]) -> list[str]:
+    """ Statement creating the GIN expression index of table on Postgres """
+    return [f"CREATE INDEX IF NOT EXISTS {search_index_name(table_name)} ON {table_name} USING GIN (({search_vector_sql(columns)}))"]
+
+def sqlite_search_ddl(table_name: str, columns: Sequence[str]) -> list[str]:
+    """ Statements creating the FTS5 table of table, its id mapping and the triggers keeping them in sync on SQLite """
+    fts = fts_table_name(table_name)
+    rowids = fts_rowid_table_name(table_name)
+    content = fts_content_view_name(table_name)
+    names = ", ".join(columns)
+    new_values = ", ".join(f"new.{name}" for name in columns)
+    old_values = ", ".join(f"old.{name}" for name in columns)
+    old_rowid = f"(SELECT fts_rowid FROM {rowids} WHERE id = old.id)"
+    new_rowid = f"(SELECT fts_rowid FROM {rowids} WHERE id = new.id)"
+    return [
+        f"CREATE TABLE IF NOT EXISTS {rowids} (fts_rowid INTEGER PRIMARY KEY, id NOT NULL UNIQUE)",
+        f"CREATE VIEW IF NOT EXISTS {content} AS SELECT {rowids}.fts_rowid, {', '.join(f'{table_name}.{name}' for name in columns)} "
+        f"FROM {table_name} JOIN {rowids} ON {rowids}.id = {table_name}.id",
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({names}, content='{content}', content_rowid='fts_rowid', tokenize='porter unicode61')",
+        f"INSERT INTO {fts}({fts}, rank) VALUES ('rank', 'bm25({', '.join(BM25_WEIGHTS[:len(columns)])})')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table_name} BEGIN "
+        f"INSERT INTO {rowids}(id) VALUES (new.id); "
+        f"INSERT INTO {fts}(rowid, {names}) VALUES ({new_rowid}, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table_name} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', {old_rowid}, {old_values}); "
+        f"DELETE FROM {rowids} WHERE id = old.id; END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table_name} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', {old_rowid}, {old_values}); "
+        f"UPDATE {rowids} SET id = new.id WHERE id = old.id; "
+        f"INSERT INTO {fts}(rowid, {names}) VALUES ({new_rowid}, {new_values}); END",
+        # Indexes rows already in the table, e.g. when added by a migration
+        f"INSERT OR IGNORE INTO {rowids}(id) SELECT id FROM {table_name}",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+def sqlite_drop_search_ddl(table_name: str) -> list[str]:
+    """ Statements dropping the search objects of table on SQLite, its triggers are dropped with the table """
+    return [
+        f"DROP TABLE IF EXISTS {fts_table_name(table_name)}",
+        f"DROP VIEW IF EXISTS {fts_content_view_name(table_name)}",
+        f"DROP TABLE IF EXISTS {fts_rowid_table_name(table_name)}",
+    ]
+
+def register_search_index(model_table: Table, columns: Sequence[str]) -> None:
+    """ Creates the search objects of model_table whenever the table itself is created or dropped
+
+    Args:
+        model_table (Table): table of the model
+        columns (Sequence[str]): text columns to search, in decreasing rank weight
+    """
+    SEARCH_COLUMNS[model_table.name] = tuple(columns)
+    for statement in postgresql_search_ddl(model_table.name, columns):
+        event.listen(model_table, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+    for statement in sqlite_search_ddl(model_table.name, columns):
+        event.listen(model_table, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+    for statement in sqlite_drop_search_ddl(model_table.name):
+        event.listen(model_table, "before_drop", DDL(statement).execute_if(dialect="sqlite"))
+
+def is_search_object(name: str | None, type_: str) -> bool:
+    """ Whether a reflected database object belongs to a search index, which the models do not declare
+
+    Used as include_object filter when comparing models with the database.
+    """
+    if name is None:
+        return False
+    if type_ == "table":
+        return re.search(r"_fts(_\w+)?$", name) is not None
+    return type_ == "index" and re.search(r"^ix_\w+_search$", name) is not None
+
+def fts5_query(q: str) -> str:
+    """ FTS5 query matching all words of q, user input is never parsed as FTS5 query syntax
+
+    Args:
+        q (str): search text
+
+    Returns:
+        str: quoted terms combined with AND, empty when q has no words
+    """
+    return " ".join(f'"{term}"' for term in re.findall(r"\w+", q))
+
+def search_select(serializer: ModelSerializer, q: str, dialect: str) -> Select:
+    """ Column-only select of rows matching q, best matches first
+
+    Args:
+        serializer (ModelSerializer): serializer of the searched model
+        q (str): search text
+        dialect (str): name of the database dialect
+
+    Raises:
+        ValueError: dialect has no search support
+
+    Returns:
+        Select: statement ordered by rank, then id
+    """
+    model = serializer.model
+    table_name = model.__table__.name
+
+    if dialect == "postgresql":
+        # Same expression as the index, which is only used by queries matching it
+        vector = literal_column(f"({search_vector_sql(SEARCH_COLUMNS[table_name])})")
+        query = func.websearch_to_tsquery(SEARCH_LANGUAGE, q)
+        return serializer.select().where(vector.bool_op("@@")(query)).order_by(func.ts_rank_cd(vector, query).desc(), model.id)
+
+    if dialect == "sqlite":
+        fts_name = fts_table_name(table_name)
+        fts = table(fts_name, column("rowid"), column("rank"), column(fts_name))
+        rowids = table(fts_rowid_table_name(table_name), column("fts_rowid"), column("id"))
+        return (
+            serializer.select()
+            .join_from(model, rowids, rowids.c.id == model.id)
+            .join(fts, fts.c.rowid == rowids.c.fts_rowid)
+            .where(fts.c[fts_name].op("MATCH")(fts5_query(q)))
+            .order_by(fts.c.rank, model.id)
+        )
+
+    raise ValueError(f"Search is not supported on {dialect}")
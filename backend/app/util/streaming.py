@@ -0,0 +1,48 @@
+from collections.abc import Iterable, Iterator
+from flask import Response, current_app, request, stream_with_context
+
+# Streaming (NDJSON) export helpers shared by the list endpoints.
+# Rows are serialized one at a time and flushed in chunks, so peak memory stays at one chunk
+# instead of the whole table.
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+# Number of serialized rows joined into each chunk written to the socket
+STREAM_CHUNK_ROWS = 500
+
+def wants_stream() -> bool:
+    """ Whether current request asked for a streamed NDJSON response
+
+    Returns:
+        bool: True when `?stream=1` is set or NDJSON is the preferred Accept type
+    """
+    if request.args.get("stream", "").lower() in ("1", "true"):
+        return True
+
+    return request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+def ndjson_response(rows: Iterable[dict]) -> Response:
+    """ Builds streamed response writing one JSON document per line
+
+    Args:
+        rows (Iterable[dict]): lazily produced rows, consumed while the response is sent
+
+    Returns:
+        Response: chunked response with application/x-ndjson mimetype
+    """
+    # Rows are encoded straight to bytes when the app uses FastJSONProvider
+    json = current_app.json
+    dumps = getattr(json, "dumps_bytes", lambda row: json.dumps(row).encode())
+
+    def generate() -> Iterator[bytes]:
+        chunk = []
+        for row in rows:
+            chunk.append(dumps(row))
+            if len(chunk) >= STREAM_CHUNK_ROWS:
+                yield b"\n".join(chunk) + b"\n"
+                chunk = []
+        if chunk:
+            yield b"\n".join(chunk) + b"\n"
+
+    # Request context is kept alive while streaming so the DB session stays usable
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
@@ -1,44 +1,224 @@
-from schema import Schema, And
-from datetime import datetime
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterable
+from datetime import date, datetime
+import re
+
+from .ids import is_uuid
 
 DATE_FORMAT = f"%Y-%m-%d"
 
+# Request validation compiled into plain converter functions: every field is checked and converted
+# to its typed value (e.g. dates into datetime.date) in a single pass, and controllers receive the
+# converted values. Error messages are the same as those of the schema library used before.
+
+class ValidationError(ValueError):
+    """ Request data failed validation, the message is passed to the response for easier debugging """
+
+# Returned by converters for invalid values, avoids raising an exception per field
+INVALID = object()
+
+def parse_date(date_str: str) -> date:
+    """ Parses a date in DATE_FORMAT
+
+    Args:
+        date_str (str): date string, e.g. "1990-01-01"
+
+    Raises:
+        ValueError: date_str is not a valid date in DATE_FORMAT
+
+    Returns:
+        date: parsed calendar date
+    """
+    # Canonical YYYY-MM-DD dates use the C ISO parser, other spellings accepted by strptime (e.g. 1990-1-1) fall back to it
+    if len(date_str) == 10 and date_str[4] == "-" and date_str[7] == "-":
+        try:
+            return date.fromisoformat(date_str)
+        except ValueError:
+            pass
+    return datetime.strptime(date_str, DATE_FORMAT).date()
+
 # Date validation function according to constant Date Format
 def validate_date(date_str: str) -> bool:
     try:
-        datetime.strptime(date_str, DATE_FORMAT)
+        parse_date(date_str)
         return True
     except Exception as e:
         return False
 
-# Validate that input arg is both string and non-empty    
+# Validate that input arg is both string and non-empty
 def validate_str_and_nonempty(input_str) -> bool:
     if isinstance(input_str, str):
         if len(input_str) > 0:
             return True
-    
+
     return False
 
+# Validate that input arg is a UUID string, the format of all ids
+def validate_id(input_str) -> bool:
+    return isinstance(input_str, str) and is_uuid(input_str)
+
+SEARCH_TEXT_MAX_LENGTH = 256
+
+# Validate that search text contains at least one word and is of bounded length
+def validate_search_text(input_str) -> bool:
+    return isinstance(input_str, str) and len(input_str) <= SEARCH_TEXT_MAX_LENGTH and re.search(r"\w", input_str) is not None
+
+# Converters returning the typed value of valid input or INVALID
+
+def to_nonempty_str(value):
+    return value if isinstance(value, str) and value else INVALID
+
+def to_date(value):
+    if not isinstance(value, str) or not value:
+        return INVALID
+    try:
+        return parse_date(value)
+    except ValueError:
+        return INVALID
+
+def to_id(value):
+    return value if isinstance(value, str) and is_uuid(value) else INVALID
+
+def to_search_text(value):
+    return value if validate_search_text(value) else INVALID
+
+class Validator(ABC):
+    """ Base class of request validators """
+
+    @abstractmethod
+    def validate(self, data):
+        """ Validates and converts data
+
+        Args:
+            data: value from the request body
+
+        Raises:
+            ValidationError: data is invalid, with the message passed to the response
+
+        Returns:
+            validated value, converted to its typed form
+        """
+
+    def validate_many(self, items: Iterable) -> tuple[list[tuple[int, object]], dict[int, str]]:
+        """ Validates every item of an array payload, invalid items do not stop validation
+
+        Args:
+            items (Iterable): items of a JSON array
+
+        Returns:
+            tuple[list[tuple[int, object]], dict[int, str]]: (index, validated item) pairs and error messages keyed by index
+        """
+        validate = self.validate
+        validated_items = []
+        errors = {}
+        for index, item in enumerate(items):
+            try:
+                validated_items.append((index, validate(item)))
+            except ValidationError as e:
+                errors[index] = str(e)
+        return validated_items, errors
+
+class ValueValidator(Validator):
+    """ Validator of a single value
+
+    Args:
+        convert (Callable): returns the typed value, or INVALID
+        error (str): message of the ValidationError raised for invalid values
+    """
+
+    def __init__(self, convert: Callable, error: str):
+        self.convert = convert
+        self.error = error
+
+    def validate(self, data):
+        value = self.convert(data)
+        if value is INVALID:
+            raise ValidationError(self.error)
+        return value
+
+class RecordValidator(Validator):
+    """ Validator of a JSON object whose keys are all required and no other keys are allowed
+
+    Checks happen in the same order as in the schema library: values in request order (object
+    values last), then missing keys, then unexpected keys.
+
+    Args:
+        fields (dict[str, ValueValidator]): validator of every key
+    """
+
+    def __init__(self, fields: dict[str, ValueValidator]):
+        self.fields = fields
+        self._converters = {key: (field.convert, field.error) for key, field in fields.items()}
+
+    def validate(self, data) -> dict:
+        if not isinstance(data, dict):
+            raise ValidationError(f"{data!r} should be instance of 'dict'")
+
+        converters = self._converters
+        validated = {}
+        object_error = None
+        for key, value in data.items():
+            converter = converters.get(key)
+            if converter is None:
+                continue
+            converted = converter[0](value)
+            if converted is INVALID:
+                if not isinstance(value, dict):
+                    raise ValidationError(converter[1])
+                object_error = object_error or converter[1]
+                continue
+            validated[key] = converted
+
+        if object_error is not None:
+            raise ValidationError(object_error)
+        if len(validated) != len(converters):
+            missing_keys = converters.keys() - validated.keys()
+            raise ValidationError("Missing key%s: %s" % (
+                "s" if len(missing_keys) > 1 else "", ", ".join(repr(key) for key in sorted(missing_keys, key=repr))))
+        if len(validated) != len(data):
+            wrong_keys = data.keys() - validated.keys()
+            raise ValidationError("Wrong key%s %s in %r" % (
+                "s" if len(wrong_keys) > 1 else "", ", ".join(repr(key) for key in sorted(wrong_keys, key=repr)), data))
+        return validated
+
 # Request schemas to aid in debugging
 
-# Create/Update Author Schema to validate requests on those endpoints, raises SchemaError with error message as defined which is passed to Response for easier debugging
-create_update_author_schema = Schema(
+# Create/Update Author Schema to validate requests on those endpoints, raises ValidationError with error message as defined which is passed to Response for easier debugging
+create_update_author_schema = RecordValidator(
+    {
+        "name": ValueValidator(to_nonempty_str, error="Check that name is non-empty and is a string"),
+        "bio": ValueValidator(to_nonempty_str, error="Check that bio is non-empty and is a string"),
+        "birth_date": ValueValidator(to_date, error="Check that birth_date is non-empty, is a string and uses the following date format: YYYY-MM-DD")
+    }
+)
+
+# Create/Update Book Schema to validate requests on those endpoints, raises ValidationError with error message as defined which is passed to Response for easier debugging
+create_update_book_schema = RecordValidator(
+    {
+        "title": ValueValidator(to_nonempty_str, error="Check that title is non-empty and is a string"),
+        "description": ValueValidator(to_nonempty_str, error="Check that description is non-empty and is a string"),
+        "publish_date": ValueValidator(to_date, error="Check that publish_date is non-empty, is a string and uses the following date format: YYYY-MM-DD"),
+        "author_id": ValueValidator(to_id, error="Check that author_id is a UUID string and is in the database")
+    }
+)
+
+# ID schema to check that ids are UUID strings
+id_schema = ValueValidator(to_id, error="Check that id is a UUID string")
+
+# Batch update schemas, same fields as create/update schemas plus the id of the object to update
+batch_update_author_schema = RecordValidator(
     {
-        "name": And(validate_str_and_nonempty, error="Check that name is non-empty and is a string"),
-        "bio": And(validate_str_and_nonempty, error="Check that bio is non-empty and is a string"),
-        "birth_date": And(validate_str_and_nonempty, validate_date, error="Check that birth_date is non-empty, is a string and uses the following date format: YYYY-MM-DD")
+        "id": id_schema,
+        **create_update_author_schema.fields
     }
 )
 
-# Create/Update Book Schema to validate requests on those endpoints, raises SchemaError with error message as defined which is passed to Response for easier debugging
-create_update_book_schema = Schema(
+batch_update_book_schema = RecordValidator(
     {
-        "title": And(validate_str_and_nonempty, error="Check that title is non-empty and is a string"),
-        "description": And(validate_str_and_nonempty, error="Check that description is non-empty and is a string"),
-        "publish_date": And(validate_str_and_nonempty, validate_date, error="Check that publish_date is non-empty, is a string and uses the following date format: YYYY-MM-DD"),
-        "author_id": And(validate_str_and_nonempty, error="Check that title is non-empty, is a string and is in the database")
+        "id": id_schema,
+        **create_update_book_schema.fields
     }
 )
 
-# ID schema to simply check string and non-empty
-id_schema = Schema(And(validate_str_and_nonempty, error="Check that id is non-empty and is a string"))
+# Search text schema for the q query argument of search endpoints
+search_text_schema = ValueValidator(to_search_text, error=f"Check that q contains at least one word and at most {SEARCH_TEXT_MAX_LENGTH} characters")
@@ -0,0 +1,11 @@
+# ASGI entry point of the optional async mode, see app/asgi.py:
+#
+#     uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 4
+#     GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn -c gunicorn.conf.py asgi:app
+#
+# Requests run the same Flask routes and controllers as wsgi.py, with database I/O on an async
+# engine (asyncpg / aiosqlite), so one worker process serves many concurrent requests waiting on the DB.
+from app.app import app as flask_app
+from app.asgi import AsyncApp
+
+app = AsyncApp(flask_app)
@@ -0,0 +1,99 @@
+"""Sync (gunicorn gthread) vs async (uvicorn + async engine) serving benchmark.
+
+Starts one worker process of each serving mode against the same seeded SQLite file database and
+drives it with bench.loadtest at high concurrency. Every SQL statement is delayed by --latency-ms on
+the database connection, standing in for the network round trip to a remote Postgres, so the run
+shows how many concurrent requests a single worker keeps in flight while waiting on I/O. The response
+cache is disabled so every request reaches the database:
+
+    python -m bench.bench_async --concurrency 64 --latency-ms 20
+
+The servers load this module as their entry point (bench.bench_async:wsgi_app / :asgi_app), which
+adds the latency to the app's engines.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from sqlalchemy import event
+from sqlalchemy.util import await_only
+
+from bench.loadtest import BACKEND_DIR, free_port, print_result, run_load, seed_database, wait_until_listening
+
+LATENCY_ENV = "BENCH_DB_LATENCY_MS"
+
+
+def _sleep_per_statement(statement: str) -> None:
+    time.sleep(float(os.environ.get(LATENCY_ENV, "0")) / 1000)
+
+def _add_sync_latency(dbapi_connection, connection_record) -> None:
+    dbapi_connection.set_trace_callback(_sleep_per_statement)
+
+def _add_async_latency(dbapi_connection, connection_record) -> None:
+    # aiosqlite runs the sqlite3 connection in its own thread, so the delay only blocks that connection
+    await_only(dbapi_connection.driver_connection.set_trace_callback(_sleep_per_statement))
+
+def __getattr__(name: str):
+    # Entry points are created on first access, inside the server worker process
+    if name == "wsgi_app":
+        from app.app import app
+        from app.extensions import db
+        with app.app_context():
+            event.listen(db.engine, "connect", _add_sync_latency)
+        return app
+    if name == "asgi_app":
+        from app.app import app
+        from app.asgi import AsyncApp
+        asgi_app = AsyncApp(app)
+        event.listen(asgi_app.engine.sync_engine, "connect", _add_async_latency)
+        return asgi_app
+    raise AttributeError(name)
+
+def serve(label: str, command: list[str], env: dict, args) -> None:
+    server = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+    try:
+        url = f"http://127.0.0.1:{env['FLASK_RUN_PORT']}"
+        wait_until_listening(int(env["FLASK_RUN_PORT"]))
+        run_load(url, args.paths, args.concurrency, min(args.duration, 2), args.processes)  # warm-up
+        print_result(label, run_load(url, args.paths, args.concurrency, args.duration, args.processes))
+    finally:
+        server.terminate()
+        server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paths", default="/authors?limit=20,/books?limit=20", type=lambda value: value.split(","), help="comma separated GET paths, requested round robin")
+    parser.add_argument("--concurrency", type=int, default=64, help="concurrent connections")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load per run")
+    parser.add_argument("--processes", type=int, default=4, help="client processes generating load")
+    parser.add_argument("--threads", type=int, default=4, help="gthread threads of the sync worker")
+    parser.add_argument("--pool-size", type=int, default=16, help="DB_POOL_SIZE of both servers")
+    parser.add_argument("--latency-ms", type=float, default=20, help="delay added to every SQL statement")
+    parser.add_argument("--authors", type=int, default=1000, help="authors seeded")
+    parser.add_argument("--books-per-author", type=int, default=10, help="books per author seeded")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench_async.db")
+        seed_database(f"sqlite:///{path}", authors=args.authors, books_per_author=args.books_per_author)
+        print(f"1 worker per server, concurrency {args.concurrency}, {args.latency_ms} ms per statement, pool size {args.pool_size}")
+
+        env = {**os.environ, "DB_CONNECTION_STRING": f"sqlite:///{path}", "DB_ASYNC_CONNECTION_STRING": f"sqlite+aiosqlite:///{path}",
+               "DB_SCHEMA_MODE": "none", "CACHE_TYPE": "NullCache", "DB_POOL_SIZE": str(args.pool_size), LATENCY_ENV: str(args.latency_ms),
+               "FLASK_RUN_HOST": "127.0.0.1", "GUNICORN_WORKERS": "1", "GUNICORN_THREADS": str(args.threads),
+               "GUNICORN_ACCESS_LOG": "", "GUNICORN_LOG_LEVEL": "warning"}
+
+        port = str(free_port())
+        serve(f"gthread x{args.threads}", [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "bench.bench_async:wsgi_app"],
+              {**env, "FLASK_RUN_PORT": port}, args)
+
+        port = str(free_port())
+        serve("uvicorn (async)", [sys.executable, "-m", "uvicorn", "bench.bench_async:asgi_app", "--host", "127.0.0.1", "--port", port,
+                                  "--log-level", "warning", "--no-access-log"],
+              {**env, "FLASK_RUN_PORT": port}, args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Throughput of the list endpoints with Flask's default JSON provider and FastJSONProvider.
+
+First measures encoding alone, then requests go through the Flask test client against an in-memory SQLite database with the response
+cache disabled, so every request queries, serializes and encodes its page.
+
+Run from the backend directory:
+
+    python -m bench.bench_json --requests 200
+"""
+import argparse
+import os
+import time
+from datetime import date
+
+os.environ.setdefault("CACHE_TYPE", "NullCache")
+
+from flask.json.provider import DefaultJSONProvider
+
+from app.app import app, db
+from app.authors.author import Author
+from app.books.book import Book
+from app.util.json_provider import FastJSONProvider
+
+PATHS = ("/books?limit=1000", "/authors?limit=1000", "/authors?limit=100&include=books")
+
+
+def throughput(client, path: str, requests: int) -> float:
+    assert client.get(path).status_code == 200  # warm-up
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get(path)
+    return requests / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="requests per path, provider and round")
+    parser.add_argument("--rounds", type=int, default=3, help="measurement rounds")
+    args = parser.parse_args()
+
+    with app.app_context():
+        authors = [{"id": f"{i:08x}-0000-4000-8000-000000000000", "name": f"author {i}", "bio": "bio " * 20, "birth_date": date(1990, 1, 1)} for i in range(1000)]
+        db.session.execute(Author.__table__.insert(), authors)
+        db.session.execute(Book.__table__.insert(), [
+            {"id": f"{i:08x}-{j:04x}-4000-8000-000000000000", "title": f"title {j}", "description": "description " * 20,
+             "publish_date": date(2000, 1, 1), "author_id": author["id"]}
+            for i, author in enumerate(authors) for j in range(10)
+        ])
+        db.session.commit()
+
+    providers = {
+        "flask default (stdlib json)": DefaultJSONProvider(app),
+        "FastJSONProvider, stdlib json": FastJSONProvider(app),
+        "FastJSONProvider, orjson": FastJSONProvider(app),
+    }
+    providers["FastJSONProvider, stdlib json"].use_orjson = False
+
+    client = app.test_client()
+    page = client.get(PATHS[0]).get_json()
+    print(f"Encoding one /books page of {len(page)} books into a response")
+    for label, provider in providers.items():
+        with app.app_context():
+            start = time.perf_counter()
+            for _ in range(args.requests):
+                provider.response(page)
+            print(f"{label:<34} {(time.perf_counter() - start) / args.requests * 1000:8.2f} ms")
+
+    # Providers take turns over several rounds and the best round is reported, so warm-up and noise do not favour one
+    best = {label: [0.0] * len(PATHS) for label in providers}
+    for _ in range(args.rounds):
+        for label, provider in providers.items():
+            app.json = provider
+            best[label] = [max(rps, throughput(client, path, args.requests)) for rps, path in zip(best[label], PATHS)]
+
+    print()
+    print(f"{'':<34}" + "".join(f"{path:>36}" for path in PATHS))
+    for label, results in best.items():
+        print(f"{label:<34}" + "".join(f"{rps:>30.1f} req/s" for rps in results))
+
+if __name__ == "__main__":
+    main()
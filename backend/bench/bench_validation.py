@@ -0,0 +1,68 @@
+"""Microbenchmark comparing schema library validation with the compiled validators.
+
+The baseline is the previous request path: the `schema` library with And(...) layers per field,
+strptime in validate_date, and strptime again in the controller to convert the date. The compiled
+validators check and convert every field in one pass. The baseline needs `pip install schema`,
+which the app itself no longer depends on.
+
+Run from the backend directory:
+
+    python -m bench.bench_validation --items 100000
+"""
+import argparse
+import time
+from datetime import datetime
+
+from app.util.validators import DATE_FORMAT, create_update_book_schema, validate_date, validate_id, validate_str_and_nonempty
+
+
+def legacy_book_schema():
+    from schema import And, Schema
+    return Schema({
+        "title": And(validate_str_and_nonempty, error="Check that title is non-empty and is a string"),
+        "description": And(validate_str_and_nonempty, error="Check that description is non-empty and is a string"),
+        "publish_date": And(validate_str_and_nonempty, validate_date, error="Check that publish_date is non-empty, is a string and uses the following date format: YYYY-MM-DD"),
+        "author_id": And(validate_id, error="Check that author_id is a UUID string and is in the database")
+    })
+
+def legacy_validate(schema, item: dict) -> dict:
+    validated = schema.validate(item)
+    # Second parse of the date, as previously done by the controllers
+    validated["publish_date"] = datetime.strptime(validated["publish_date"], DATE_FORMAT).date()
+    return validated
+
+def timed(label: str, fn, items: int) -> float:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed * 1000:9.1f} ms  {elapsed / items * 1e6:7.2f} us/item")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100_000, help="number of book payloads to validate")
+    args = parser.parse_args()
+
+    items = [
+        {"title": f"title {i}", "description": "description " * 10, "publish_date": f"{1950 + i % 70}-{1 + i % 12:02d}-{1 + i % 28:02d}",
+         "author_id": f"{i:08x}-0000-4000-8000-000000000000"}
+        for i in range(args.items)
+    ]
+
+    print(f"Validating {args.items:,} book payloads")
+    try:
+        schema = legacy_book_schema()
+    except ImportError:
+        schema = None
+        print("schema library not installed, skipping the baseline")
+    if schema is not None:
+        legacy = timed("schema library + controller strptime", lambda: [legacy_validate(schema, item) for item in items], args.items)
+
+    validate = create_update_book_schema.validate
+    compiled = timed("compiled validator, one item at a time", lambda: [validate(item) for item in items], args.items)
+    timed("compiled validator, validate_many", lambda: create_update_book_schema.validate_many(items), args.items)
+    if schema is not None:
+        print(f"Speedup: {legacy / compiled:.1f}x")
+
+if __name__ == "__main__":
+    main()
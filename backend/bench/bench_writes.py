@@ -0,0 +1,63 @@
+"""Write-path latency benchmark for the create/update endpoints.
+
+Measures mean and p99 latency of POST and PUT on /authors and /books through the Flask
+test client, and counts the SQL statements each request issues.
+
+Run from the backend directory:
+
+    python -m bench.bench_writes --requests 2000
+"""
+import argparse
+import statistics
+import time
+from sqlalchemy import event
+
+from app.app import app
+from app.extensions import db
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def run(client, label: str, requests: int, send) -> None:
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda *args: statements.append(1)
+    event.listen(engine, "before_cursor_execute", listener)
+
+    latencies = []
+    for i in range(requests):
+        start = time.perf_counter()
+        response = send(i)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+    event.remove(engine, "before_cursor_execute", listener)
+    print(f"{label:<22} mean {statistics.mean(latencies):7.3f} ms  p99 {percentile(latencies, 99):7.3f} ms  "
+          f"{len(statements) / requests:4.1f} statements/request")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per endpoint")
+    args = parser.parse_args()
+
+    author = {"name": "name", "bio": "bio", "birth_date": "1990-01-01"}
+    client = app.test_client()
+
+    author_ids = []
+    run(client, "POST /authors", args.requests,
+        lambda i: (response := client.post("/authors", json=author), author_ids.append(response.get_json()["id"]))[0])
+    run(client, "PUT /authors/<id>", args.requests,
+        lambda i: client.put(f"/authors/{author_ids[i]}", json={**author, "bio": f"bio {i}"}))
+
+    book = {"title": "title", "description": "description", "publish_date": "1990-01-01", "author_id": author_ids[0]}
+    book_ids = []
+    run(client, "POST /books", args.requests,
+        lambda i: (response := client.post("/books", json=book), book_ids.append(response.get_json()["id"]))[0])
+    run(client, "PUT /books/<id>", args.requests,
+        lambda i: client.put(f"/books/{book_ids[i]}", json={**book, "title": f"title {i}"}))
+
+if __name__ == "__main__":
+    main()
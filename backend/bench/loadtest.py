@@ -0,0 +1,175 @@
+"""HTTP load-test harness for the REST API.
+
+Drives a running server with keep-alive connections from several client processes and reports
+requests/sec and latency percentiles:
+
+    python -m bench.loadtest --url http://localhost:5000 --paths /authors,/books --concurrency 32
+
+With --scale, gunicorn is started locally for every worker count given, against a seeded SQLite
+file database, to show how throughput scales with worker processes (cores):
+
+    python -m bench.loadtest --scale 1,2,4,8 --threads 4 --paths /authors?limit=20
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from datetime import date
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _client_thread(host: str, port: int, paths: list[str], deadline: float, latencies: list[float], errors: list[int]) -> None:
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    index = 0
+    while time.perf_counter() < deadline:
+        path = paths[index % len(paths)]
+        index += 1
+        start = time.perf_counter()
+        try:
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 500:
+                errors.append(1)
+            latencies.append(time.perf_counter() - start)
+        except (OSError, http.client.HTTPException):
+            errors.append(1)
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=30)
+    connection.close()
+
+def _client_process(args: tuple) -> tuple[list[float], int]:
+    host, port, paths, duration, threads = args
+    deadline = time.perf_counter() + duration
+    latencies, errors = [], []
+    workers = [threading.Thread(target=_client_thread, args=(host, port, paths, deadline, latencies, errors)) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return latencies, len(errors)
+
+def run_load(url: str, paths: list[str], concurrency: int, duration: float, processes: int) -> dict:
+    """ Runs load against url and returns throughput and latency summary """
+    parsed = urllib.parse.urlparse(url)
+    processes = max(1, min(processes, concurrency))
+    per_process = [concurrency // processes + (1 if i < concurrency % processes else 0) for i in range(processes)]
+
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(_client_process, [(parsed.hostname, parsed.port or 80, paths, duration, threads) for threads in per_process])
+
+    latencies = sorted(latency for result in results for latency in result[0])
+    errors = sum(result[1] for result in results)
+    pick = lambda pct: latencies[min(len(latencies) - 1, int(len(latencies) * pct / 100))] * 1000 if latencies else float("nan")
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / duration,
+        "p50_ms": pick(50),
+        "p99_ms": pick(99),
+    }
+
+def print_result(label: str, result: dict) -> None:
+    print(f"{label:<24} {result['rps']:9.1f} req/s  p50 {result['p50_ms']:7.2f} ms  p99 {result['p99_ms']:7.2f} ms  "
+          f"{result['requests']} requests, {result['errors']} errors")
+
+# Words mixed into titles and bios, so search queries match a realistic fraction of rows
+SEED_WORDS = ("river", "stone", "winter", "garden", "shadow", "harbor", "silver", "forest", "letter", "voyage",
+              "empire", "orchard", "lantern", "meadow", "thunder", "island", "mirror", "compass", "falcon", "canyon")
+SEED_CHUNK_ROWS = 10_000
+
+def seed_database(uri: str, authors: int, books_per_author: int) -> None:
+    """ Creates schema and sample rows in the database used by the scaling run
+
+    Rows are inserted in chunks, so large volumes (e.g. 10k authors with 100 books each) do not have
+    to fit in memory at once.
+    """
+    os.environ["DB_CONNECTION_STRING"] = uri
+    sys.path.insert(0, BACKEND_DIR)
+    from app import create_app
+    from app.authors.author import Author
+    from app.books.book import Book
+
+    def author_row(i: int) -> dict:
+        return {"id": f"{i:08x}-0000-4000-8000-000000000000", "name": f"author {i} {SEED_WORDS[i % len(SEED_WORDS)]}",
+                "bio": "bio " * 20, "birth_date": date(1930 + i % 70, 1 + i % 12, 1 + i % 28)}
+
+    def book_row(i: int, j: int) -> dict:
+        return {"id": f"{i:08x}-{j:04x}-4000-8000-000000000000", "title": f"title {j} {SEED_WORDS[(i + j) % len(SEED_WORDS)]}",
+                "description": "description " * 20, "publish_date": date(1950 + (i + j) % 70, 1 + j % 12, 1 + i % 28),
+                "author_id": f"{i:08x}-0000-4000-8000-000000000000"}
+
+    app, _, db = create_app()
+    with app.app_context():
+        for start in range(0, authors, SEED_CHUNK_ROWS):
+            db.session.execute(Author.__table__.insert(), [author_row(i) for i in range(start, min(start + SEED_CHUNK_ROWS, authors))])
+        authors_per_chunk = max(1, SEED_CHUNK_ROWS // max(books_per_author, 1))
+        for start in range(0, authors if books_per_author else 0, authors_per_chunk):
+            db.session.execute(Book.__table__.insert(), [
+                book_row(i, j) for i in range(start, min(start + authors_per_chunk, authors)) for j in range(books_per_author)
+            ])
+        db.session.commit()
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def wait_until_listening(port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+def scale(worker_counts: list[int], threads: int, args) -> None:
+    """ Starts gunicorn for every worker count and measures throughput """
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = f"sqlite:///{os.path.join(tmp, 'loadtest.db')}"
+        seed_database(uri, authors=args.authors, books_per_author=args.books_per_author)
+
+        print(f"{multiprocessing.cpu_count()} CPU cores, {threads} threads per worker, concurrency {args.concurrency}")
+        for workers in worker_counts:
+            port = free_port()
+            env = {**os.environ, "DB_CONNECTION_STRING": uri, "FLASK_RUN_HOST": "127.0.0.1", "FLASK_RUN_PORT": str(port),
+                   "GUNICORN_WORKERS": str(workers), "GUNICORN_THREADS": str(threads), "GUNICORN_ACCESS_LOG": "", "GUNICORN_LOG_LEVEL": "warning"}
+            server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"], cwd=BACKEND_DIR, env=env)
+            try:
+                wait_until_listening(port)
+                run_load(f"http://127.0.0.1:{port}", args.paths, args.concurrency, min(args.duration, 2), args.processes)  # warm-up
+                print_result(f"{workers} worker(s)", run_load(f"http://127.0.0.1:{port}", args.paths, args.concurrency, args.duration, args.processes))
+            finally:
+                server.terminate()
+                server.wait()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="server to load when --scale is not given")
+    parser.add_argument("--paths", default="/authors?limit=20", type=lambda value: value.split(","), help="comma separated GET paths, requested round robin")
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent connections")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of load per run")
+    parser.add_argument("--processes", type=int, default=max(1, multiprocessing.cpu_count() // 2), help="client processes generating load")
+    parser.add_argument("--scale", type=lambda value: [int(n) for n in value.split(",")], help="comma separated gunicorn worker counts to compare")
+    parser.add_argument("--threads", type=int, default=4, help="gthread threads per worker in --scale mode")
+    parser.add_argument("--authors", type=int, default=1000, help="authors seeded in --scale mode")
+    parser.add_argument("--books-per-author", type=int, default=10, help="books per author seeded in --scale mode")
+    args = parser.parse_args()
+
+    if args.scale:
+        scale(args.scale, args.threads, args)
+    else:
+        print_result(args.url, run_load(args.url, args.paths, args.concurrency, args.duration, args.processes))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import glob
+import multiprocessing
+import os
+import tempfile
+
+# Gunicorn production serving profile, every setting can be overridden through environment variables
+
+# Address to listen on, same variables as the development server
+bind = f"{os.environ.get('FLASK_RUN_HOST', '0.0.0.0')}:{os.environ.get('FLASK_RUN_PORT', '5000')}"
+
+# Process/thread worker model: gthread workers serve `threads` requests concurrently each,
+# which overlaps DB and cache I/O without one process per concurrent request
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Keep preloading off so create_app() and the DB pool are created in each worker after fork
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'false').lower() == 'true'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers periodically to bound memory growth, jitter avoids restarting all at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+
+# Access log to stdout by default, set GUNICORN_ACCESS_LOG to an empty value to disable it
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+# Metrics of all workers are merged through files in this directory, as a scrape only reaches one worker
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'flaskapi-metrics'))
+# Seconds between writes of a worker's metrics, scrapes see the other workers this late at most
+metrics_write_interval = float(os.environ.get('PROMETHEUS_MULTIPROC_WRITE_INTERVAL', 1))
+
+def on_starting(server):
+    # Metrics of a previous run of the server are not carried over
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    os.makedirs(metrics_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(metrics_dir, '*.json')):
+        os.remove(path)
+
+    # With DB_SCHEMA_MODE=migrate, migrations run once in the master before any worker starts,
+    # workers then skip schema work instead of racing each other on the same migrations
+    from app.config import Config
+
+    if Config.DB_SCHEMA_MODE == 'migrate':
+        from sqlalchemy import create_engine, pool
+        from app.util.schema import upgrade_database
+
+        engine = create_engine(Config.SQLALCHEMY_DATABASE_URI, poolclass=pool.NullPool)
+        upgrade_database(engine)
+        engine.dispose()
+        # Workers are forked from the master and inherit the already imported config
+        Config.DB_SCHEMA_MODE = 'none'
+
+def post_fork(server, worker):
+    # With preload_app the app was created in the master, connections inherited from it must not be
+    # shared between processes, so the pool is reset without closing the parent's connections
+    if preload_app:
+        from app.app import app
+        from app.extensions import db
+
+        with app.app_context():
+            db.engine.dispose(close=False)
+
+def post_worker_init(worker):
+    from app.metrics.prometheus import registry
+
+    registry.start_writing(interval=metrics_write_interval)
+
+def worker_exit(server, worker):
+    # Final values of the worker, its counters and histograms stay in the totals after it exited
+    from app.metrics.prometheus import registry
+
+    registry.write()
+
+def child_exit(server, worker):
+    # Runs in the master, gauges of exited workers are no longer reported and their counters are
+    # folded into one aggregate file, so recycled workers do not pile up files
+    from app.metrics.prometheus import mark_process_dead
+
+    mark_process_dead(worker.pid)
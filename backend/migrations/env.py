@@ -0,0 +1,56 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine, pool
+
+from app.config import Config
+from app.extensions import db
+from app.util.schema import include_object
+# Importing all models to include into SQLAlchemy Metadata
+from app.authors.author import Author
+from app.books.book import Book
+
+# Alembic environment, migrations run against the database configured for the app
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = db.metadata
+
+def database_url() -> str:
+    # An explicit sqlalchemy.url (e.g. alembic -x or programmatic config) overrides the app config
+    return config.get_main_option("sqlalchemy.url") or Config.SQLALCHEMY_DATABASE_URI
+
+def run_migrations_offline() -> None:
+    """ Emits migration SQL to stdout instead of running it, used by `alembic upgrade head --sql` """
+    context.configure(url=database_url(), target_metadata=target_metadata, literal_binds=True, dialect_opts={"paramstyle": "named"})
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations(connection) -> None:
+    # SQLite cannot ALTER most constraints, batch mode recreates tables instead. One transaction per
+    # migration, as migrations with an autocommit_block() commit everything before the block anyway
+    context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object,
+                      render_as_batch=connection.dialect.name == "sqlite", transaction_per_migration=True)
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online() -> None:
+    """ Runs migrations on a connection passed in by the caller, or on a new one to the configured database """
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        run_migrations(connection)
+        return
+
+    engine = create_engine(database_url(), poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        run_migrations(connection)
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
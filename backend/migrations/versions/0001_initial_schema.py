@@ -0,0 +1,50 @@
+"""initial schema
+
+Tables exactly as previously created by db.create_all(), without any index. Databases created that way are brought under
+migration control with `alembic stamp 0001`.
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 16:30:30.673806
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('author',
+    sa.Column('id', sa.TEXT(), nullable=False),
+    sa.Column('created_on', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_updated_on', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('name', sa.TEXT(), nullable=True),
+    sa.Column('bio', sa.TEXT(), nullable=True),
+    sa.Column('birth_date', sa.DATE(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('id')
+    )
+
+    op.create_table('book',
+    sa.Column('id', sa.TEXT(), nullable=False),
+    sa.Column('created_on', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_updated_on', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('title', sa.TEXT(), nullable=True),
+    sa.Column('description', sa.TEXT(), nullable=True),
+    sa.Column('publish_date', sa.DATE(), nullable=True),
+    sa.Column('author_id', sa.TEXT(), nullable=False),
+    sa.ForeignKeyConstraint(['author_id'], ['author.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('book')
+    op.drop_table('author')
@@ -0,0 +1,43 @@
+"""index book.author_id and the default created_on sort
+
+ix_book_author_id backs GET /authors/<id>/books, ?include=books and ON DELETE CASCADE of author
+deletes, which otherwise scan the whole book table. (created_on, id) back keyset pagination of
+GET /authors and GET /books in their default order. Built CONCURRENTLY on Postgres so writes are
+not blocked.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 16:42:11.204519
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ('ix_book_author_id', 'book', ['author_id']),
+    ('ix_author_created_on_id', 'author', ['created_on', 'id']),
+    ('ix_book_created_on_id', 'book', ['created_on', 'id']),
+)
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, unique=False, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in INDEXES:
+        op.drop_index(name, table_name=table)
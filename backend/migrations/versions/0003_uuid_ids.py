@@ -0,0 +1,66 @@
+"""native uuid ids
+
+Converts author.id, book.id and book.author_id from TEXT to native UUID on Postgres and to
+16-byte BLOBs on SQLite. Ids keep their string format in the API.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 17:05:48.913027
+
+"""
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# (table, column) pairs holding ids
+ID_COLUMNS = (('author', 'id'), ('book', 'id'), ('book', 'author_id'))
+
+
+def _convert_values(convert) -> None:
+    # SQLite stores values with any storage class in any column, so ids are rewritten in place
+    connection = op.get_bind()
+    for table, column in ID_COLUMNS:
+        values = connection.execute(sa.text(f"SELECT DISTINCT {column} FROM {table}")).scalars().all()
+        if values:
+            connection.execute(sa.text(f"UPDATE {table} SET {column} = :new WHERE {column} = :old"),
+                               [{"new": convert(value), "old": value} for value in values])
+
+
+def _alter_postgresql(type_, using: str) -> None:
+    # The foreign key has to be dropped while both of its columns change type
+    op.drop_constraint('book_author_id_fkey', 'book', type_='foreignkey')
+    for table, column in ID_COLUMNS:
+        op.alter_column(table, column, type_=type_, postgresql_using=f"{column}::{using}")
+    op.create_foreign_key('book_author_id_fkey', 'book', 'author', ['author_id'], ['id'], ondelete='CASCADE')
+
+
+def _alter_batch(type_) -> None:
+    for table in ('author', 'book'):
+        with op.batch_alter_table(table) as batch_op:
+            for column in (column for id_table, column in ID_COLUMNS if id_table == table):
+                batch_op.alter_column(column, type_=type_)
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        _alter_postgresql(postgresql.UUID(as_uuid=False), 'uuid')
+    else:
+        _convert_values(lambda value: uuid.UUID(value).bytes)
+        _alter_batch(sa.LargeBinary(16))
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        _alter_postgresql(sa.TEXT(), 'text')
+    else:
+        _convert_values(lambda value: str(uuid.UUID(bytes=value)))
+        _alter_batch(sa.TEXT())
@@ -0,0 +1,86 @@
+"""full-text search indexes
+
+Postgres: GIN indexes on the weighted tsvector expression of the text columns, built CONCURRENTLY.
+No column is added, so the tables are not rewritten under an exclusive lock.
+SQLite: external-content FTS5 tables author_fts and book_fts, kept in sync by triggers. They are keyed
+by author_fts_rowid / book_fts_rowid, which map ids to INTEGER PRIMARY KEYs, as the implicit rowids of
+author and book may be renumbered by VACUUM and table rebuilds. Same objects as created by
+app.util.search.register_search_index.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 17:48:20.551390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+# Searched text columns of every table, in decreasing rank weight
+SEARCH_COLUMNS = {'author': ('name', 'bio'), 'book': ('title', 'description')}
+
+
+def _postgresql_upgrade(table: str, columns) -> None:
+    first, second = columns
+    vector = (f"setweight(to_tsvector('english', coalesce({first}, '')), 'A') || "
+              f"setweight(to_tsvector('english', coalesce({second}, '')), 'B')")
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_search ON {table} USING GIN (({vector}))")
+
+
+def _sqlite_upgrade(table: str, columns) -> None:
+    fts = f"{table}_fts"
+    rowids = f"{table}_fts_rowid"
+    content = f"{table}_fts_content"
+    names = ", ".join(columns)
+    new_values = ", ".join(f"new.{name}" for name in columns)
+    old_values = ", ".join(f"old.{name}" for name in columns)
+    old_rowid = f"(SELECT fts_rowid FROM {rowids} WHERE id = old.id)"
+    new_rowid = f"(SELECT fts_rowid FROM {rowids} WHERE id = new.id)"
+    op.execute(f"CREATE TABLE IF NOT EXISTS {rowids} (fts_rowid INTEGER PRIMARY KEY, id NOT NULL UNIQUE)")
+    op.execute(f"CREATE VIEW IF NOT EXISTS {content} AS SELECT {rowids}.fts_rowid, {', '.join(f'{table}.{name}' for name in columns)} "
+               f"FROM {table} JOIN {rowids} ON {rowids}.id = {table}.id")
+    op.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({names}, content='{content}', content_rowid='fts_rowid', tokenize='porter unicode61')")
+    op.execute(f"INSERT INTO {fts}({fts}, rank) VALUES ('rank', 'bm25(10.0, 4.0)')")
+    op.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+               f"INSERT INTO {rowids}(id) VALUES (new.id); "
+               f"INSERT INTO {fts}(rowid, {names}) VALUES ({new_rowid}, {new_values}); END")
+    op.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+               f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', {old_rowid}, {old_values}); "
+               f"DELETE FROM {rowids} WHERE id = old.id; END")
+    op.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+               f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', {old_rowid}, {old_values}); "
+               f"UPDATE {rowids} SET id = new.id WHERE id = old.id; "
+               f"INSERT INTO {fts}(rowid, {names}) VALUES ({new_rowid}, {new_values}); END")
+    # Indexes the rows already in the table
+    op.execute(f"INSERT OR IGNORE INTO {rowids}(id) SELECT id FROM {table}")
+    op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    for table, columns in SEARCH_COLUMNS.items():
+        if dialect == 'postgresql':
+            _postgresql_upgrade(table, columns)
+        elif dialect == 'sqlite':
+            _sqlite_upgrade(table, columns)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    for table in SEARCH_COLUMNS:
+        if dialect == 'postgresql':
+            op.execute(f"DROP INDEX IF EXISTS ix_{table}_search")
+        elif dialect == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}")
+            op.execute(f"DROP TABLE IF EXISTS {table}_fts")
+            op.execute(f"DROP VIEW IF EXISTS {table}_fts_content")
+            op.execute(f"DROP TABLE IF EXISTS {table}_fts_rowid")
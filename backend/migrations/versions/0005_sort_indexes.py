@@ -0,0 +1,37 @@
+"""indexes for date sorts and filters
+
+(publish_date, id) and (birth_date, id) back keyset pagination of GET /books?sort=publish_date and
+GET /authors?sort=birth_date, and the publish_date / birth_date range filters.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 18:31:07.440962
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+INDEXES = (('ix_book_publish_date_id', 'book', ['publish_date', 'id']), ('ix_author_birth_date_id', 'author', ['birth_date', 'id']))
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, unique=False, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in INDEXES:
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,161 @@
+from app.app import app
+from app.asgi import AsyncApp
+from app.config import async_database_uri, engine_options
+from app.metrics.pool import InstrumentedAsyncQueuePool, pool_metrics
+from app.extensions import db, cache
+from app.authors.author import Author
+from app.util.replicas import ASYNC_REPLICAS, PRIMARY_UNTIL_COOKIE, PRIMARY_UNTIL_KEY, read_routing
+from datetime import date
+from sqlalchemy.ext.asyncio import create_async_engine
+import asyncio
+import json
+import time
+
+import pytest
+
+valid_author = {
+    "name": "asdas",
+    "bio": "hello",
+    "birth_date": "1990-01-01"
+}
+
+# Async app on its own aiosqlite file database, as in-memory SQLite databases are per connection
+@pytest.fixture
+def asgi_app(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'async.db'}")
+
+    async def create_tables():
+        async with engine.begin() as connection:
+            await connection.run_sync(db.metadata.create_all)
+    asyncio.run(create_tables())
+
+    with app.app_context():
+        cache.clear()
+    return AsyncApp(app, engine=engine)
+
+async def call(asgi_app, method: str, path: str, json_body=None, headers: dict | None = None) -> tuple[int, dict, bytes]:
+    """ Sends one HTTP request through the ASGI interface, returns status, headers and body """
+    path, _, query_string = path.partition("?")
+    body = json.dumps(json_body).encode() if json_body is not None else b""
+    request_headers = [(b"content-type", b"application/json")] + [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    scope = {"type": "http", "method": method, "path": path, "query_string": query_string.encode(), "headers": request_headers,
+             "http_version": "1.1", "scheme": "http", "server": ("testserver", 80), "client": ("127.0.0.1", 12345)}
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi_app(scope, receive, send)
+    response_headers = {name.decode(): value.decode() for name, value in sent[0]["headers"]}
+    return sent[0]["status"], response_headers, b"".join(message.get("body", b"") for message in sent[1:])
+
+# Same routes and controllers as the WSGI app, with database I/O on the async engine
+def test_asgi_crud(asgi_app):
+    async def scenario():
+        status, _, body = await call(asgi_app, "POST", "/authors", json_body=valid_author)
+        assert status == 200
+        author_id = json.loads(body)["id"]
+
+        status, headers, body = await call(asgi_app, "GET", f"/authors/{author_id}")
+        assert status == 200 and json.loads(body)["name"] == valid_author["name"]
+        status, _, _ = await call(asgi_app, "GET", f"/authors/{author_id}", headers={"If-None-Match": headers["etag"]})
+        assert status == 304
+
+        status, _, body = await call(asgi_app, "PUT", f"/authors/{author_id}", json_body={**valid_author, "bio": "bye"})
+        assert status == 200 and json.loads(body)["bio"] == "bye"
+
+        status, headers, body = await call(asgi_app, "GET", "/authors?stream=1")
+        assert headers["content-type"] == "application/x-ndjson"
+        assert [json.loads(line)["id"] for line in body.splitlines()] == [author_id]
+
+        status, _, _ = await call(asgi_app, "DELETE", f"/authors/{author_id}")
+        assert status == 200
+        assert json.loads((await call(asgi_app, "GET", "/authors"))[2]) == []
+        await asgi_app.engine.dispose()
+
+    asyncio.run(scenario())
+
+# Concurrent requests on one event loop each get their own session
+def test_asgi_concurrent_requests(asgi_app):
+    async def scenario():
+        await asyncio.gather(*[call(asgi_app, "POST", "/authors", json_body=valid_author) for _ in range(10)])
+        responses = await asyncio.gather(*[call(asgi_app, "GET", f"/authors?limit={limit}") for limit in range(1, 21)])
+        assert [len(json.loads(body)) for _, _, body in responses] == [min(limit, 10) for limit in range(1, 21)]
+        await asgi_app.engine.dispose()
+
+    asyncio.run(scenario())
+
+# Concurrent misses of one cached response wait for the request computing it without blocking the event loop,
+# which would stop that request's queries until CACHE_LOCK_TIMEOUT
+def test_asgi_single_flight(asgi_app, monkeypatch):
+    monkeypatch.setitem(app.config, "CACHE_LOCK_TIMEOUT", 10)
+
+    async def scenario():
+        await asyncio.gather(*[call(asgi_app, "POST", "/authors", json_body=valid_author) for _ in range(5)])
+        start = time.monotonic()
+        responses = await asyncio.gather(*[call(asgi_app, "GET", "/authors?limit=5") for _ in range(3)])
+        assert time.monotonic() - start < 2
+        assert [status for status, _, _ in responses] == [200] * 3
+        assert len({body for _, _, body in responses}) == 1
+        await asgi_app.engine.dispose()
+
+    asyncio.run(scenario())
+
+# Read-only controllers read from the async replica engines, writes and reads right after them from the primary
+def test_asgi_replica_routing(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'primary.db'}")
+    replica = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}")
+    author_id = "00000001-0000-4000-8000-000000000000"
+
+    async def scenario():
+        for database in (engine, replica):
+            async with database.begin() as connection:
+                await connection.run_sync(db.metadata.create_all)
+        # Row only present on the replica, tells which database a read went to
+        async with replica.begin() as connection:
+            await connection.execute(Author.__table__.insert(), {"id": author_id, "name": "replica author", "bio": "bio", "birth_date": date(1990, 1, 1)})
+
+        replica_reads = read_routing.value(target="replica")
+        status, _, body = await call(asgi_app, "GET", f"/authors/{author_id}")
+        assert status == 200 and json.loads(body)["name"] == "replica author"
+        assert read_routing.value(target="replica") == replica_reads + 1
+
+        # The writing client reads its write from the primary through its cookie, other clients from the replica
+        status, headers, body = await call(asgi_app, "POST", "/authors", json_body=valid_author)
+        new_author_id = json.loads(body)["id"]
+        cookie = headers["set-cookie"].split(";")[0]
+        assert cookie.startswith(f"{PRIMARY_UNTIL_COOKIE}=")
+        status, _, body = await call(asgi_app, "GET", f"/authors/{new_author_id}", headers={"Cookie": cookie})
+        assert status == 200 and json.loads(body)["name"] == valid_author["name"]
+        status, _, body = await call(asgi_app, "GET", f"/authors?stream=1")
+        assert [json.loads(line)["id"] for line in body.splitlines()] == [author_id]
+        # Replica connections are counted apart from the primary's
+        assert pool_metrics["async_replica0"].checkouts > 0
+        await engine.dispose()
+        await replica.dispose()
+
+    with app.app_context():
+        cache.clear()
+    asgi_app = AsyncApp(app, engine=engine, replica_engines={"replica0": replica})
+    try:
+        asyncio.run(scenario())
+    finally:
+        app.extensions.pop(ASYNC_REPLICAS, None)
+        pool_metrics.pop("async_replica0", None)
+        with app.app_context():
+            cache.delete(PRIMARY_UNTIL_KEY)
+
+# Async engine uses the same database through its async driver, with asyncio adapted pool
+def test_async_database_uri():
+    assert async_database_uri("postgresql://user:pass@db:5432/flask") == "postgresql+asyncpg://user:pass@db:5432/flask"
+    assert async_database_uri("sqlite:////data/app.db") == "sqlite+aiosqlite:////data/app.db"
+    with pytest.raises(ValueError):
+        async_database_uri("mysql://user:pass@db/flask")
+
+    options = engine_options("postgresql+asyncpg://user:pass@db/flask")
+    assert options["poolclass"] is InstrumentedAsyncQueuePool
+    assert "statement_timeout" in options["connect_args"]["server_settings"]
@@ -1,8 +1,12 @@
 from app.app import app
-from app.extensions import db
+from app.extensions import db, cache
 from app.authors.author import Author
 from app.util.validators import DATE_FORMAT
-from datetime import datetime
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import json
+import time
+import uuid
 
 import pytest
 
@@ -12,6 +16,7 @@ def client():
     with app.app_context():
         db.session.query(Author).delete()
         db.session.commit()
+        cache.clear()
     with app.test_client() as testclient:
         yield testclient
         
@@ -114,3 +119,261 @@ def test_delete_author(client):
         test_response = client.delete(f"/authors/{author_id}")
         assert test_response.status_code == 200
 
+# Test GET /authors with limit, following the cursor until every author has been returned exactly once
+def test_get_authors_paginated(client):
+    author_ids = [f"{i}f859bd4-7c85-4c71-bd93-d15670bec314" for i in range(5)]
+    with app.app_context():
+        for author_id in author_ids:
+            db.session.add(Author(id=author_id, name=valid_author['name'], bio=valid_author["bio"], birth_date=datetime.strptime(valid_author["birth_date"], DATE_FORMAT)))
+
+        seen_ids = []
+        test_response = client.get("/authors?limit=2")
+        while True:
+            assert test_response.status_code == 200
+            assert len(test_response.get_json()) <= 2
+            seen_ids += [author["id"] for author in test_response.get_json()]
+            next_cursor = test_response.headers.get("X-Next-Cursor")
+            if next_cursor is None:
+                break
+            test_response = client.get(f"/authors?limit=2&after={next_cursor}")
+
+        assert sorted(seen_ids) == sorted(author_ids)
+
+# Test GET /authors with malformed pagination arguments, expecting 500 like other validation errors
+@pytest.mark.parametrize("query", ["limit=0", "limit=abc", "after=notacursor"])
+def test_get_authors_invalid_page_args(client, query):
+    test_response = client.get(f"/authors?{query}")
+    assert test_response.status_code == 500
+
+# Test GET /authors streamed as NDJSON, via both the Accept header and the stream query argument
+@pytest.mark.parametrize("query, headers", [("", {"Accept": "application/x-ndjson"}), ("?stream=1", {})])
+def test_stream_authors(client, query, headers):
+    author_ids = [f"{i}f859bd4-7c85-4c71-bd93-d15670bec314" for i in range(3)]
+    with app.app_context():
+        for author_id in author_ids:
+            db.session.add(Author(id=author_id, name=valid_author['name'], bio=valid_author["bio"], birth_date=datetime.strptime(valid_author["birth_date"], DATE_FORMAT)))
+
+        test_response = client.get(f"/authors{query}", headers=headers)
+        assert test_response.status_code == 200
+        assert test_response.mimetype == "application/x-ndjson"
+
+        lines = test_response.get_data(as_text=True).splitlines()
+        assert sorted(json.loads(line)["id"] for line in lines) == sorted(author_ids)
+
+# Test POST/PUT/DELETE /authors:batch, expecting valid items to succeed and invalid items to be reported by index
+def test_authors_batch(client):
+    test_response = client.post("/authors:batch", json=[valid_author, invalid_authors[0], valid_author])
+    assert test_response.status_code == 200
+    response_json = test_response.get_json()
+    assert response_json["succeeded"] == 2 and response_json["failed"] == 1
+    assert [result["index"] for result in response_json["results"]] == [0, 1, 2]
+    assert "error" in response_json["results"][1]
+    author_id = response_json["results"][0]["data"]["id"]
+    assert response_json["results"][0]["data"]["name"] == valid_author["name"]
+
+    test_response = client.put("/authors:batch", json=[{"id": author_id, **updated_author}, {"id": "missing", **updated_author}])
+    assert test_response.status_code == 200
+    response_json = test_response.get_json()
+    assert response_json["results"][0]["data"]["bio"] == updated_author["bio"]
+    assert "error" in response_json["results"][1]
+
+    test_response = client.delete("/authors:batch", json=[author_id, "missing"])
+    assert test_response.status_code == 200
+    response_json = test_response.get_json()
+    assert response_json["results"][0]["data"] == {"id": author_id}
+    assert "error" in response_json["results"][1]
+
+# Test PUT /authors:batch updating the same author twice, expecting 400 and the author unchanged
+def test_put_authors_batch_duplicate_ids(client):
+    author_id = client.post("/authors", json=valid_author).get_json()["id"]
+
+    test_response = client.put("/authors:batch", json=[{"id": author_id, **updated_author}, invalid_authors[0], {"id": author_id, **updated_author}])
+    assert test_response.status_code == 400
+    assert author_id in test_response.get_json()["message"]
+    assert client.get(f"/authors/{author_id}").get_json()["bio"] == valid_author["bio"]
+
+# Test batch endpoint with a body that is not a non-empty array, expecting 500
+@pytest.mark.parametrize("request_data", [[], valid_author])
+def test_authors_batch_invalid_body(client, request_data):
+    test_response = client.post("/authors:batch", json=request_data)
+    assert test_response.status_code == 500
+
+# Test POST and PUT /authors on a dialect without RETURNING support, expecting the select fallback to return the same data
+def test_create_put_author_without_returning(client, monkeypatch):
+    with app.app_context():
+        monkeypatch.setattr(db.engine.dialect, "insert_returning", False)
+        monkeypatch.setattr(db.engine.dialect, "update_returning", False)
+
+        response_json = client.post("/authors", json=valid_author).get_json()
+        assert response_json["name"] == valid_author["name"]
+
+        test_response = client.put(f"/authors/{response_json['id']}", json=updated_author)
+        assert test_response.status_code == 200
+        assert test_response.get_json()["bio"] == updated_author["bio"]
+
+# Test PUT /authors with unknown id, expecting 500
+def test_put_missing_author(client):
+    test_response = client.put("/authors/f8664c59-4270-4a74-9ca5-f4f8dab4d1da", json=updated_author)
+    assert test_response.status_code == 500
+
+# Test cached GET responses are evicted by writes, expecting every read after a write to see it
+def test_cache_invalidated_by_writes(client):
+    author_id = client.post("/authors", json=valid_author).get_json()["id"]
+    assert client.get(f"/authors/{author_id}").get_json()["bio"] == valid_author["bio"]
+    assert len(client.get("/authors").get_json()) == 1
+
+    client.put(f"/authors/{author_id}", json=updated_author)
+    assert client.get(f"/authors/{author_id}").get_json()["bio"] == updated_author["bio"]
+
+    client.post("/authors", json=valid_author)
+    assert len(client.get("/authors").get_json()) == 2
+
+    client.delete(f"/authors/{author_id}")
+    assert client.get(f"/authors/{author_id}").get_json() == {}
+    assert len(client.get("/authors").get_json()) == 1
+
+# Test PUT responses are no longer cached, expecting two consecutive updates to both apply
+def test_put_author_not_cached(client):
+    author_id = client.post("/authors", json=valid_author).get_json()["id"]
+    client.put(f"/authors/{author_id}", json=updated_author)
+    test_response = client.put(f"/authors/{author_id}", json={**updated_author, "bio": "again"})
+    assert test_response.get_json()["bio"] == "again"
+
+# Test conditional GET on /authors/<id>, expecting 304 for a matching ETag or Last-Modified until the author is updated
+def test_get_author_conditional(client):
+    author_id = client.post("/authors", json=valid_author).get_json()["id"]
+
+    test_response = client.get(f"/authors/{author_id}")
+    etag = test_response.headers["ETag"]
+    last_modified = test_response.headers["Last-Modified"]
+
+    test_response = client.get(f"/authors/{author_id}", headers={"If-None-Match": etag})
+    assert test_response.status_code == 304
+    assert test_response.get_data() == b""
+
+    test_response = client.get(f"/authors/{author_id}", headers={"If-Modified-Since": last_modified})
+    assert test_response.status_code == 304
+
+    client.put(f"/authors/{author_id}", json=updated_author)
+    test_response = client.get(f"/authors/{author_id}", headers={"If-None-Match": etag})
+    assert test_response.status_code == 200
+    assert test_response.headers["ETag"] != etag
+
+# Test Last-Modified on a host whose clock is not UTC, expecting the stored timestamps to be UTC
+def test_last_modified_is_utc(client, monkeypatch):
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        author_id = client.post("/authors", json=valid_author).get_json()["id"]
+        last_modified = parsedate_to_datetime(client.get(f"/authors/{author_id}").headers["Last-Modified"])
+        assert abs((datetime.now(timezone.utc) - last_modified).total_seconds()) < 60
+        created_on = parsedate_to_datetime(client.get(f"/authors/{author_id}").get_json()["created_on"])
+        assert abs((datetime.now(timezone.utc) - created_on).total_seconds()) < 60
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+# Test conditional GET on /authors, expecting the collection ETag to change when an author is deleted
+def test_list_authors_conditional(client):
+    author_ids = [client.post("/authors", json=valid_author).get_json()["id"] for _ in range(2)]
+
+    etag = client.get("/authors").headers["ETag"]
+    assert client.get("/authors", headers={"If-None-Match": etag}).status_code == 304
+    # Each page has its own ETag
+    assert client.get("/authors?limit=1").headers["ETag"] != etag
+
+    client.delete(f"/authors/{author_ids[0]}")
+    assert client.get("/authors", headers={"If-None-Match": etag}).status_code == 200
+
+# Test GET /authors and /authors/<id> with ?include=books, expecting embedded books that follow book writes
+def test_get_authors_include_books(client):
+    author_id = client.post("/authors", json=valid_author).get_json()["id"]
+    other_author_id = client.post("/authors", json=valid_author).get_json()["id"]
+    book = {"title": "title", "description": "description", "publish_date": "2000-01-01", "author_id": author_id}
+    book_id = client.post("/books", json=book).get_json()["id"]
+
+    test_response = client.get(f"/authors/{author_id}?include=books")
+    assert test_response.status_code == 200
+    assert [book["id"] for book in test_response.get_json()["books"]] == [book_id]
+    assert "books" not in client.get(f"/authors/{author_id}").get_json()
+
+    test_response = client.get("/authors?include=books&limit=1")
+    assert test_response.status_code == 200
+    assert "include=books" in test_response.headers["Link"]
+    authors = test_response.get_json() + client.get(f"/authors?include=books&limit=1&after={test_response.headers['X-Next-Cursor']}").get_json()
+    assert {author["id"]: len(author["books"]) for author in authors} == {author_id: 1, other_author_id: 0}
+
+    # Cached and conditional responses are invalidated by book writes
+    etag = client.get(f"/authors/{author_id}?include=books").headers["ETag"]
+    client.put(f"/books/{book_id}", json={**book, "author_id": other_author_id})
+    assert client.get(f"/authors/{author_id}?include=books", headers={"If-None-Match": etag}).status_code == 200
+    assert client.get(f"/authors/{author_id}?include=books").get_json()["books"] == []
+    assert len(client.get(f"/authors/{other_author_id}?include=books").get_json()["books"]) == 1
+
+# Test GET /authors with unknown include, expecting 500 like other validation errors
+def test_get_authors_invalid_include(client):
+    assert client.get("/authors?include=publishers").status_code == 500
+
+# Test GET /authors/search, expecting matches on name and bio
+def test_search_authors(client):
+    author_id = client.post("/authors", json={**valid_author, "bio": "Writes about sailing ships"}).get_json()["id"]
+    client.post("/authors", json=valid_author)
+
+    test_response = client.get("/authors/search?q=sailing")
+    assert test_response.status_code == 200
+    assert [author["id"] for author in test_response.get_json()] == [author_id]
+    assert client.get("/authors/search?q=asdas").status_code == 200
+    assert len(client.get("/authors/search?q=asdas").get_json()) == 2
+
+# Test GET /authors birth_date filter, sort and fields, also combined with embedded books
+def test_list_authors_filter_sort_fields(client):
+    for year in (1950, 1970, 1990):
+        client.post("/authors", json={**valid_author, "birth_date": f"{year}-01-01"})
+
+    authors = client.get("/authors?birth_date_from=1960-01-01&sort=-birth_date&fields=name,birth_date").get_json()
+    assert [author["birth_date"][12:16] for author in authors] == ["1990", "1970"]
+    assert all(set(author) == {"name", "birth_date"} for author in authors)
+
+    authors = client.get("/authors?birth_date_to=1960-01-01&fields=id&include=books").get_json()
+    assert len(authors) == 1 and set(authors[0]) == {"id", "books"}
+
+# Test GET /authors sorted by birth_date with authors without one, following the cursor through the NULL rows
+# which are ordered last in both directions
+@pytest.mark.parametrize("sort", ["birth_date", "-birth_date"])
+def test_list_authors_sort_nullable(client, sort):
+    birth_dates = [None, "1950-01-01", None, "1970-01-01", None]
+    with app.app_context():
+        author_ids = [str(uuid.uuid4()) for _ in birth_dates]
+        for author_id, birth_date in zip(author_ids, birth_dates):
+            db.session.add(Author(id=author_id, name=valid_author["name"], bio=valid_author["bio"],
+                                  birth_date=datetime.strptime(birth_date, DATE_FORMAT) if birth_date else None))
+        db.session.commit()
+
+    seen = []
+    test_response = client.get(f"/authors?sort={sort}&limit=1&fields=id,birth_date")
+    while True:
+        assert test_response.status_code == 200
+        seen += test_response.get_json()
+        if "X-Next-Cursor" not in test_response.headers:
+            break
+        test_response = client.get(test_response.headers["Link"].split(";")[0].strip("<>"))
+
+    assert sorted(author["id"] for author in seen) == sorted(author_ids)
+    assert [author["birth_date"] is None for author in seen] == [False, False, True, True, True]
+
+# Test POST /authors:batchGet and GET /authors?ids=, expecting results in request order with errors for unknown ids
+def test_get_authors_batch(client):
+    author_ids = [client.post("/authors", json={**valid_author, "name": name}).get_json()["id"] for name in ("a", "b")]
+    missing_id = str(uuid.uuid4())
+
+    test_response = client.post("/authors:batchGet", json=[author_ids[1], missing_id, author_ids[0], author_ids[1]])
+    assert test_response.status_code == 200
+    results = test_response.get_json()["results"]
+    assert [results[index]["data"]["name"] for index in (0, 2, 3)] == ["b", "a", "b"]
+    assert results[1]["error"] == f"Author with id={missing_id} does not exist"
+
+    # Not served from the cached list of authors
+    client.get("/authors")
+    test_response = client.get(f"/authors?ids={author_ids[0]}")
+    assert test_response.get_json()["results"] == [{"index": 0, "data": client.get(f"/authors/{author_ids[0]}").get_json()}]
+    assert client.post("/authors:batchGet", json=[]).status_code == 500
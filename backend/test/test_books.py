@@ -1,9 +1,12 @@
 from app.app import app
-from app.extensions import db
+from app.extensions import db, cache
 from app.authors.author import Author
 from app.books.book import Book
 from app.util.validators import DATE_FORMAT
 from datetime import datetime
+import json
+import uuid
+from sqlalchemy import event
 
 import pytest
 
@@ -14,6 +17,7 @@ def client():
         db.session.query(Author).delete()
         db.session.query(Book).delete()
         db.session.commit()
+        cache.clear()
     with app.test_client() as testclient:
         yield testclient
 
@@ -167,3 +171,224 @@ def test_get_books_by_author(client):
         response_json = test_response.get_json()
         assert len(response_json) == 1
 
+
+# Test GET /books with limit, following the Link header cursor until every book has been returned exactly once
+def test_get_books_paginated(client):
+    book_ids = [f"{i}f849bd4-7a85-4c71-bd93-d15670bec314" for i in range(5)]
+    with app.app_context():
+        db.session.add(Author(id=valid_author["id"], name=valid_author['name'], bio=valid_author["bio"], birth_date=datetime.strptime(valid_author["birth_date"], DATE_FORMAT)))
+        for book_id in book_ids:
+            db.session.add(Book(id=book_id, title=valid_book["title"], description=valid_book["description"], publish_date=datetime.strptime(valid_book["publish_date"], DATE_FORMAT), author_id=valid_author["id"]))
+
+        seen_ids = []
+        test_response = client.get("/books?limit=2")
+        while True:
+            assert test_response.status_code == 200
+            seen_ids += [book["id"] for book in test_response.get_json()]
+            if "X-Next-Cursor" not in test_response.headers:
+                break
+            test_response = client.get(test_response.headers["Link"].split(";")[0].strip("<>"))
+
+        assert sorted(seen_ids) == sorted(book_ids)
+
+# Test GET /books?stream=1, expecting one JSON document per line
+def test_stream_books(client):
+    with app.app_context():
+        db.session.add(Author(id=valid_author["id"], name=valid_author['name'], bio=valid_author["bio"], birth_date=datetime.strptime(valid_author["birth_date"], DATE_FORMAT)))
+        for i in range(3):
+            db.session.add(Book(id=f"{i}f849bd4-7a85-4c71-bd93-d15670bec314", title=valid_book["title"], description=valid_book["description"], publish_date=datetime.strptime(valid_book["publish_date"], DATE_FORMAT), author_id=valid_author["id"]))
+
+        test_response = client.get("/books?stream=1")
+        assert test_response.status_code == 200
+        assert test_response.mimetype == "application/x-ndjson"
+
+        lines = test_response.get_data(as_text=True).splitlines()
+        assert len(lines) == 3
+        assert all(json.loads(line)["author_id"] == valid_author["id"] for line in lines)
+
+# Test POST /books:batch, expecting items with unknown authors or invalid fields to fail individually
+def test_create_books_batch(client):
+    with app.app_context():
+        db.session.add(Author(id=valid_author["id"], name=valid_author['name'], bio=valid_author["bio"], birth_date=datetime.strptime(valid_author["birth_date"], DATE_FORMAT)))
+
+        unknown_author_book = {**valid_book, "author_id": "f8664c59-4270-4a74-9ca5-f4f8dab4d1da"}
+        test_response = client.post("/books:batch", json=[valid_book, invalid_books[0], unknown_author_book, valid_book])
+        assert test_response.status_code == 200
+
+        response_json = test_response.get_json()
+        assert response_json["succeeded"] == 2 and response_json["failed"] == 2
+        assert "error" in response_json["results"][1]
+        assert "error" in response_json["results"][2]
+        assert response_json["results"][3]["data"]["title"] == valid_book["title"]
+        assert len(client.get(f"/authors/{valid_author['id']}/books").get_json()) == 2
+
+# Test PUT and DELETE /books:batch, expecting missing ids to be reported by index
+def test_put_delete_books_batch(client):
+    with app.app_context():
+        book_id = "1f849bd4-7a85-4c71-bd93-d15670bec314"
+        db.session.add(Author(id=valid_author["id"], name=valid_author['name'], bio=valid_author["bio"], birth_date=datetime.strptime(valid_author["birth_date"], DATE_FORMAT)))
+        db.session.add(Book(id=book_id, title=valid_book["title"], description=valid_book["description"], publish_date=datetime.strptime(valid_book["publish_date"], DATE_FORMAT), author_id=valid_author["id"]))
+
+        # Same book twice in one batch is rejected as a whole
+        test_response = client.put("/books:batch", json=[{"id": book_id, **updated_book}, {"id": book_id, **updated_book}])
+        assert test_response.status_code == 400
+
+        test_response = client.put("/books:batch", json=[{"id": book_id, **updated_book}, {"id": "missing", **updated_book}])
+        response_json = test_response.get_json()
+        assert response_json["results"][0]["data"]["description"] == updated_book["description"]
+        assert "error" in response_json["results"][1]
+
+        test_response = client.delete("/books:batch", json=["missing", book_id])
+        response_json = test_response.get_json()
+        assert "error" in response_json["results"][0]
+        assert response_json["results"][1]["data"] == {"id": book_id}
+
+# Test cached book, book list and books of author responses are evicted by book writes
+def test_cache_invalidated_by_book_writes(client):
+    with app.app_context():
+        db.session.add(Author(id=valid_author["id"], name=valid_author['name'], bio=valid_author["bio"], birth_date=datetime.strptime(valid_author["birth_date"], DATE_FORMAT)))
+        db.session.commit()
+
+    assert client.get("/books").get_json() == []
+    assert client.get(f"/authors/{valid_author['id']}/books").get_json() == []
+
+    book_id = client.post("/books", json=valid_book).get_json()["id"]
+    assert len(client.get("/books").get_json()) == 1
+    assert len(client.get(f"/authors/{valid_author['id']}/books").get_json()) == 1
+    assert client.get(f"/books/{book_id}").get_json()["description"] == valid_book["description"]
+
+    client.put(f"/books/{book_id}", json=updated_book)
+    assert client.get(f"/books/{book_id}").get_json()["description"] == updated_book["description"]
+    assert client.get(f"/authors/{valid_author['id']}/books").get_json()[0]["description"] == updated_book["description"]
+
+    client.delete(f"/books/{book_id}")
+    assert client.get(f"/books/{book_id}").get_json() == {}
+    assert client.get("/books").get_json() == []
+
+# Test conditional GET on books of an author and single book, expecting 304 until a book of that author changes
+def test_books_conditional(client):
+    with app.app_context():
+        db.session.add(Author(id=valid_author["id"], name=valid_author['name'], bio=valid_author["bio"], birth_date=datetime.strptime(valid_author["birth_date"], DATE_FORMAT)))
+        db.session.commit()
+
+    book_id = client.post("/books", json=valid_book).get_json()["id"]
+    book_etag = client.get(f"/books/{book_id}").headers["ETag"]
+    author_books_etag = client.get(f"/authors/{valid_author['id']}/books").headers["ETag"]
+
+    assert client.get(f"/books/{book_id}", headers={"If-None-Match": book_etag}).status_code == 304
+    assert client.get(f"/authors/{valid_author['id']}/books", headers={"If-None-Match": author_books_etag}).status_code == 304
+
+    client.post("/books", json=valid_book)
+    assert client.get(f"/books/{book_id}", headers={"If-None-Match": book_etag}).status_code == 304
+    assert client.get(f"/authors/{valid_author['id']}/books", headers={"If-None-Match": author_books_etag}).status_code == 200
+
+# Test GET /books/search, expecting ranked, paginated matches that follow book writes
+def test_search_books(client):
+    with app.app_context():
+        db.session.add(Author(id=valid_author["id"], name=valid_author['name'], bio=valid_author["bio"], birth_date=datetime.strptime(valid_author["birth_date"], DATE_FORMAT)))
+        db.session.commit()
+
+    title_match = client.post("/books", json={**valid_book, "title": "Dragons of the north"}).get_json()["id"]
+    description_match = client.post("/books", json={**valid_book, "description": "A story about dragons"}).get_json()["id"]
+    client.post("/books", json={**valid_book, "title": "Cooking"})
+
+    test_response = client.get("/books/search?q=dragon")
+    assert test_response.status_code == 200
+    # Stemmed matches, title matches rank above description matches
+    assert [book["id"] for book in test_response.get_json()] == [title_match, description_match]
+
+    test_response = client.get("/books/search?q=dragon&limit=1")
+    assert [book["id"] for book in test_response.get_json()] == [title_match]
+    test_response = client.get(f"/books/search?q=dragon&limit=1&after={test_response.headers['X-Next-Cursor']}")
+    assert [book["id"] for book in test_response.get_json()] == [description_match]
+    assert "X-Next-Cursor" not in test_response.headers
+
+    client.delete(f"/books/{title_match}")
+    client.put(f"/books/{description_match}", json=valid_book)
+    assert client.get("/books/search?q=dragon").get_json() == []
+    # Search syntax characters in user input are matched as plain words
+    assert client.get('/books/search?q="title" OR -desc*').status_code == 200
+
+# Test GET /books/search without search text, expecting 500 like other validation errors
+@pytest.mark.parametrize("query", ["", "?q=", "?q=%20!", "?q=book&after=bad"])
+def test_search_books_invalid_args(client, query):
+    assert client.get(f"/books/search{query}").status_code == 500
+
+# Test GET /books filters, sort and fields, expecting paginated results of only the requested columns
+def test_list_books_filter_sort_fields(client):
+    other_author_id = "f8664c59-4270-4a74-9ca5-f4f8dab4d1da"
+    with app.app_context():
+        for author_id in (valid_author["id"], other_author_id):
+            db.session.add(Author(id=author_id, name=valid_author['name'], bio=valid_author["bio"], birth_date=datetime.strptime(valid_author["birth_date"], DATE_FORMAT)))
+        db.session.commit()
+
+    for year in (1990, 1995, 2000, 2005):
+        client.post("/books", json={**valid_book, "publish_date": f"{year}-01-01"})
+    client.post("/books", json={**valid_book, "publish_date": "1997-01-01", "author_id": other_author_id})
+
+    query = f"author_id={valid_author['id']}&publish_date_from=1995-01-01&sort=-publish_date&fields=id,publish_date&limit=2"
+    test_response = client.get(f"/books?{query}")
+    assert test_response.status_code == 200
+    books = test_response.get_json()
+    assert all(set(book) == {"id", "publish_date"} for book in books)
+    books += client.get(test_response.headers["Link"].split(";")[0].strip("<>")).get_json()
+    assert [book["publish_date"][12:16] for book in books] == ["2005", "2000", "1995"]
+
+    assert len(client.get("/books?publish_date_to=1997-01-01").get_json()) == 3
+    # Same page with another projection is cached separately
+    assert set(client.get("/books?fields=title").get_json()[0]) == {"title"}
+
+# Test GET /books with invalid filter, sort or fields arguments, expecting 500 like other validation errors
+@pytest.mark.parametrize("query", ["sort=title", "sort=-", "fields=", "fields=id,isbn", "publish_date_from=2000", "author_id=missing"])
+def test_list_books_invalid_args(client, query):
+    assert client.get(f"/books?{query}").status_code == 500
+
+# Test cursor of one sort used with another sort, expecting 500
+def test_list_books_cursor_of_other_sort(client):
+    with app.app_context():
+        db.session.add(Author(id=valid_author["id"], name=valid_author['name'], bio=valid_author["bio"], birth_date=datetime.strptime(valid_author["birth_date"], DATE_FORMAT)))
+        db.session.commit()
+    for _ in range(2):
+        client.post("/books", json=valid_book)
+
+    next_cursor = client.get("/books?sort=publish_date&limit=1").headers["X-Next-Cursor"]
+    assert client.get(f"/books?sort=publish_date&limit=1&after={next_cursor}").status_code == 200
+    assert client.get(f"/books?limit=1&after={next_cursor}").status_code == 500
+
+# Test POST /books:batchGet and GET /books?ids=, expecting request order, errors for unknown and invalid ids and one query for the cache misses
+def test_get_books_batch(client, monkeypatch):
+    monkeypatch.setitem(app.config, "ENTITY_CACHE_ENABLED", True)
+    book_ids = [str(uuid.uuid4()) for _ in range(3)]
+    with app.app_context():
+        db.session.add(Author(id=valid_author["id"], name=valid_author['name'], bio=valid_author["bio"], birth_date=datetime.strptime(valid_author["birth_date"], DATE_FORMAT)))
+        for book_id in book_ids:
+            db.session.add(Book(id=book_id, title=book_id, description=valid_book["description"], publish_date=datetime.strptime(valid_book["publish_date"], DATE_FORMAT), author_id=valid_author["id"]))
+        db.session.commit()
+        engine = db.engine
+
+    # Loaded from the entity cache once one of them has been read
+    client.get(f"/books/{book_ids[1]}")
+    statements = []
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        missing_id = str(uuid.uuid4())
+        test_response = client.post("/books:batchGet", json=[book_ids[2], missing_id, book_ids[1], "invalid", book_ids[0]])
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert test_response.status_code == 200
+    response_json = test_response.get_json()
+    assert response_json["succeeded"] == 3 and response_json["failed"] == 2
+    results = response_json["results"]
+    assert [result["index"] for result in results] == [0, 1, 2, 3, 4]
+    assert [results[index]["data"]["title"] for index in (0, 2, 4)] == [book_ids[2], book_ids[1], book_ids[0]]
+    assert results[1]["error"] == f"Book with id={missing_id} does not exist"
+    assert "error" in results[3]
+    assert len([statement for statement in statements if " IN " in statement]) == 1
+
+    test_response = client.get(f"/books?ids={book_ids[0]},{missing_id}")
+    assert test_response.status_code == 200
+    results = test_response.get_json()["results"]
+    assert results[0]["data"]["id"] == book_ids[0] and "error" in results[1]
+    assert client.get("/books?ids=").status_code == 500
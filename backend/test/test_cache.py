@@ -0,0 +1,123 @@
+from app.app import app
+from app.config import Config
+from app.util.cache_backends import SharedRedisCache
+from app.util.revalidation import CacheEntry, RevalidatingCache
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask
+
+import fakeredis
+import pytest
+import time
+
+# Two cache instances sharing one fake Redis server, standing in for two gunicorn workers
+@pytest.fixture
+def workers():
+    server = fakeredis.FakeServer()
+    # fakeredis creates its databases lazily and not thread safely, touch it before listener threads start
+    fakeredis.FakeRedis(server=server).exists("warmup")
+    yield [SharedRedisCache(host=fakeredis.FakeRedis(server=server), key_prefix="test:", retry_interval=0.1, fallback_timeout=5) for _ in range(2)], server
+
+# Wait until listener threads have processed published invalidations
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+# Entry written by one worker is a hit for the other one
+def test_shared_between_workers(workers):
+    (worker_a, worker_b), _ = workers
+    worker_a.set("getbooks", [{"id": "1"}])
+    assert worker_b.get("getbooks") == [{"id": "1"}]
+    assert worker_b.get_many("getbooks", "missing") == [[{"id": "1"}], None]
+
+# Delete in one worker is visible to every worker
+def test_delete_visible_to_all_workers(workers):
+    (worker_a, worker_b), _ = workers
+    worker_a.set("getauthor", {"id": "1"})
+    worker_b.delete("getauthor")
+    assert worker_a.get("getauthor") is None
+
+# While Redis is unreachable the local fallback is used, and invalidations published by other workers reach it once Redis is back
+def test_fallback_and_invalidation(workers):
+    (worker_a, worker_b), server = workers
+    worker_a.get("warmup")
+    worker_b.get("warmup")
+
+    server.connected = False
+    worker_a.set("getbooks", "stale")
+    assert worker_a.get("getbooks") == "stale"
+    assert worker_a.fallback.get("getbooks") == "stale"
+
+    server.connected = True
+    time.sleep(0.15)
+    # Pretend the fallback entry survived the reconnect, then invalidate it from the other worker
+    worker_a.fallback.set("getbooks", "stale")
+    worker_b.delete("getbooks")
+    assert wait_for(lambda: worker_a.fallback.get("getbooks") is None)
+
+# Default test config keeps the per process SimpleCache backend
+def test_default_backend_is_simple_cache():
+    assert app.config["CACHE_TYPE"] == "SimpleCache"
+
+# Flask app with one slow cached view counting its computations
+@pytest.fixture
+def counted_view():
+    view_app = Flask(__name__)
+    view_app.config.from_object(Config)
+    view_cache = RevalidatingCache(view_app)
+    calls = []
+
+    @view_app.route("/counted")
+    @view_cache.cached(timeout=60)
+    def counted():
+        calls.append(1)
+        time.sleep(0.05)
+        return f"computation {len(calls)}"
+
+    yield view_app, view_cache, calls
+    view_cache.wait_for_refreshes()
+
+# Concurrent misses of the same key compute the response once, the other requests wait for it
+def test_single_flight(counted_view):
+    view_app, _, calls = counted_view
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        bodies = list(executor.map(lambda _: view_app.test_client().get("/counted").get_data(as_text=True), range(8)))
+    assert bodies == ["computation 1"] * 8
+    assert len(calls) == 1
+
+# Expired responses are served while a single background refresh replaces them
+def test_stale_while_revalidate(counted_view):
+    view_app, view_cache, calls = counted_view
+    client = view_app.test_client()
+    assert client.get("/counted").get_data(as_text=True) == "computation 1"
+
+    with view_app.app_context():
+        entry = view_cache.get("view//counted")
+        view_cache.set("view//counted", entry._replace(fresh_until=time.time() - 1))
+    assert [client.get("/counted").get_data(as_text=True) for _ in range(3)] == ["computation 1"] * 3
+
+    view_cache.wait_for_refreshes()
+    assert client.get("/counted").get_data(as_text=True) == "computation 2"
+    assert len(calls) == 2
+
+# Cached views expose their key like Flask-Caching's, deleting it recomputes the response
+def test_make_cache_key(counted_view):
+    view_app, view_cache, calls = counted_view
+    client = view_app.test_client()
+    client.get("/counted")
+
+    view = view_app.view_functions["counted"]
+    with view_app.test_request_context("/counted"):
+        assert view.make_cache_key() == "view//counted"
+        view_cache.delete(view.make_cache_key())
+    assert client.get("/counted").get_data(as_text=True) == "computation 2"
+    assert view.uncached() == "computation 3"
+
+# Entries are refreshed early with a probability growing with their computation time and towards expiry
+def test_early_expiry():
+    now = time.time()
+    assert CacheEntry("value", fresh_until=now - 1, compute_seconds=0.01).should_refresh(now, beta=0)
+    assert not CacheEntry("value", fresh_until=now + 60, compute_seconds=0.01).should_refresh(now, beta=0)
+    assert not CacheEntry("value", fresh_until=now + 60, compute_seconds=0.001).should_refresh(now, beta=1.0)
+    assert CacheEntry("value", fresh_until=now + 1, compute_seconds=1e6).should_refresh(now, beta=1.0)
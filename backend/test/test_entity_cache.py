@@ -0,0 +1,159 @@
+from app.app import app
+from app.extensions import cache, db, entity_cache
+from app.authors.author import Author
+from app.util.cache_backends import CLEAR_ALL_MESSAGE, SharedRedisCache
+from app.util.caching import AUTHORS, invalidate_authors
+from app.util.entity_cache import LRUCache, entity_requests
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+import fakeredis
+import pytest
+import time
+
+@pytest.fixture
+def client(monkeypatch):
+    # Off by default with the SimpleCache of the tests, which only has a single process to invalidate
+    monkeypatch.setitem(app.config, "ENTITY_CACHE_ENABLED", True)
+    with app.app_context():
+        db.session.query(Author).delete()
+        db.session.commit()
+        cache.clear()
+        entity_cache.lru.clear()
+    with app.test_client() as testclient:
+        yield testclient
+
+# Least recently used entries are evicted first, by entry count and by size
+def test_lru_bounds():
+    lru = LRUCache(max_entries=2, max_bytes=1000, ttl=0)
+    lru.set("a", 1, size=100)
+    lru.set("b", 2, size=100)
+    assert lru.get("a") == 1
+    lru.set("c", 3, size=100)
+    assert (lru.get("a"), lru.get("b"), lru.get("c")) == (1, None, 3)
+
+    lru = LRUCache(max_entries=10, max_bytes=1000, ttl=0)
+    lru.set("a", 1, size=400)
+    lru.set("b", 2, size=400)
+    assert lru.get("a") == 1
+    lru.set("c", 3, size=400)
+    assert (lru.get("a"), lru.get("b"), lru.get("c")) == (1, None, 3)
+    assert lru.stats() == {"entries": 2, "bytes": 800, "hits": 3, "misses": 1, "evictions": 1}
+
+    # Values larger than the whole cache are not stored
+    lru.set("e", 5, size=1001)
+    assert lru.get("e") is None
+
+# Entries expire after the ttl, and loads started before an invalidation are not stored
+def test_lru_expiry_and_generation():
+    lru = LRUCache(max_entries=10, max_bytes=1000, ttl=0.01)
+    lru.set("a", 1, size=10)
+    time.sleep(0.02)
+    assert lru.get("a") is None
+
+    generation = lru.generation
+    lru.discard(["a"])
+    lru.set("a", "stale", size=10, generation=generation)
+    assert lru.get("a") is None
+
+# Single authors are read from the entity cache once loaded, and writes invalidate them
+def test_get_author_cached_and_invalidated(client):
+    author_id = client.post("/authors", json={"name": "name", "bio": "bio", "birth_date": "1990-01-01"}).get_json()["id"]
+
+    lru = app.extensions["entity_cache"]
+    hits = lru.stats()["hits"]
+    assert client.get(f"/authors/{author_id}").get_json()["name"] == "name"
+    with app.app_context():
+        cache.clear()
+    assert client.get(f"/authors/{author_id}").get_json()["name"] == "name"
+    assert lru.stats()["hits"] == hits + 1
+
+    client.put(f"/authors/{author_id}", json={"name": "renamed", "bio": "bio", "birth_date": "1990-01-01"})
+    assert client.get(f"/authors/{author_id}").get_json()["name"] == "renamed"
+
+# Entities loaded while a write invalidated them are not served from the shared cache afterwards,
+# entries stored after the invalidation are
+@pytest.mark.parametrize("many", [False, True])
+def test_shared_entry_of_racing_load_outdated(client, monkeypatch, many):
+    monkeypatch.setitem(app.config, "ENTITY_CACHE_SHARED", True)
+    author_id = client.post("/authors", json={"name": "name", "bio": "bio", "birth_date": "1990-01-01"}).get_json()["id"]
+
+    def lookup(load):
+        if many:
+            return entity_cache.get_many_or_load(AUTHORS, [author_id], lambda ids: {author_id: load()}).get(author_id)
+        return entity_cache.get_or_load(AUTHORS, author_id, load)
+
+    def load_racing_write():
+        # Row read before a concurrent write committed, which invalidates it before the load stores it
+        invalidate_authors(author_ids=[author_id])
+        return {"id": author_id, "name": "old"}
+
+    with app.app_context():
+        assert lookup(load_racing_write)["name"] == "old"
+        entity_cache.lru.clear()
+        assert lookup(lambda: {"id": author_id, "name": "new"})["name"] == "new"
+        entity_cache.lru.clear()
+        assert lookup(lambda: pytest.fail("expected a shared cache hit"))["name"] == "new"
+
+# With the LRU off, lookups by ids still check the cache backend with one multi-get before the database
+def test_get_many_without_lru_uses_cache_backend(client, monkeypatch):
+    monkeypatch.setitem(app.config, "ENTITY_CACHE_ENABLED", False)
+    author_ids = [client.post("/authors", json={"name": name, "bio": "bio", "birth_date": "1990-01-01"}).get_json()["id"] for name in ("a", "b")]
+
+    shared_hits = entity_requests.value(type=AUTHORS, result="shared_hit")
+    assert [result["data"]["name"] for result in client.post("/authors:batchGet", json=author_ids).get_json()["results"]] == ["a", "b"]
+    assert entity_requests.value(type=AUTHORS, result="shared_hit") == shared_hits
+    assert [result["data"]["name"] for result in client.post("/authors:batchGet", json=author_ids).get_json()["results"]] == ["a", "b"]
+    assert entity_requests.value(type=AUTHORS, result="shared_hit") == shared_hits + 2
+    assert len(entity_cache.lru) == 0
+
+    # Writes outdate the cached entities
+    client.put(f"/authors/{author_ids[0]}", json={"name": "renamed", "bio": "bio", "birth_date": "1990-01-01"})
+    assert client.get(f"/authors?ids={author_ids[0]}").get_json()["results"][0]["data"]["name"] == "renamed"
+
+def shared_workers():
+    server = fakeredis.FakeServer()
+    fakeredis.FakeRedis(server=server).exists("warmup")
+    return [SharedRedisCache(host=fakeredis.FakeRedis(server=server), key_prefix="test:") for _ in range(2)]
+
+def wait_for(condition) -> None:
+    deadline = time.monotonic() + 2
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+# Deletes published by another worker through SharedRedisCache drop the entities of this worker
+def test_invalidation_from_other_workers():
+    worker_a, worker_b = shared_workers()
+    lru = LRUCache(max_entries=10, max_bytes=10000, ttl=0)
+    received = []
+    worker_a.invalidation_listeners += [lru.on_invalidation, received.append]
+
+    # Starts the invalidation listener of worker a, which clears local caches once subscribed
+    worker_a.get("warmup")
+    wait_for(lambda: [CLEAR_ALL_MESSAGE] in received)
+    lru.set("entity:authors:1", {"id": "1"}, size=100)
+
+    worker_b.delete("entity:authors:1")
+    wait_for(lambda: lru.get("entity:authors:1") is None)
+    assert lru.get("entity:authors:1") is None
+    assert ["entity:authors:1"] in received
+
+# Invalidations missed while the subscription was down clear the local caches once it is back
+def test_resubscribe_clears_listeners():
+    worker_a, _ = shared_workers()
+    worker_a.retry_interval = 0.01
+    received = []
+    worker_a.invalidation_listeners.append(received.append)
+
+    pubsub = worker_a._write_client.pubsub
+    def disconnect(**kwargs):
+        raise RedisConnectionError("connection lost")
+    def first_pubsub_disconnects(**kwargs):
+        subscriber = pubsub(**kwargs)
+        if not received:
+            subscriber.get_message = disconnect
+        return subscriber
+    worker_a._write_client.pubsub = first_pubsub_disconnects
+
+    worker_a.get("warmup")
+    wait_for(lambda: received.count([CLEAR_ALL_MESSAGE]) >= 2)
+    assert received.count([CLEAR_ALL_MESSAGE]) >= 2
@@ -0,0 +1,25 @@
+from app.app import app
+from app.util.ids import format_uuid, is_uuid, new_id, uuid7
+import uuid
+
+# UUIDv7 ids carry version and variant bits and sort by creation time
+def test_uuid7():
+    ids = [uuid7() for _ in range(100)]
+    assert all(value.version == 7 and value.variant == uuid.RFC_4122 for value in ids)
+    assert [value.int >> 80 for value in ids] == sorted(value.int >> 80 for value in ids)
+
+def test_new_id_version(monkeypatch):
+    with app.app_context():
+        assert uuid.UUID(new_id()).version == 4
+        monkeypatch.setitem(app.config, "ID_UUID_VERSION", 7)
+        assert uuid.UUID(new_id()).version == 7
+
+# Only canonical lowercase UUID strings are accepted as ids, stored bytes format back to the same string
+def test_id_format():
+    value = uuid.uuid4()
+    assert format_uuid(value.bytes) == str(value)
+    assert is_uuid(str(value))
+    assert not is_uuid(str(value).upper())
+    assert not is_uuid(value.hex)
+    assert not is_uuid("missing")
+    assert not is_uuid(None)
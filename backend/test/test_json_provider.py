@@ -0,0 +1,45 @@
+from app.app import app
+from app.util.json_provider import FastJSONProvider
+from datetime import date, datetime, timezone
+from flask.json.provider import DefaultJSONProvider
+import uuid
+
+import pytest
+
+document = {
+    "title": "t",
+    "id": uuid.UUID("0f8fad5b-d9cb-469f-a165-70867728950e"),
+    "publish_date": date(2000, 2, 29),
+    "created_on": datetime(2024, 5, 6, 7, 8, 9, 123456),
+    "last_updated_on": datetime(2024, 5, 6, 9, 8, 9, tzinfo=timezone.utc),
+    "count": 3,
+    "nested": [{"b": None, "a": 1.5}],
+}
+
+@pytest.fixture(params=[True, False], ids=["orjson", "stdlib"])
+def provider(request):
+    provider = FastJSONProvider(app)
+    provider.use_orjson = request.param
+    return provider
+
+# Response bodies are byte for byte the same as with Flask's default provider: sorted keys, HTTP dates
+def test_same_output_as_default_provider(provider):
+    with app.app_context():
+        expected = DefaultJSONProvider(app).response(document).get_data()
+        assert provider.response(document).get_data() == expected
+    assert b'"publish_date":"Tue, 29 Feb 2000 00:00:00 GMT"' in expected
+    assert provider.loads(provider.dumps(document)) == DefaultJSONProvider(app).loads(expected)
+
+def test_loads(provider):
+    assert provider.loads(b'{"a": [1, "x", null]}') == {"a": [1, "x", None]}
+    with pytest.raises(ValueError):
+        provider.loads(b'{"a": ')
+
+# Test responses of the app, expecting JSON from the fast provider
+def test_app_uses_fast_provider():
+    assert isinstance(app.json, FastJSONProvider)
+    with app.test_client() as client:
+        test_response = client.post("/authors", json={"name": "asdas", "bio": "hello", "birth_date": "1990-01-01"})
+        assert test_response.get_json()["birth_date"] == "Mon, 01 Jan 1990 00:00:00 GMT"
+        assert test_response.get_data().endswith(b"}\n")
+        client.delete(f"/authors/{test_response.get_json()['id']}")
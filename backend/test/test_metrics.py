@@ -0,0 +1,163 @@
+from app.app import app
+from app.extensions import cache
+from app.metrics.instrumentation import cache_requests, request_duration, request_queries
+from app.metrics.prometheus import Counter, Gauge, Histogram, Registry, mark_process_dead, registry
+from app.config import engine_options
+from app.metrics.pool import InstrumentedQueuePool, instrument_engine, pool_metrics
+from sqlalchemy import create_engine, exc, text
+
+import os
+import pytest
+import sqlite3
+import threading
+import time
+
+# Test GET /metrics/pool, expecting checkout counters of the app engine keyed by its bind name
+def test_get_pool_metrics():
+    with app.test_client() as client:
+        client.get("/authors")
+        test_response = client.get("/metrics/pool")
+        assert test_response.status_code == 200
+        assert test_response.get_json()["primary"]["checkouts"] > 0
+
+# Engine options only tune server databases, and psycopg2 specific options only apply to psycopg2
+def test_engine_options(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "20")
+    assert engine_options("sqlite://") == {}
+    options = engine_options("postgresql+psycopg2://user:pass@db/flask")
+    assert options["pool_size"] == 20
+    assert options["poolclass"] is InstrumentedQueuePool
+    assert options["executemany_mode"] == "values_plus_batch"
+    assert "statement_timeout" in options["connect_args"]["options"]
+    assert "executemany_mode" not in engine_options("postgresql+asyncpg://user:pass@db/flask")
+
+# Instrumented queue pool counts overflow connections and pool timeouts
+def test_instrumented_pool_overflow_and_timeout(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=1, pool_timeout=0.05)
+    metrics = instrument_engine(engine, name="test")
+    primary_checkouts = pool_metrics["primary"].checkouts
+
+    first, second = engine.connect(), engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+
+    snapshot = metrics.snapshot()
+    assert snapshot["overflow_events"] == 1
+    assert snapshot["timeouts"] == 1
+    assert snapshot["checked_out"] == 2
+    assert snapshot["wait_seconds_max"] >= 0.05
+    # Other engines keep their own counters
+    assert pool_metrics["primary"].checkouts == primary_checkouts
+    first.close()
+    second.close()
+    engine.dispose()
+    assert metrics.snapshot()["checked_out"] == 0
+    pool_metrics.pop("test")
+
+# Opening a connection is not counted as waiting for one, only the wait on the pool's queue is
+def test_instrumented_pool_wait_excludes_connect(tmp_path):
+    def slow_connect():
+        time.sleep(0.2)
+        return sqlite3.connect(tmp_path / "pool.db", check_same_thread=False)
+
+    engine = create_engine("sqlite://", creator=slow_connect, poolclass=InstrumentedQueuePool, pool_size=1, max_overflow=0)
+    metrics = instrument_engine(engine, name="test")
+    connection = engine.connect()
+    assert metrics.snapshot()["wait_seconds_max"] < 0.1
+
+    threading.Timer(0.2, connection.close).start()
+    engine.connect().close()
+    assert 0.15 <= metrics.snapshot()["wait_seconds_max"] < 1
+    assert metrics.snapshot()["connects"] == 1
+    engine.dispose()
+    pool_metrics.pop("test")
+
+# Histogram buckets are cumulative and labels are escaped in the text format
+def test_prometheus_text_format():
+    test_registry = Registry()
+    histogram = test_registry.register(Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1)))
+    counter = test_registry.register(Counter("hits_total", "Hits", ("route",)))
+    histogram.observe(0.05, route="/a")
+    histogram.observe(0.5, route="/a")
+    histogram.observe(5, route="/a")
+    counter.inc(route='say "hi"')
+
+    lines = test_registry.render().splitlines()
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_sum{route="/a"} 5.55' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+    assert 'hits_total{route="say \\"hi\\""} 1' in lines
+
+# Test GET /metrics, expecting route latency, statements per request and cache hits/misses of cached routes
+def test_get_metrics():
+    with app.app_context():
+        cache.clear()
+    registry.reset()
+    with app.test_client() as client:
+        client.get("/authors")
+        client.get("/authors")
+        client.get("/authors?stream=1")
+        test_response = client.get("/metrics")
+
+    assert test_response.status_code == 200
+    assert test_response.content_type.startswith("text/plain; version=0.0.4")
+    assert request_duration.count(route="/authors", method="GET", status="200") == 3
+    assert request_queries.count(route="/authors", method="GET") == 3
+    # Streamed exports bypass the cache
+    assert cache_requests.value(route="/authors", result="miss") == 1
+    assert cache_requests.value(route="/authors", result="hit") == 1
+
+    text = test_response.get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{route="/authors",method="GET",status="200"} 3' in text
+    assert "# TYPE db_queries_per_request histogram" in text
+    assert 'db_pool{pool="primary",metric="checkouts"}' in text
+
+def worker_registry() -> tuple[Registry, Counter, Gauge, Histogram]:
+    worker = Registry()
+    return (worker, worker.register(Counter("hits_total", "Hits", ("route",))), worker.register(Gauge("entries", "Entries")),
+            worker.register(Histogram("latency_seconds", "Latency", buckets=(0.1, 1))))
+
+# With PROMETHEUS_MULTIPROC_DIR a scrape of any worker reports all workers, counters of exited workers are kept
+def test_multiprocess_metrics(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    this_worker, counter, gauge, histogram = worker_registry()
+    counter.inc(2, route="/a")
+    gauge.set(3)
+    histogram.observe(0.05)
+
+    other_worker, other_counter, other_gauge, other_histogram = worker_registry()
+    other_counter.inc(5, route="/a")
+    other_gauge.set(7)
+    other_histogram.observe(0.5)
+    other_worker.write(pid=12345)
+
+    lines = this_worker.render().splitlines()
+    assert 'hits_total{route="/a"} 7' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 2' in lines
+    assert 'latency_seconds_count 2' in lines
+    assert f'entries{{pid="{os.getpid()}"}} 3' in lines
+    assert 'entries{pid="12345"} 7' in lines
+
+    mark_process_dead(12345)
+    lines = this_worker.render().splitlines()
+    assert 'hits_total{route="/a"} 7' in lines
+    assert 'latency_seconds_count 2' in lines
+    assert not any(line.startswith('entries{pid="12345"}') for line in lines)
+
+    # Exited workers are folded into one aggregate file instead of keeping a file each
+    for pid in (12346, 12347):
+        worker, worker_counter, _, worker_histogram = worker_registry()
+        worker_counter.inc(1, route="/a")
+        worker_histogram.observe(5.0)
+        worker.write(pid=pid)
+        mark_process_dead(pid)
+    assert sorted(os.listdir(tmp_path)) == sorted(["aggregate.json", f"gauges_{os.getpid()}.json"] + [
+        name for name in os.listdir(tmp_path) if name.startswith(f"counters_{os.getpid()}_")])
+    lines = this_worker.render().splitlines()
+    assert 'hits_total{route="/a"} 9' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert 'latency_seconds_count 4' in lines
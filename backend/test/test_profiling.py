@@ -0,0 +1,93 @@
+from app import create_app
+from app.app import app
+from app.config import Config, replica_binds
+from app.extensions import cache, db
+from app.metrics import profiling as profiling_module
+from app.authors.controller import list_all_authors
+from app.metrics.profiling import PROFILE_ID_HEADER, RequestProfile
+from app.util.replicas import read_routing
+from flask import g
+import json
+import pstats
+
+import pytest
+
+@pytest.fixture
+def profiling(tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, "PROFILING_ENABLED", True)
+    monkeypatch.setitem(app.config, "PROFILING_DIR", str(tmp_path))
+    with app.app_context():
+        cache.clear()
+    return tmp_path
+
+def profile_files(directory, profile_id: str) -> dict:
+    return {path.suffix: path for path in directory.iterdir() if path.name.startswith(profile_id)}
+
+# Test profiling requested by header, expecting pstats and metadata with route and SQL statements
+def test_profile_by_header(profiling):
+    with app.test_client() as client:
+        test_response = client.get("/authors?limit=5", headers={"X-Profile": "1"})
+    assert test_response.status_code == 200
+    profile_id = test_response.headers[PROFILE_ID_HEADER]
+
+    files = profile_files(profiling, profile_id)
+    assert set(files) == {".pstats", ".json"}
+    assert "GET-authors" in files[".json"].name
+    stats = pstats.Stats(str(files[".pstats"]))
+    assert any(function_name == "list_authors" for _, _, function_name in stats.stats)
+
+    metadata = json.loads(files[".json"].read_text())
+    assert metadata["route"] == "/authors"
+    assert metadata["path"] == "/authors?limit=5"
+    assert metadata["status"] == 200
+    assert any("FROM author" in statement["sql"] for statement in metadata["statements"])
+
+# Test sampling mode, expecting collapsed stacks "frame;frame;... count"
+def test_profile_sampling_mode(profiling, monkeypatch):
+    monkeypatch.setitem(app.config, "PROFILING_MODE", "sampling")
+    monkeypatch.setitem(app.config, "PROFILING_SAMPLE_RATE", 1.0)
+    with app.test_client() as client:
+        test_response = client.get("/books")
+    files = profile_files(profiling, test_response.headers[PROFILE_ID_HEADER])
+    assert set(files) == {".collapsed", ".json"}
+    for line in files[".collapsed"].read_text().splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0 and stack
+
+# Test requests are not profiled without header, with a wrong token or while profiling is disabled
+def test_profile_guards(profiling, monkeypatch):
+    monkeypatch.setitem(app.config, "PROFILING_TOKEN", "secret")
+    with app.test_client() as client:
+        assert PROFILE_ID_HEADER not in client.get("/authors").headers
+        assert PROFILE_ID_HEADER not in client.get("/authors", headers={"X-Profile": "guess"}).headers
+        assert PROFILE_ID_HEADER in client.get("/authors", headers={"X-Profile": "secret"}).headers
+        monkeypatch.setitem(app.config, "PROFILING_ENABLED", False)
+        assert PROFILE_ID_HEADER not in client.get("/authors", headers={"X-Profile": "secret"}).headers
+    assert len(list(profiling.iterdir())) == 2
+
+# Test cprofile mode where cProfile records every thread (Python 3.12+), expecting the thread's stack samples instead
+def test_profile_cprofile_all_threads(profiling, monkeypatch):
+    monkeypatch.setattr(profiling_module, "CPROFILE_PER_THREAD", False)
+    with app.test_client() as client:
+        test_response = client.get("/authors", headers={"X-Profile": "1"})
+    files = profile_files(profiling, test_response.headers[PROFILE_ID_HEADER])
+    assert set(files) == {".collapsed", ".json"}
+    assert json.loads(files[".json"].read_text())["mode"] == "sampling"
+
+# Test statements of read replicas, expecting them in the profile of the request that ran them
+def test_profile_replica_statements(tmp_path, monkeypatch):
+    class ReplicaConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'primary.db'}"
+        SQLALCHEMY_BINDS = replica_binds([f"sqlite:///{tmp_path / 'replica.db'}"])
+        PROFILING_DIR = str(tmp_path / "profiles")
+    replica_app = create_app(config_class=ReplicaConfig)[0]
+    monkeypatch.setattr(profiling_module, "_active_profiles", 1)
+    with replica_app.test_request_context("/authors"):
+        db.metadata.create_all(db.engines["replica0"])
+        replica_reads = read_routing.value(target="replica")
+        g.request_profile = profile = RequestProfile(mode="sampling", interval=0.01)
+        profile.enable()
+        list_all_authors(limit=10)
+        db.session.remove()
+    assert read_routing.value(target="replica") == replica_reads + 1
+    assert any("FROM author" in statement["sql"] for statement in profile.statements)
@@ -0,0 +1,96 @@
+from datetime import date
+import time
+from sqlalchemy import create_engine, select
+
+from app import create_app
+from app.app import app as flask_app
+from app.config import Config, replica_binds
+from app.extensions import cache, db
+from app.authors.author import Author
+from app.authors.controller import create_author, get_author, list_all_authors, stream_all_authors
+from app.util.replicas import PRIMARY_UNTIL_COOKIE, read_routing, replica_health, replica_set
+
+AUTHOR_ID = "00000001-0000-4000-8000-000000000000"
+
+def replica_app(tmp_path, replica_uri=None):
+    class ReplicaConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'primary.db'}"
+        SQLALCHEMY_BINDS = replica_binds([replica_uri or f"sqlite:///{tmp_path / 'replica.db'}"])
+        # Every read has to reach a database to tell which one served it
+        ENTITY_CACHE_ENABLED = False
+    return create_app(config_class=ReplicaConfig)[0]
+
+def seed_replica_only():
+    # Row only present on the replica, tells which database a read went to
+    replica = db.engines["replica0"]
+    db.metadata.create_all(replica)
+    with replica.begin() as connection:
+        connection.execute(Author.__table__.insert(), {"id": AUTHOR_ID, "name": "replica author", "bio": "bio", "birth_date": date(1990, 1, 1)})
+
+# Read-only controllers use the replica, other statements the primary
+def test_reads_routed_to_replica(tmp_path):
+    app = replica_app(tmp_path)
+    with app.app_context():
+        seed_replica_only()
+
+        assert get_author(author_id=AUTHOR_ID)["name"] == "replica author"
+        authors, _ = list_all_authors(limit=10)
+        assert [author["id"] for author in authors] == [AUTHOR_ID]
+        assert [author["id"] for author in stream_all_authors()] == [AUTHOR_ID]
+        assert db.session.scalar(select(Author.name).where(Author.id == AUTHOR_ID)) is None
+        db.session.remove()
+
+# Writes go to the primary, and so do later reads of the request
+def test_reads_after_write_in_request(tmp_path):
+    app = replica_app(tmp_path)
+    with app.app_context():
+        seed_replica_only()
+
+        author = create_author({"name": "new author", "bio": "bio", "birth_date": date(1990, 1, 1)})
+        with db.engines["replica0"].connect() as connection:
+            assert connection.scalar(select(Author.name).where(Author.id == author["id"])) is None
+        assert get_author(author_id=author["id"])["name"] == "new author"
+        db.session.remove()
+
+# The client that wrote reads its writes from the primary, other clients keep reading from the replica
+# except for responses computed for the cache, which every client is served
+def test_read_your_writes(tmp_path):
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    db.metadata.create_all(replica)
+    with flask_app.app_context():
+        db.session.query(Author).delete()
+        db.session.commit()
+        cache.clear()
+        flask_app.extensions["replicas"] = replica_set(flask_app, {"replica0": replica})
+    writer, reader = flask_app.test_client(), flask_app.test_client()
+    try:
+        author_id = writer.post("/authors", json={"name": "new author", "bio": "bio", "birth_date": "1990-01-01"}).get_json()["id"]
+        assert float(writer.get_cookie(PRIMARY_UNTIL_COOKIE).value) > time.time()
+        assert writer.get(f"/authors/{author_id}").get_json()["name"] == "new author"
+        assert author_id in writer.get("/authors?stream=1").get_data(as_text=True)
+
+        # Uncached reads of other clients go to the replica, which has not got the write yet
+        assert author_id not in reader.get("/authors?stream=1").get_data(as_text=True)
+        # Cached list recomputed after the write, as the writer may be served it
+        assert author_id in [author["id"] for author in reader.get("/authors").get_json()]
+
+        # Once DB_REPLICA_READ_AFTER_WRITE is over, reads are back on the replica
+        writer.delete_cookie(PRIMARY_UNTIL_COOKIE)
+        assert author_id not in writer.get("/authors?stream=1").get_data(as_text=True)
+    finally:
+        flask_app.extensions.pop("replicas")
+        with flask_app.app_context():
+            cache.clear()
+
+# Unreachable replicas fail their health check and reads fall back to the primary
+def test_unhealthy_replica_falls_back_to_primary(tmp_path):
+    app = replica_app(tmp_path, replica_uri=f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    with app.app_context():
+        primary_reads = read_routing.value(target="primary")
+        author = create_author({"name": "primary author", "bio": "bio", "birth_date": date(1990, 1, 1)})
+        db.session.remove()
+
+        assert get_author(author_id=author["id"])["name"] == "primary author"
+        assert replica_health.value(replica="replica0") == 0
+        assert read_routing.value(target="primary") == primary_reads + 1
+        db.session.remove()
@@ -0,0 +1,143 @@
+from app import create_app
+from app.config import Config
+from app.extensions import db
+from app.util import schema
+from app.util.schema import init_schema, upgrade_database
+from app.util.schema import include_object
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from app.authors.author import Author, author_serializer
+from app.util.search import search_select
+from app.books.book import Book
+from sqlalchemy import create_engine, inspect, select, text
+
+import os
+import shutil
+import pytest
+
+def file_config(tmp_path, mode):
+    class FileConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'schema.db'}"
+        DB_SCHEMA_MODE = mode
+    return FileConfig
+
+# Migrations create the schema declared by the models, so models and migrations cannot drift apart
+def test_migrations_match_models(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    upgrade_database(engine)
+    with engine.connect() as connection:
+        assert compare_metadata(MigrationContext.configure(connection, opts={"include_object": include_object}), db.metadata) == []
+        assert "ix_book_author_id" in [index["name"] for index in inspect(connection).get_indexes("book")]
+
+# Startup in migrate mode applies migrations, none mode leaves the database untouched
+def test_schema_modes(tmp_path):
+    create_app(config_class=file_config(tmp_path, "none"))
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    assert inspect(engine).get_table_names() == []
+
+    create_app(config_class=file_config(tmp_path, "migrate"))
+    with engine.connect() as connection:
+        assert connection.scalar(text("SELECT version_num FROM alembic_version")) == "0005"
+
+# Schema created by db.create_all() of the models before migrations existed
+LEGACY_DDL = (
+    "CREATE TABLE author (id TEXT NOT NULL, created_on DATETIME, last_updated_on DATETIME, name TEXT, bio TEXT, birth_date DATE, "
+    "PRIMARY KEY (id), UNIQUE (id))",
+    "CREATE TABLE book (id TEXT NOT NULL, created_on DATETIME, last_updated_on DATETIME, title TEXT, description TEXT, publish_date DATE, "
+    "author_id TEXT NOT NULL, PRIMARY KEY (id), UNIQUE (id), FOREIGN KEY(author_id) REFERENCES author (id) ON DELETE CASCADE)",
+)
+
+# Databases created by db.create_all() before migrations existed are stamped with the baseline and upgraded
+def test_migrate_legacy_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    with engine.begin() as connection:
+        for statement in LEGACY_DDL:
+            connection.execute(text(statement))
+
+    upgrade_database(engine)
+    with engine.connect() as connection:
+        assert connection.scalar(text("SELECT version_num FROM alembic_version")) == "0005"
+        assert compare_metadata(MigrationContext.configure(connection, opts={"include_object": include_object}), db.metadata) == []
+        assert {"ix_author_created_on_id", "ix_author_birth_date_id"} <= {index["name"] for index in inspect(connection).get_indexes("author")}
+        assert {"ix_book_created_on_id", "ix_book_publish_date_id", "ix_book_author_id"} <= {index["name"] for index in inspect(connection).get_indexes("book")}
+
+# Databases created by db.create_all() of the current models are stamped with the latest revision
+def test_migrate_current_create_all_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    with engine.begin() as connection:
+        db.metadata.create_all(connection)
+
+    upgrade_database(engine)
+    with engine.connect() as connection:
+        assert connection.scalar(text("SELECT version_num FROM alembic_version")) == "0005"
+
+# Text ids stored before the UUID migration keep their string value
+def test_migrate_text_ids(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    upgrade_database(engine, revision="0002")
+    author_id, book_id = "4f859bd4-7c85-4c71-bd93-d15670bec314", "f8664c59-4270-4a74-9ca5-f4f8dab4d1da"
+    with engine.begin() as connection:
+        connection.execute(text("INSERT INTO author (id, name) VALUES (:id, 'name')"), {"id": author_id})
+        connection.execute(text("INSERT INTO book (id, title, author_id) VALUES (:id, 'title', :author_id)"), {"id": book_id, "author_id": author_id})
+
+    upgrade_database(engine)
+    with engine.connect() as connection:
+        assert connection.scalar(text("SELECT typeof(id) FROM author")) == "blob"
+        assert connection.execute(select(Book.id, Book.author_id)).one() == (book_id, author_id)
+        assert connection.scalar(select(Author.id).where(Author.id == author_id)) == author_id
+
+# Migrations with an autocommit_block(), like the CREATE INDEX CONCURRENTLY ones on Postgres, run outside of any transaction
+def test_migration_with_autocommit_block(tmp_path, monkeypatch):
+    script_location = tmp_path / "migrations"
+    (script_location / "versions").mkdir(parents=True)
+    for name in ("env.py", "script.py.mako"):
+        shutil.copy(os.path.join(schema.BACKEND_DIR, "migrations", name), script_location / name)
+    (script_location / "versions" / "0001_autocommit.py").write_text(
+        "from alembic import op\n"
+        "revision = '0001'\n"
+        "down_revision = None\n"
+        "def upgrade():\n"
+        "    op.execute('CREATE TABLE before_block (id INTEGER)')\n"
+        "    with op.get_context().autocommit_block():\n"
+        "        op.execute('CREATE TABLE in_block (id INTEGER)')\n"
+        "    op.execute('CREATE TABLE after_block (id INTEGER)')\n"
+    )
+    alembic_config = schema.alembic_config
+    def temporary_config():
+        config = alembic_config()
+        config.set_main_option("script_location", str(script_location))
+        return config
+    monkeypatch.setattr(schema, "alembic_config", temporary_config)
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    upgrade_database(engine)
+    with engine.connect() as connection:
+        assert {"before_block", "in_block", "after_block"} <= set(inspect(connection).get_table_names())
+        assert connection.scalar(text("SELECT version_num FROM alembic_version")) == "0001"
+
+def search_ids(connection, q: str) -> list[str]:
+    return [row.id for row in connection.execute(search_select(serializer=author_serializer, q=q, dialect="sqlite"))]
+
+# Search indexes added by revision 0004 cover existing rows, keyed by id they stay correct across deletes and VACUUM
+def test_migrate_search_index(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    upgrade_database(engine, revision="0003")
+    author_ids = ["4f859bd4-7c85-4c71-bd93-d15670bec314", "f8664c59-4270-4a74-9ca5-f4f8dab4d1da", "1f849bd4-7a85-4c71-bd93-d15670bec314"]
+    with engine.begin() as connection:
+        for author_id, name in zip(author_ids, ("tolkien", "pratchett", "tolkien estate")):
+            connection.execute(Author.__table__.insert(), {"id": author_id, "name": name, "bio": "bio"})
+
+    upgrade_database(engine)
+    with engine.begin() as connection:
+        assert sorted(search_ids(connection, "tolkien")) == sorted([author_ids[0], author_ids[2]])
+        connection.execute(Author.__table__.delete().where(Author.id == author_ids[0]))
+        connection.execute(Author.__table__.update().where(Author.id == author_ids[1]).values(name="tolkien fan"))
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text("VACUUM"))
+    with engine.connect() as connection:
+        assert sorted(search_ids(connection, "tolkien")) == sorted(author_ids[1:])
+        assert search_ids(connection, "pratchett") == []
+
+def test_invalid_schema_mode():
+    with pytest.raises(ValueError):
+        init_schema(mode="drop", db=db)
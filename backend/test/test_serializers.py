@@ -0,0 +1,34 @@
+from app.app import app
+from app.authors.author import Author, author_serializer
+from app.books.book import book_serializer
+from app.util.serializers import encode_date, encode_datetime
+from datetime import date, datetime, timedelta, timezone
+from werkzeug.http import http_date
+
+import pytest
+
+# Dates covering leap days, year boundaries and every weekday
+sample_datetimes = [datetime(1990, 1, 1) + timedelta(days=days, seconds=seconds) for days, seconds in [(0, 0), (789, 3599), (3347, 86399), (12000, 45296)]]
+
+# Fast encoders must match werkzeug's http_date used by Flask's default JSON provider
+@pytest.mark.parametrize("value", sample_datetimes)
+def test_encoders_match_http_date(value):
+    assert encode_datetime(value) == http_date(value)
+    assert encode_date(value.date()) == http_date(value.date())
+    aware = value.replace(tzinfo=timezone(timedelta(hours=-5)))
+    assert encode_datetime(aware) == http_date(aware)
+
+# Serialized author must produce same JSON as the legacy toDict output did through jsonify
+def test_serializer_matches_legacy_json():
+    author = Author(id="4f859bd4-7c85-4c71-bd93-d15670bec314", name="name", bio="bio", birth_date=date(1990, 1, 1), created_on=datetime.now(), last_updated_on=datetime.now())
+    legacy = { key: getattr(author, key) for key in ["id", "created_on", "last_updated_on", "name", "bio", "birth_date"] }
+
+    with app.app_context():
+        assert app.json.loads(app.json.dumps(author.toDict())) == app.json.loads(app.json.dumps(legacy))
+
+# Column-only rows and subset serializers keep key order of selected columns
+def test_serializer_rows_and_subset():
+    subset = book_serializer.only(["id", "publish_date"])
+    assert subset.serialize_row(("abc", date(1990, 1, 1))) == {"id": "abc", "publish_date": "Mon, 01 Jan 1990 00:00:00 GMT"}
+    assert subset.serialize_row(("abc", None)) == {"id": "abc", "publish_date": None}
+    assert list(author_serializer.select().selected_columns.keys()) == list(author_serializer.keys)
@@ -0,0 +1,70 @@
+from app.util.validators import (ValidationError, Validator, create_update_author_schema, batch_update_book_schema, id_schema,
+                                 parse_date, search_text_schema)
+from datetime import date
+
+import pytest
+
+valid_author = {"name": "asdas", "bio": "hello", "birth_date": "1990-01-01"}
+date_error = "Check that birth_date is non-empty, is a string and uses the following date format: YYYY-MM-DD"
+
+# Validated values are converted, dates are handed to the controllers as date objects
+def test_validate_converts_values():
+    assert create_update_author_schema.validate(valid_author) == {"name": "asdas", "bio": "hello", "birth_date": date(1990, 1, 1)}
+    assert id_schema.validate("0f8fad5b-d9cb-469f-a165-70867728950e") == "0f8fad5b-d9cb-469f-a165-70867728950e"
+
+# Dates accepted by the previous strptime based check are still accepted, and nothing else
+@pytest.mark.parametrize("date_str, expected", [
+    ("1990-01-01", date(1990, 1, 1)),
+    ("1990-1-1", date(1990, 1, 1)),
+    ("2000-02-29", date(2000, 2, 29)),
+])
+def test_parse_date(date_str, expected):
+    assert parse_date(date_str) == expected
+
+@pytest.mark.parametrize("date_str", ["19900101", "1990-13-01", "1990-02-30", "990-01-01", " 1990-01-01", "1990-01-01T00:00", "0000-01-01", ""])
+def test_parse_date_invalid(date_str):
+    with pytest.raises(ValueError):
+        parse_date(date_str)
+
+# Error messages and their precedence are unchanged: values in request order, then missing keys, then unknown keys
+@pytest.mark.parametrize("data, message", [
+    ({**valid_author, "name": ""}, "Check that name is non-empty and is a string"),
+    ({**valid_author, "birth_date": "19900101"}, date_error),
+    ({**valid_author, "birth_date": 19900101}, date_error),
+    ({"bio": "", "name": ""}, "Check that bio is non-empty and is a string"),
+    ({"name": {}, "bio": ""}, "Check that bio is non-empty and is a string"),
+    ({"name": "n"}, "Missing keys: 'bio', 'birth_date'"),
+    ({"bio": "b", "birth_date": "1990-01-01"}, "Missing key: 'name'"),
+    ({"x": 1}, "Missing keys: 'bio', 'birth_date', 'name'"),
+    ({**valid_author, "x": 1}, "Wrong key 'x' in {'name': 'asdas', 'bio': 'hello', 'birth_date': '1990-01-01', 'x': 1}"),
+    ({**valid_author, "z": 1, "a": 2}, "Wrong keys 'a', 'z' in {'name': 'asdas', 'bio': 'hello', 'birth_date': '1990-01-01', 'z': 1, 'a': 2}"),
+    (None, "None should be instance of 'dict'"),
+    ([1], "[1] should be instance of 'dict'"),
+])
+def test_validate_errors(data, message):
+    with pytest.raises(ValidationError) as error:
+        create_update_author_schema.validate(data)
+    assert str(error.value) == message
+
+# Batch validation reports every invalid item by index and keeps validating
+def test_validate_many():
+    book = {"id": "0f8fad5b-d9cb-469f-a165-70867728950e", "title": "t", "description": "d", "publish_date": "2000-01-01",
+            "author_id": "0f8fad5b-d9cb-469f-a165-70867728950e"}
+    validated, errors = batch_update_book_schema.validate_many([book, {**book, "id": "1"}, {**book, "title": ""}, book])
+    assert [index for index, _ in validated] == [0, 3]
+    assert validated[0][1]["publish_date"] == date(2000, 1, 1)
+    assert errors == {1: "Check that id is a UUID string", 2: "Check that title is non-empty and is a string"}
+
+    _, errors = search_text_schema.validate_many(["word", "!!", None])
+    assert list(errors) == [1, 2]
+
+# Validator is abstract, subclasses must implement validate
+def test_validator_is_abstract():
+    with pytest.raises(TypeError):
+        Validator()
+
+    class Incomplete(Validator):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,7 @@
+# Production WSGI entry point, served by gunicorn with the settings in gunicorn.conf.py:
+#
+#     gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Without preload_app every worker imports this module after the fork, so create_app() and the
+# SQLAlchemy connection pool are created inside the worker process.
+from app.app import app
@@ -1,18 +1,6 @@
--- Unused .sql file to initialize DB previously
+-- Runs once when the Postgres volume is first initialized.
+--
+-- Tables are not created here: the schema is owned by the Alembic migrations in backend/migrations,
+-- applied by the backend on start (DB_SCHEMA_MODE=migrate) or with `alembic upgrade head`.
 
 CREATE USER flaskapp NOSUPERUSER PASSWORD 'flaskapp';
-
-CREATE TABLE IF NOT EXISTS Authors(
-    id integer primary key generated always as identity,
-    name text,
-    bio text,
-    birth_date date
-);
-
-CREATE TABLE IF NOT EXISTS Books(
-    id integer primary key generated always as identity,
-    title text,
-    description text,
-    publish_date date,
-    author_id integer references Authors(id) ON DELETE CASCADE
-);
\ No newline at end of file